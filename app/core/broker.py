@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# memory: deliver inside this process only (single worker, tests)
+# postgres: fan out through LISTEN/NOTIFY so every uvicorn worker sees every message
+SSE_BROKER = os.getenv("SSE_BROKER", "memory").lower()
+SSE_BROKER_CHANNEL = os.getenv("SSE_BROKER_CHANNEL", "ems_sse")
+# NOTIFY payloads are limited to 8000 bytes by default
+PG_NOTIFY_MAX_BYTES = 7900
+
+# deliver(key, message, event_id); key is a user id or a topic name such as "team:3"
+Deliver = Callable[[Union[int, str], dict, int], Awaitable[None]]
+
+
+class Broker:
+    """Pub/sub between workers for SSE messages.
+
+    publish() sends a (key, message, event_id) triple to every subscribed worker,
+    this one included; each worker hands it to the deliver callback given to start(),
+    which appends it to that worker's local rings.
+    """
+
+    async def start(self, deliver: Deliver):
+        raise NotImplementedError
+
+    async def publish_many(self, messages: List[Tuple[Union[int, str], dict, int]]):
+        raise NotImplementedError
+
+    async def publish(self, key: Union[int, str], message: dict, event_id: int):
+        await self.publish_many([(key, message, event_id)])
+
+    async def stop(self):
+        pass
+
+
+class InMemoryBroker(Broker):
+    """Process-local broker. Brokers created with the same hub list behave like
+    separate workers attached to one channel, which is what the tests use."""
+
+    def __init__(self, hub: Optional[list] = None):
+        self.hub = hub if hub is not None else []
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        self.hub.append(self)
+
+    async def publish_many(self, messages: List[Tuple[Union[int, str], dict, int]]):
+        for broker in list(self.hub):
+            for key, message, event_id in messages:
+                await broker._deliver(key, message, event_id)
+
+    async def stop(self):
+        if self in self.hub:
+            self.hub.remove(self)
+
+
+class PostgresBroker(Broker):
+    """LISTEN/NOTIFY on one channel over a dedicated asyncpg connection.
+
+    Publishing from another thread's event loop (sync routes schedule broadcasts that
+    way) is handed over to the loop that owns the connection.
+    """
+
+    def __init__(self, dsn: str, channel: str = SSE_BROKER_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self._conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._deliver: Optional[Deliver] = None
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # Notifications are delivered one at a time, in the order they were received
+        self._inbox: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+        self._loop = asyncio.get_running_loop()
+        self._lock = asyncio.Lock()
+        self._inbox = asyncio.Queue()
+        self._consumer = self._loop.create_task(self._consume())
+        await self._connect()
+
+    async def _connect(self):
+        import asyncpg
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.add_listener(self.channel, self._on_notify)
+        self._conn.add_termination_listener(self._on_terminated)
+        logger.info(f"SSE broker listening on channel {self.channel}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed SSE broker payload")
+            return
+        self._inbox.put_nowait((data["u"], data["m"], data["e"]))
+
+    async def _consume(self):
+        while True:
+            key, message, event_id = await self._inbox.get()
+            try:
+                await self._deliver(key, message, event_id)
+            except Exception as e:
+                logger.error(f"SSE broker delivery for {key} failed: {e}")
+
+    def _on_terminated(self, connection):
+        if self._closing:
+            return
+        logger.warning("SSE broker connection lost; reconnecting")
+        self._reconnect_task = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 1.0
+        while not self._closing:
+            try:
+                await self._connect()
+                return
+            except Exception as e:
+                logger.warning(f"SSE broker reconnect failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def publish_many(self, messages: List[Tuple[Union[int, str], dict, int]]):
+        if asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(self.publish_many(messages), self._loop)
+            await asyncio.wrap_future(future)
+            return
+
+        payloads = []
+        for key, message, event_id in messages:
+            payload = json.dumps({"u": key, "m": message, "e": event_id}, default=str)
+            if len(payload.encode("utf-8")) > PG_NOTIFY_MAX_BYTES:
+                # Too large for NOTIFY; this worker's clients still get it, others resync on their next fetch
+                logger.warning(f"SSE message for {key} exceeds NOTIFY limit; delivering locally only")
+                await self._deliver(key, message, event_id)
+                continue
+            payloads.append(payload)
+        if not payloads:
+            return
+        # One round trip for the whole batch
+        async with self._lock:
+            await self._conn.execute("SELECT pg_notify($1, p) FROM unnest($2::text[]) AS p", self.channel, payloads)
+
+    async def stop(self):
+        self._closing = True
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self._consumer:
+            self._consumer.cancel()
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+def _asyncpg_dsn(url: str) -> str:
+    from sqlalchemy.engine import make_url
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def create_broker() -> Broker:
+    """The broker selected by SSE_BROKER; anything but a Postgres database gets the in-memory one."""
+    if SSE_BROKER == "postgres":
+        from app.core.database import SQLALCHEMY_DATABASE_URL
+        if SQLALCHEMY_DATABASE_URL.startswith("postgres"):
+            return PostgresBroker(_asyncpg_dsn(SQLALCHEMY_DATABASE_URL))
+        logger.warning("SSE_BROKER=postgres needs a PostgreSQL DATABASE_URL; using the in-memory broker")
+    return InMemoryBroker()
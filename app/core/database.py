@@ -5,6 +5,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import OperationalError
 import logging
+from app.core import db_metrics
+from app.core.db_metrics import TimedQueuePool, TimedAsyncQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 
@@ -19,20 +22,82 @@ if not SQLALCHEMY_DATABASE_URL:
     logging.warning("DATABASE_URL not set; falling back to local SQLite for tests/development.")
     SQLALCHEMY_DATABASE_URL = "sqlite:///./dev.db"
 
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _engine_kwargs(url: str) -> dict:
+    """Pool settings for the primary engine, tunable from env.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (seconds), DB_POOL_RECYCLE (seconds,
+    -1 disables) and DB_POOL_PRE_PING. In-memory SQLite keeps SQLAlchemy's
+    single-connection pool since a QueuePool would hand out empty databases.
+    """
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", "true"),
+    }
+
+
 # Create engine and verify connectivity to the configured DB. If the DB is unreachable,
 # fall back to a local SQLite file to make tests and local dev more robust.
+# Set DB_CONNECT_CHECK=false to skip the import-time round trip in production.
 try:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    # Try a short connection to validate credentials/host (some DBs are lazy)
-    conn = engine.connect()
-    conn.close()
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+    if _env_bool("DB_CONNECT_CHECK", "true"):
+        # Try a short connection to validate credentials/host (some DBs are lazy)
+        conn = engine.connect()
+        conn.close()
 except OperationalError as e:
     logging.warning("Could not connect to DATABASE_URL (%s). Falling back to SQLite. Error: %s", SQLALCHEMY_DATABASE_URL, e)
     SQLALCHEMY_DATABASE_URL = "sqlite:///./dev.db"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Per-request query counting (X-DB-Queries / Server-Timing) and the opt-in N+1 guard
+db_metrics.instrument_queries()
+if _env_bool("DB_STRICT_LOADING", "false"):
+    db_metrics.enable_strict_loading()
+
+
+def _async_url(url: str) -> str:
+    """Map the sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+def _async_engine_kwargs(url: str) -> dict:
+    kwargs = _engine_kwargs(url)
+    if kwargs.get("poolclass") is TimedQueuePool:
+        kwargs["poolclass"] = TimedAsyncQueuePool
+    return kwargs
+
+
+# Async engine for the hot read paths. It shares the database (and the fallback
+# decision above) with the sync engine, which stays in use for writes, scripts and jobs.
+ASYNC_DATABASE_URL = _async_url(SQLALCHEMY_DATABASE_URL)
+try:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_async_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+except Exception as e:
+    logging.warning("Async database driver unavailable for %s: %s", ASYNC_DATABASE_URL, e)
+    async_engine = None
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
 Base = declarative_base()
 
 _TABLES_CREATED = False
@@ -52,7 +117,9 @@ try:
             url = str(bind.engine.url) if hasattr(bind, 'engine') else str(bind.url)
             if url in _CREATED_BINDS:
                 return
-            insp = inspect(bind)
+            # Inspect through the session's own connection: checking out a second one here
+            # deadlocks once as many sessions are starting as the pool holds
+            insp = inspect(connection)
             # If no tables are present on this bind, create them
             if not insp.get_table_names():
                 Base.metadata.create_all(bind=bind)
@@ -127,4 +194,21 @@ def get_db():
 
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    if async_engine is None:
+        raise RuntimeError(f"No async driver available for {ASYNC_DATABASE_URL}; install asyncpg/aiosqlite")
+
+    global _TABLES_CREATED
+    if not _TABLES_CREATED:
+        try:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            _TABLES_CREATED = True
+        except Exception:
+            pass
+
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,170 @@
+import threading
+import time
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional, List, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+logger = logging.getLogger("app_logger")
+
+# Per-request accumulator. The http middleware sets a fresh dict for every request;
+# the dict is shared by reference with the threadpool workers that run sync routes,
+# so mutations made while serving the request are visible when it completes.
+_request_stats: ContextVar[Optional[dict]] = ContextVar("db_request_stats", default=None)
+
+
+def begin_request() -> dict:
+    stats = {"checkout_wait_ms": 0.0, "checkouts": 0, "queries": 0, "db_time_ms": 0.0, "statements": Counter()}
+    _request_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[dict]:
+    return _request_stats.get()
+
+
+# --- Query instrumentation ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start_time")
+    if not started:
+        return
+    elapsed = (time.perf_counter() - started.pop()) * 1000
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    stats["queries"] += 1
+    stats["db_time_ms"] += elapsed
+    # Statements are parameterized, so the SQL text is already the statement "shape"
+    stats["statements"][statement] += 1
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't fire for a failed statement; drop its start time so the
+    # stack stays in step with the statements still running on this pooled connection
+    conn = context.connection
+    if conn is None or context.execution_context is None:
+        return
+    started = conn.info.get("query_start_time")
+    if started:
+        started.pop()
+
+
+def instrument_queries():
+    """Count statements and DB time for every engine (sync, async and test engines alike)."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+def repeated_statements(stats: dict, threshold: int) -> List[Tuple[str, int]]:
+    """Statements that ran more than `threshold` times in one request: likely N+1 loads."""
+    return [(sql, n) for sql, n in stats["statements"].most_common() if n > threshold]
+
+
+def server_timing_header(stats: dict) -> str:
+    return f'db;dur={stats["db_time_ms"]:.2f};desc="{stats["queries"]} queries"'
+
+
+# --- Strict loading ---
+
+def _raise_on_lazy_load(orm_execute_state):
+    # Refreshes and the loads issued for relationships keep their own options; every
+    # other ORM SELECT gets raiseload("*") so touching an unloaded relationship raises
+    # instead of silently issuing another query. Explicit eager loads still win.
+    if orm_execute_state.is_select and not orm_execute_state.is_column_load and not orm_execute_state.is_relationship_load:
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+
+def enable_strict_loading(target=Session):
+    """Make every relationship behave as lazy="raise" for sessions of `target`.
+
+    Opt in with DB_STRICT_LOADING=true, or call directly from tests.
+    """
+    if not event.contains(target, "do_orm_execute", _raise_on_lazy_load):
+        event.listen(target, "do_orm_execute", _raise_on_lazy_load)
+
+
+def disable_strict_loading(target=Session):
+    if event.contains(target, "do_orm_execute", _raise_on_lazy_load):
+        event.remove(target, "do_orm_execute", _raise_on_lazy_load)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection.
+
+    SQLAlchemy has no event that fires before a checkout blocks, so the wait is
+    measured around `_do_get`, which is where QueuePool blocks on its queue.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self._wait_count = 0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+        self._timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._wait_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            waited = (time.perf_counter() - start) * 1000
+            with self._wait_lock:
+                self._wait_count += 1
+                self._wait_total_ms += waited
+                if waited > self._wait_max_ms:
+                    self._wait_max_ms = waited
+            stats = _request_stats.get()
+            if stats is not None:
+                stats["checkout_wait_ms"] += waited
+                stats["checkouts"] += 1
+
+    def wait_stats(self) -> dict:
+        with self._wait_lock:
+            count = self._wait_count
+            return {
+                "count": count,
+                "total_ms": round(self._wait_total_ms, 2),
+                "avg_ms": round(self._wait_total_ms / count, 3) if count else 0.0,
+                "max_ms": round(self._wait_max_ms, 2),
+                "timeouts": self._timeouts,
+            }
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """Checkout timing for the asyncio engine's pool (asyncio-compatible queue)."""
+
+
+def pool_status(engine) -> dict:
+    """Snapshot of the engine's connection pool for the admin endpoint and request logs."""
+    # AsyncEngine exposes its pool through the wrapped sync engine
+    pool = getattr(engine, "sync_engine", engine).pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # QueuePool.overflow() starts at -pool_size; clamp to connections above the base size
+            "overflow": max(pool.overflow(), 0),
+            "timeout_seconds": pool.timeout(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        status["checkout_wait"] = pool.wait_stats()
+    return status
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+import weakref
+import logging
+import os
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core import metrics
+
+logger = logging.getLogger("app_logger")
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5.0"))
+# Concurrent requests allowed to any single host, so one slow endpoint can't take every connection
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("WEBHOOK_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("WEBHOOK_BREAKER_RESET_SECONDS", "60"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open."""
+
+    def __init__(self, key, retry_at: float):
+        super().__init__(f"Circuit open for {key}")
+        self.key = key
+        # time.time() at which a trial request will be let through
+        self.retry_at = retry_at
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open after N failures -> half-open after a cool-down.
+
+    In half-open state a single trial request is allowed; success closes the breaker,
+    failure opens it for another cool-down.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, key, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.time() - self._opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            retry_at = self._opened_at + self.reset_seconds
+        raise CircuitOpenError(self.key, retry_at)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Circuit opened for {self.key} after {self._failures} consecutive failures")
+                self._opened_at = time.time()
+
+
+_breakers_lock = threading.Lock()
+_breakers: dict = {}
+
+
+def get_breaker(key) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(key)
+        return breaker
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _breaker_states() -> dict:
+    levels = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {(("key", str(b.key)),): levels[b.state] for b in breakers}
+
+
+metrics.register_collector("circuit_breaker_state", _breaker_states)
+
+
+class SharedHTTPClient:
+    """One keep-alive httpx.AsyncClient plus per-host concurrency limits.
+
+    httpx connections belong to the event loop that opened them, so there is one
+    instance per loop (see get_http_client).
+    """
+
+    def __init__(self, per_host_limit: int = HTTP_PER_HOST_LIMIT, transport: httpx.AsyncBaseTransport = None):
+        self.client = httpx.AsyncClient(
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=HTTP_TIMEOUT,
+        )
+        self.per_host_limit = per_host_limit
+        self._host_slots: dict = {}
+
+    def _slots(self, host: str) -> asyncio.Semaphore:
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return slots
+
+    async def post(self, url: str, breaker: Optional[CircuitBreaker] = None, **kwargs) -> httpx.Response:
+        """POST through the shared pool. With a breaker, 5xx and transport errors count as failures."""
+        if breaker is not None:
+            breaker.before_call()
+        host = urlsplit(url).netloc
+        async with self._slots(host):
+            metrics.gauge_add("http_client_in_flight", 1, host=host)
+            try:
+                resp = await self.client.post(url, **kwargs)
+            except Exception:
+                metrics.inc("http_client_requests_total", host=host, outcome="error")
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            finally:
+                metrics.gauge_add("http_client_in_flight", -1, host=host)
+
+        metrics.inc("http_client_requests_total", host=host, outcome=str(resp.status_code // 100) + "xx")
+        if breaker is not None:
+            if resp.status_code >= 500 or resp.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        return resp
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SharedHTTPClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> SharedHTTPClient:
+    """The shared client for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = SharedHTTPClient()
+    return client
+
+
+async def close_http_client():
+    """Close the running loop's client; call when the loop's owner shuts down."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
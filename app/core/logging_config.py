@@ -3,6 +3,9 @@ import json
 import os
 from logging.handlers import RotatingFileHandler
 
+# Attributes every LogRecord carries; anything else was passed via `extra=`
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
 # 1. Define the JSON Formatter
 class JsonFormatter(logging.Formatter):
     def format(self, record):
@@ -16,11 +19,16 @@ class JsonFormatter(logging.Formatter):
             "path": getattr(record, "path", "N/A"),
             "method": getattr(record, "method", "N/A"),
         }
+        # Include structured fields passed via `extra=` (request timings, pool stats, ...)
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in log_record:
+                log_record[key] = value
+
         # If there's an exception, add the stack trace
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
             
-        return json.dumps(log_record)
+        return json.dumps(log_record, default=str)
 
 # 2. Setup Function
 def setup_logging():
@@ -0,0 +1,158 @@
+import asyncio
+import time
+import weakref
+import logging
+import os
+from email.message import EmailMessage
+from typing import Optional
+
+import aiosmtplib
+
+from app.core import metrics
+
+logger = logging.getLogger("app_logger")
+
+MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
+MAIL_FROM = os.getenv("MAIL_FROM", "admin@ems-pro.com")
+MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() == "true"
+MAIL_SSL_TLS = os.getenv("MAIL_SSL_TLS", "false").lower() == "true"
+MAIL_TIMEOUT = float(os.getenv("MAIL_TIMEOUT", "30"))
+# Open, authenticated connections kept per event loop
+MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", "4"))
+# Many servers cap messages per session; reconnect before hitting the cap
+MAIL_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("MAIL_MAX_MESSAGES_PER_CONNECTION", "100"))
+# Idle connections older than this are checked with NOOP before reuse
+MAIL_IDLE_CHECK_SECONDS = float(os.getenv("MAIL_IDLE_CHECK_SECONDS", "30"))
+
+
+def build_message(sender: str, recipient: str, subject: str, html: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(html, subtype="html")
+    return message
+
+
+class _Connection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """A small pool of logged-in SMTP connections.
+
+    Sending used to build a FastMail client per message, i.e. connect, STARTTLS and
+    AUTH for every email. Here a connection is opened once and reused until the
+    server drops it or it has sent MAIL_MAX_MESSAGES_PER_CONNECTION messages. Like
+    the HTTP client, connections belong to one event loop (see get_mailer).
+    """
+
+    def __init__(self, hostname: str = None, port: int = None, username: str = None, password: str = None,
+                 sender: str = None, size: int = MAIL_POOL_SIZE, start_tls: bool = None, use_tls: bool = None):
+        self.hostname = hostname or MAIL_SERVER
+        self.port = port or MAIL_PORT
+        self.username = username if username is not None else os.getenv("MAIL_USERNAME")
+        self.password = password if password is not None else os.getenv("MAIL_PASSWORD")
+        self.sender = sender or MAIL_FROM
+        self.start_tls = MAIL_STARTTLS if start_tls is None else start_tls
+        self.use_tls = MAIL_SSL_TLS if use_tls is None else use_tls
+        self.size = size
+        self._idle: list = []
+        self._slots = asyncio.Semaphore(size)
+        self._open = 0
+
+    async def _connect(self) -> _Connection:
+        smtp = aiosmtplib.SMTP(hostname=self.hostname, port=self.port, timeout=MAIL_TIMEOUT,
+                               use_tls=self.use_tls, start_tls=self.start_tls if not self.use_tls else False,
+                               validate_certs=False)
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password or "")
+        self._open += 1
+        metrics.inc("smtp_connections_opened_total")
+        metrics.gauge_set("smtp_connections_open", self._open)
+        return _Connection(smtp)
+
+    async def _discard(self, conn: _Connection):
+        self._open -= 1
+        metrics.gauge_set("smtp_connections_open", self._open)
+        try:
+            await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    async def _acquire(self) -> _Connection:
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.smtp.is_connected or conn.sent >= MAIL_MAX_MESSAGES_PER_CONNECTION:
+                await self._discard(conn)
+                continue
+            if time.monotonic() - conn.last_used > MAIL_IDLE_CHECK_SECONDS:
+                try:
+                    await conn.smtp.noop()
+                except Exception:
+                    await self._discard(conn)
+                    continue
+            return conn
+        return await self._connect()
+
+    def _release(self, conn: _Connection):
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    async def send(self, recipient: str, subject: str, html: str):
+        """Send one HTML message over a pooled connection. Raises on failure so the caller can retry."""
+        message = build_message(self.sender, recipient, subject, html)
+        async with self._slots:
+            conn = await self._acquire()
+            try:
+                await conn.smtp.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # The server closed an idle connection under us; one fresh attempt
+                await self._discard(conn)
+                conn = await self._connect()
+                try:
+                    await conn.smtp.send_message(message)
+                except Exception:
+                    await self._discard(conn)
+                    raise
+            except aiosmtplib.SMTPResponseException:
+                # The message was refused but the session is still usable
+                self._release(conn)
+                metrics.inc("smtp_messages_total", outcome="error")
+                raise
+            except Exception:
+                await self._discard(conn)
+                metrics.inc("smtp_messages_total", outcome="error")
+                raise
+            conn.sent += 1
+            self._release(conn)
+        metrics.inc("smtp_messages_total", outcome="sent")
+
+    async def aclose(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+
+
+_mailers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SMTPPool]" = weakref.WeakKeyDictionary()
+
+
+def get_mailer() -> SMTPPool:
+    """The SMTP pool for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    mailer = _mailers.get(loop)
+    if mailer is None:
+        mailer = _mailers[loop] = SMTPPool()
+    return mailer
+
+
+async def close_mailer():
+    """QUIT the running loop's pooled connections."""
+    mailer: Optional[SMTPPool] = _mailers.pop(asyncio.get_running_loop(), None)
+    if mailer is not None:
+        await mailer.aclose()
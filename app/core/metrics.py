@@ -0,0 +1,93 @@
+import bisect
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Sequence, Tuple
+
+# Process-local metrics registry. Counters, gauges and histograms are keyed by name plus a sorted
+# tuple of label pairs and are safe to update from the event loop, the threadpool that
+# runs sync routes and the background job threads. Exposed at GET /admin/metrics.
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Tuple, float]] = defaultdict(lambda: defaultdict(float))
+_gauges: Dict[str, Dict[Tuple, float]] = defaultdict(lambda: defaultdict(float))
+# Gauges computed on demand (e.g. circuit breaker states) rather than pushed
+_collectors: Dict[str, Callable[[], Dict[Tuple, float]]] = {}
+# Histograms: fixed upper bounds per name, then per label set a count per bucket (+Inf last) and a sum
+_bounds: Dict[str, Tuple[float, ...]] = {}
+_histograms: Dict[str, Dict[Tuple, list]] = defaultdict(dict)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    with _lock:
+        _counters[name][_key(labels)] += value
+
+
+def gauge_add(name: str, value: float, **labels):
+    with _lock:
+        _gauges[name][_key(labels)] += value
+
+
+def gauge_set(name: str, value: float, **labels):
+    with _lock:
+        _gauges[name][_key(labels)] = value
+
+
+def observe(name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels):
+    """Record one value in a histogram; the first call for a name fixes its buckets."""
+    with _lock:
+        bounds = _bounds.setdefault(name, tuple(buckets))
+        series = _histograms[name].get(_key(labels))
+        if series is None:
+            series = _histograms[name][_key(labels)] = [0] * (len(bounds) + 1) + [0.0]
+        series[bisect.bisect_left(bounds, value)] += 1
+        series[-1] += value
+
+
+def register_collector(name: str, fn: Callable[[], Dict[Tuple, float]]):
+    """Register a callable returning {label_tuple: value}, evaluated at snapshot time."""
+    with _lock:
+        _collectors[name] = fn
+
+
+def _series(values: Dict[Tuple, float]) -> list:
+    return [{"labels": dict(labels), "value": value} for labels, value in values.items()]
+
+
+def _histogram_series(bounds: Tuple[float, ...], values: Dict[Tuple, list]) -> list:
+    series = []
+    for labels, counts in values.items():
+        cumulative, buckets = 0, {}
+        for bound, count in zip(list(bounds) + ["+Inf"], counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        series.append({"labels": dict(labels), "buckets": buckets, "count": cumulative, "sum": counts[-1]})
+    return series
+
+
+def snapshot() -> dict:
+    with _lock:
+        counters = {name: _series(values) for name, values in _counters.items()}
+        gauges = {name: _series(values) for name, values in _gauges.items()}
+        histograms = {name: _histogram_series(_bounds[name], values) for name, values in _histograms.items()}
+        collectors = dict(_collectors)
+    for name, fn in collectors.items():
+        try:
+            gauges[name] = _series(fn())
+        except Exception:
+            gauges[name] = []
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def reset():
+    """Clear pushed values (tests and benchmarks)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _bounds.clear()
+        _histograms.clear()
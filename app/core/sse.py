@@ -1,51 +1,534 @@
 import asyncio
+import json
 import logging
-from typing import Dict, List
-from asyncio import Queue
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from starlette.responses import Response
+
+from app.core import metrics
+from app.core.broker import Broker
 
 logger = logging.getLogger(__name__)
 
 # Tunables
-MAX_QUEUE_SIZE = 100
 MAX_CONNECTIONS_PER_USER = 6
+# Events kept per user or topic, shared by all of its connections and used for
+# Last-Event-ID replay; and how many users and topics keep a ring
+REPLAY_BUFFER_SIZE = int(os.getenv("SSE_REPLAY_BUFFER_SIZE", "100"))
+REPLAY_MAX_USERS = int(os.getenv("SSE_REPLAY_MAX_USERS", "10000"))
+# A stream that has sent nothing for this long gets a ping; checked once per tick for all streams
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+HEARTBEAT_TICK_SECONDS = float(os.getenv("SSE_HEARTBEAT_TICK_SECONDS", "1"))
+# What a connection gets when it falls so far behind that events it hasn't read leave the ring:
+#   drop_oldest - skip to the oldest event still buffered; the ones in between are lost
+#   resync      - skip everything buffered and get one {"type": "resync"} event telling it to re-fetch
+#   disconnect  - end the stream with server_disconnect (reason "slow_consumer")
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "resync", "disconnect")
+SLOW_CONSUMER_POLICY = os.getenv("SSE_SLOW_CONSUMER_POLICY", "drop_oldest")
+# Encoded bytes all rings together may hold; past it the least recently used rings lose their oldest events
+MEMORY_BUDGET_BYTES = int(os.getenv("SSE_MEMORY_BUDGET_BYTES", str(64 * 1024 * 1024)))
+
+DELIVERY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+QUEUE_DEPTH_BUCKETS = (0, 1, 10, 50, 100, 1000)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+_id_lock = threading.Lock()
+_last_event_id = 0
+
+
+def next_event_id() -> int:
+    """Strictly increasing event id: microseconds since the epoch, bumped past the
+    previous id when two events land in the same microsecond. Ids are assigned where
+    the event is published, so every worker sees the same id for it."""
+    global _last_event_id
+    with _id_lock:
+        _last_event_id = max(_last_event_id + 1, time.time_ns() // 1000)
+        return _last_event_id
+
+
+def _sse_frame(event_id: Optional[int], data: str, event: str = "message") -> bytes:
+    # json.dumps output has no newlines, so data fits on one line
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+def encode_frame(event_id: Optional[int], message: dict, event: str = "message") -> bytes:
+    """One SSE frame on the wire."""
+    return _sse_frame(event_id, json.dumps(message, default=str), event)
+
+
+# Rings are keyed by user id for personal events and by topic name ("team:3", "task:42") otherwise
+Key = Union[int, str]
+
+
+def team_topic(team_id: int) -> str:
+    return f"team:{team_id}"
+
+
+def task_topic(task_id: int) -> str:
+    return f"task:{task_id}"
+
+
+class Event(NamedTuple):
+    id: Optional[int]
+    message: dict
+    # The SSE frame, and the bare JSON for transports that frame events themselves (WebSocket)
+    frame: bytes
+    data: str
+
+
+def make_event(event_id: Optional[int], message: dict) -> Event:
+    """Serialize a message once for every transport."""
+    data = json.dumps(message, default=str)
+    return Event(event_id, message, _sse_frame(event_id, data), data)
+
+
+PING = Event(None, {"type": "ping"}, b"event: ping\ndata: pong\n\n", '{"type": "ping"}')
+
+
+def _size(event: Event) -> int:
+    return len(event.frame) + len(event.data)
+
+
+def _observe_delivery(event: Event):
+    # Ids are microseconds since the epoch taken at publish time, on whichever worker published
+    metrics.observe("sse_delivery_seconds", max(0.0, time.time() - event.id / 1e6), buckets=DELIVERY_BUCKETS)
+
+
+class _Ring:
+    """Recent events for one key (a user id or a topic), each encoded once, read by every subscriber."""
+
+    def __init__(self, base: int):
+        self.events: deque = deque(maxlen=REPLAY_BUFFER_SIZE)
+        # Every event for this key with an id above base is still in events
+        self.base = base
+        # Sequence number of the next event appended; events[0] has seq total - len(events)
+        self.total = 0
+        self.bytes = 0
+        self.subscribers: List["Subscription"] = []
+
+    def append(self, event: Event) -> int:
+        """Add an event and wake the subscribers. Returns the change in buffered bytes."""
+        delta = _size(event)
+        if len(self.events) == self.events.maxlen:
+            delta -= _size(self.events[0])
+            self.base = max(self.base, self.events[0].id)
+        self.events.append(event)
+        self.total += 1
+        self.bytes += delta
+        for sub in self.subscribers:
+            sub._wakeup.set()
+        return delta
+
+    def trim(self) -> int:
+        """Drop the oldest event (memory budget). Returns the bytes freed."""
+        event = self.events.popleft()
+        self.base = max(self.base, event.id)
+        self.bytes -= _size(event)
+        return _size(event)
+
+    def first_seq(self) -> int:
+        return self.total - len(self.events)
+
+
+class Subscription:
+    """One SSE connection's cursors into the rings it reads: its user's ring plus any topics.
+
+    Broadcasts don't copy anything per connection: each subscription just remembers
+    the sequence number of the next event it will read in each ring, and takes the
+    oldest pending event across them. A reader whose unread events leave a ring is
+    handled by its slow-consumer policy (see SLOW_CONSUMER_POLICIES).
+    """
+
+    def __init__(self, key: Key, ring: _Ring, policy: Optional[str] = None):
+        self.rings: Dict[Key, _Ring] = {}
+        self.cursors: Dict[Key, int] = {}
+        self.add(key, ring)
+        self.policy = policy or SLOW_CONSUMER_POLICY
+        self._wakeup = asyncio.Event()
+        self._control: Optional[dict] = None
+        self._ping = False
+        # Set by the heartbeat wheel
+        self.last_sent = time.monotonic()
+        self.deadline = 0.0
+        self.slot: Optional[set] = None
+
+    def add(self, key: Key, ring: _Ring):
+        """Start reading ring from its next event."""
+        self.rings[key] = ring
+        self.cursors[key] = ring.total
+
+    def remove(self, key: Key) -> Optional[_Ring]:
+        self.cursors.pop(key, None)
+        return self.rings.pop(key, None)
+
+    def depth(self) -> int:
+        """Events waiting to be read across all rings."""
+        return sum(ring.total - self.cursors[key] for key, ring in self.rings.items())
+
+    def empty(self) -> bool:
+        return self._control is None and all(self.cursors[k] >= r.total for k, r in self.rings.items())
+
+    def close(self, message: dict):
+        """Hand the reader a final control message (e.g. server_disconnect)."""
+        self._control = message
+        self._wakeup.set()
+
+    def ping(self):
+        """Queue a keep-alive; sent only if nothing else is waiting."""
+        self._ping = True
+        self._wakeup.set()
+
+    async def next_event(self) -> Event:
+        event = await self._next()
+        self.last_sent = time.monotonic()
+        if event.id is not None:
+            _observe_delivery(event)
+        return event
+
+    def _fell_behind(self, key: Key, ring: _Ring) -> Optional[Event]:
+        """Apply the slow-consumer policy to a cursor pointing before the ring's oldest
+        event. Returns the event to hand out in place of the lost ones, if any."""
+        cursor = self.cursors[key]
+        if self.policy == "drop_oldest":
+            self.cursors[key] = ring.first_seq()
+            lost = ring.first_seq() - cursor
+        else:
+            # Everything still buffered is skipped too: the client re-fetches or reconnects
+            self.cursors[key] = ring.total
+            lost = ring.total - cursor
+        metrics.inc("sse_slow_consumers_total", policy=self.policy)
+        metrics.inc("sse_events_dropped_total", lost, policy=self.policy)
+        logger.warning(f"SSE reader fell behind on {key}; {self.policy}: skipping {lost} events")
+        if self.policy == "resync":
+            return make_event(None, {"type": "resync", "topic": key} if isinstance(key, str) else {"type": "resync"})
+        if self.policy == "disconnect":
+            self.close({"type": "server_disconnect", "reason": "slow_consumer"})
+        return None
+
+    def _take(self) -> Optional[Event]:
+        best_key, best = None, None
+        for key, ring in self.rings.items():
+            cursor = self.cursors[key]
+            if cursor >= ring.total:
+                continue
+            first = ring.first_seq()
+            if cursor < first:
+                replacement = self._fell_behind(key, ring)
+                if replacement is not None or self._control is not None:
+                    return replacement
+                cursor = self.cursors[key]
+                if cursor >= ring.total:
+                    # The budget emptied the ring
+                    continue
+            event = ring.events[cursor - first]
+            if best is None or event.id < best.id:
+                best_key, best = key, event
+        if best is not None:
+            self.cursors[best_key] += 1
+        return best
+
+    async def _next(self) -> Event:
+        while True:
+            event = self._take() if self._control is None else None
+            # Checked after taking too: falling behind may have closed the stream
+            if self._control is not None:
+                message, self._control = self._control, None
+                return make_event(None, message)
+            if event is not None:
+                self._ping = False
+                return event
+            if self._ping:
+                self._ping = False
+                return PING
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def get_event(self) -> Tuple[Optional[int], dict]:
+        event = await self.next_event()
+        return event.id, event.message
+
+    async def get(self) -> dict:
+        return (await self.next_event()).message
+
+    async def next_batch(self, window: float, limit: int) -> List[Event]:
+        """The next event plus whatever else arrives within `window` seconds, up to `limit`
+        events. Pings and control messages are returned on their own."""
+        first = await self.next_event()
+        if first.id is None or limit <= 1:
+            return [first]
+        if window > 0:
+            await asyncio.sleep(window)
+        batch = [first]
+        while len(batch) < limit and self._control is None:
+            event = self._take()
+            if event is None:
+                break
+            batch.append(event)
+        # Whatever was just sent counts as the keep-alive
+        self._ping = False
+        self.last_sent = time.monotonic()
+        for event in batch[1:]:
+            if event.id is not None:
+                _observe_delivery(event)
+        return batch
+
+
+class HeartbeatWheel:
+    """Keep-alives for every open stream from a single timer.
+
+    Streams sit in buckets keyed by when their next ping is due (a timer wheel with
+    HEARTBEAT_TICK_SECONDS resolution). Each tick takes one bucket, pings the streams
+    that have been idle for HEARTBEAT_SECONDS and re-files the rest under their new
+    deadline. Per connection there is no timer and no wait_for task, just a set entry.
+    """
+
+    def __init__(self, interval: float = None, tick: float = None):
+        self.interval = interval or HEARTBEAT_SECONDS
+        self.tick = tick or HEARTBEAT_TICK_SECONDS
+        self.slots: List[Set[Subscription]] = [set() for _ in range(int(self.interval / self.tick) + 2)]
+        self.count = 0
+        self._position: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _file(self, sub: Subscription, deadline: float):
+        sub.deadline = deadline
+        # First tick at or after the deadline, so the stream is due when its bucket comes up
+        sub.slot = self.slots[math.ceil(deadline / self.tick) % len(self.slots)]
+        sub.slot.add(sub)
+
+    def add(self, sub: Subscription):
+        self._file(sub, sub.last_sent + self.interval)
+        self.count += 1
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def remove(self, sub: Subscription):
+        if sub.slot is not None and sub in sub.slot:
+            sub.slot.discard(sub)
+            self.count -= 1
+        sub.slot = None
+
+    def run_due(self, now: float) -> int:
+        """Ping the idle streams in every bucket reached since the last tick. Returns how many were pinged."""
+        position = int(now / self.tick)
+        start = max(self._position + 1, position - len(self.slots) + 1) if self._position is not None else position
+        self._position = position
+        pinged = 0
+        for index in range(start, position + 1):
+            slot = self.slots[index % len(self.slots)]
+            for sub in [sub for sub in slot if sub.deadline <= now]:
+                slot.discard(sub)
+                deadline = sub.last_sent + self.interval
+                if deadline <= now:
+                    sub.ping()
+                    pinged += 1
+                    deadline = now + self.interval
+                self._file(sub, deadline)
+        return pinged
+
+    async def _run(self):
+        while self.count > 0:
+            started = time.monotonic()
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            # How late the tick fired is the event loop's lag while streams are open
+            metrics.observe("event_loop_lag_seconds", max(0.0, now - started - self.tick), buckets=LOOP_LAG_BUCKETS)
+            self.run_due(now)
+
+
+class EventStreamResponse(Response):
+    """text/event-stream response writing pre-encoded frames as they come.
+
+    The stream stops as soon as the server receives the client's http.disconnect,
+    so the frame source doesn't need to poll request.is_disconnected(). `on_close`
+    runs once the response is done, even if the frames were never iterated.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, frames: AsyncIterator[bytes], status_code: int = 200, headers: Optional[dict] = None,
+                 on_close: Optional[Callable[[], Awaitable[None]]] = None):
+        self.frames = frames
+        self.on_close = on_close
+        self.status_code = status_code
+        self.background = None
+        self.init_headers({"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})})
+
+    async def _send_frames(self, send):
+        async for frame in self.frames:
+            await send({"type": "http.response.body", "body": frame, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            streaming = asyncio.ensure_future(self._send_frames(send))
+            watching = asyncio.ensure_future(self._wait_for_disconnect(receive))
+            try:
+                await asyncio.wait({streaming, watching}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in (streaming, watching):
+                    task.cancel()
+                await asyncio.gather(streaming, watching, return_exceptions=True)
+            if not streaming.cancelled() and streaming.exception() is not None:
+                raise streaming.exception()
+        finally:
+            # Runs the generator's cleanup if it was left suspended
+            aclose = getattr(self.frames, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if self.on_close is not None:
+                await self.on_close()
 
 
 class NotificationManager:
-    def __init__(self):
-        # Maps user_id to a list of active connection queues
-        self.active_connections: Dict[int, List[Queue]] = {}
+    def __init__(self, broker: Optional[Broker] = None):
+        # Maps user_id to a list of active connections (Subscription objects)
+        self.active_connections: Dict[int, List[Subscription]] = {}
+        # With a started broker, broadcast() publishes and every worker delivers to its own rings
+        self.broker: Optional[Broker] = None
+        self._pending_broker = broker
+        # Loop owning the rings; deliveries from other threads are handed to it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Recent events per user or topic, least recently used first
+        self._rings: "OrderedDict[Key, _Ring]" = OrderedDict()
+        # Keys without a ring have seen no event above this id since the process started
+        self._floor = next_event_id()
+        # Id of the last event appended to any ring; ids only grow in append order (see _put)
+        self._last_id = self._floor
+        # Encoded bytes held by all rings, kept under MEMORY_BUDGET_BYTES
+        self.buffered_bytes = 0
+        self.heartbeat = HeartbeatWheel()
+
+    async def start(self, broker: Optional[Broker] = None):
+        """Attach to the broker (app startup). Without one, broadcasts stay in this process."""
+        broker = broker or self._pending_broker
+        self._loop = asyncio.get_running_loop()
+        if broker is None:
+            return
+        await broker.start(self.deliver_local)
+        self.broker = broker
 
-    async def connect(self, user_id: int) -> Queue:
+    async def stop(self):
+        broker, self.broker = self.broker, None
+        if broker is not None:
+            await broker.stop()
+
+    def _ring(self, key: Key) -> _Ring:
+        ring = self._rings.get(key)
+        if ring is not None:
+            self._rings.move_to_end(key)
+            return ring
+        ring = self._rings[key] = _Ring(self._floor)
+        # Evict the least recently used rings, but never one a connection is reading
+        for _ in range(len(self._rings)):
+            if len(self._rings) <= REPLAY_MAX_USERS:
+                break
+            evicted_key, evicted = self._rings.popitem(last=False)
+            if evicted.subscribers:
+                self._rings[evicted_key] = evicted
+                continue
+            # base covers events the budget trimmed, even if that left the ring empty
+            self._floor = max(self._floor, evicted.base, evicted.events[-1].id if evicted.events else 0)
+            self.buffered_bytes -= evicted.bytes
+        return ring
+
+    def _enforce_budget(self):
+        """Trim the oldest events of the least recently used rings until the rings hold
+        at most 90% of MEMORY_BUDGET_BYTES, so the walk doesn't repeat on every event.
+        Readers that still needed a trimmed event go through their slow-consumer policy."""
+        target = MEMORY_BUDGET_BYTES * 0.9
+        trimmed = 0
+        for key in list(self._rings):
+            ring = self._rings[key]
+            while ring.events and self.buffered_bytes > target:
+                self.buffered_bytes -= ring.trim()
+                trimmed += 1
+            if not ring.events and not ring.subscribers:
+                del self._rings[key]
+                self._floor = max(self._floor, ring.base)
+            if self.buffered_bytes <= target:
+                break
+        metrics.inc("sse_budget_trimmed_events_total", trimmed)
+        logger.warning(f"SSE buffers over budget; trimmed {trimmed} events")
+
+    def depth_counts(self) -> Dict[Tuple, float]:
+        """Connections by unread events, cumulative per QUEUE_DEPTH_BUCKETS bound (metrics collector)."""
+        depths = [sub.depth() for conns in list(self.active_connections.values()) for sub in list(conns)]
+        bounds = [str(b) for b in QUEUE_DEPTH_BUCKETS] + ["+Inf"]
+        limits = list(QUEUE_DEPTH_BUCKETS) + [math.inf]
+        return {(("le", b),): sum(1 for d in depths if d <= limit) for b, limit in zip(bounds, limits)}
+
+    def _detach(self, sub: Subscription):
+        for ring in sub.rings.values():
+            if sub in ring.subscribers:
+                ring.subscribers.remove(sub)
+        self.heartbeat.remove(sub)
+
+    async def connect(self, user_id: int, topics: Iterable[str] = (), policy: Optional[str] = None) -> Subscription:
         """
-        Create a new bounded queue for a connecting user and return it.
+        Subscribe a connecting client to the user's ring and the given topics, starting
+        with the next event. `policy` overrides SLOW_CONSUMER_POLICY for this connection.
         If too many connections exist for a user, drop the oldest.
         """
-        queue: Queue = Queue(maxsize=MAX_QUEUE_SIZE)
+        if policy is not None and policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self._loop = asyncio.get_running_loop()
+        ring = self._ring(user_id)
+        sub = Subscription(user_id, ring, policy)
+
         conns = self.active_connections.setdefault(user_id, [])
         # Enforce max connections per user
         if len(conns) >= MAX_CONNECTIONS_PER_USER:
             # Drop oldest connection (best-effort)
-            old_queue = conns.pop(0)
-            try:
-                # put a sentinel to encourage disconnect
-                old_queue.put_nowait({"type": "server_disconnect", "reason": "too_many_connections"})
-            except Exception:
-                pass
+            old = conns.pop(0)
+            self._detach(old)
+            # a final message to encourage disconnect
+            old.close({"type": "server_disconnect", "reason": "too_many_connections"})
 
-        conns.append(queue)
+        conns.append(sub)
+        ring.subscribers.append(sub)
+        for topic in topics:
+            self.subscribe(sub, topic)
+        self.heartbeat.add(sub)
         logger.info(f"User {user_id} connected to SSE. Active connections: {len(conns)}")
-        return queue
+        return sub
+
+    def subscribe(self, sub: Subscription, topic: str):
+        """Add a topic (e.g. team_topic(3)) to a connection; authorization is the caller's job."""
+        if topic in sub.rings:
+            return
+        ring = self._ring(topic)
+        sub.add(topic, ring)
+        ring.subscribers.append(sub)
+
+    def unsubscribe(self, sub: Subscription, topic: str):
+        ring = sub.remove(topic)
+        if ring is not None and sub in ring.subscribers:
+            ring.subscribers.remove(sub)
 
-    async def disconnect(self, user_id: int, queue: Queue):
+    async def disconnect(self, user_id: int, sub: Subscription):
         """
-        Remove a queue from the user's active connections.
+        Remove a connection from the user's active connections.
         """
+        self._detach(sub)
         conns = self.active_connections.get(user_id)
         if not conns:
             return
-        if queue in conns:
+        if sub in conns:
             try:
-                conns.remove(queue)
+                conns.remove(sub)
             except ValueError:
                 pass
 
@@ -53,30 +536,73 @@ class NotificationManager:
             self.active_connections.pop(user_id, None)
         logger.info(f"User {user_id} disconnected from SSE. Remaining connections: {len(self.active_connections.get(user_id, []))}")
 
-    async def broadcast(self, user_id: int, message: dict):
+    async def broadcast(self, key: Key, message: dict):
         """
-        Push a message to all active connections for a specific user.
-        This is non-blocking: if a queue is full we drop the oldest item.
+        Push a message to all active connections for a specific user, or to every
+        subscriber of a topic, on every worker when a broker is attached.
         """
-        conns = self.active_connections.get(user_id)
-        if not conns:
-            return
+        event_id = next_event_id()
+        if self.broker is not None:
+            await self.broker.publish(key, message, event_id)
+        else:
+            await self.deliver_local(key, message, event_id)
+
+    async def broadcast_many(self, messages: List[Tuple[Key, dict]]):
+        """Broadcast a batch of (user_id or topic, message) pairs; one broker publish for all of them."""
+        if self.broker is not None:
+            await self.broker.publish_many([(key, message, next_event_id()) for key, message in messages])
+        else:
+            for key, message in messages:
+                await self.broadcast(key, message)
 
-        for queue in list(conns):
+    async def deliver_local(self, key: Key, message: dict, event_id: Optional[int] = None):
+        """Append a message to this process's ring for key (the broker's deliver callback)."""
+        if event_id is None:
+            event_id = next_event_id()
+        loop = self._loop
+        if loop is not None and loop is not asyncio.get_running_loop():
+            # Called from a sync route's helper thread; the rings belong to the serving loop
             try:
-                queue.put_nowait(message)
-            except asyncio.QueueFull:
-                # Drop one item then try again (make space)
-                try:
-                    _ = queue.get_nowait()
-                except Exception:
-                    pass
-                try:
-                    queue.put_nowait(message)
-                except Exception:
-                    logger.warning(f"Dropping message for user {user_id} due to full queue")
-        logger.debug(f"Broadcasted SSE message to user {user_id} on {len(conns)} connections")
+                loop.call_soon_threadsafe(self._put, key, message, event_id)
+            except RuntimeError:
+                pass
+            return
+        self._put(key, message, event_id)
+
+    def replay(self, key: Key, last_event_id: int) -> Optional[List[Tuple[int, dict]]]:
+        """Events for a user or topic after last_event_id, oldest first, or None when some
+        of them are no longer buffered here (the caller falls back to the database, or
+        tells the client to resync a topic)."""
+        ring = self._rings.get(key)
+        base = ring.base if ring is not None else self._floor
+        if last_event_id < base:
+            return None
+        if ring is None:
+            return []
+        return [(e.id, e.message) for e in ring.events if e.id > last_event_id]
+
+    def _put(self, key: Key, message: dict, event_id: int):
+        """
+        Encode the message once and append it to the key's ring; every connection
+        reads the same bytes.
+
+        Publishers stamp ids, but events can arrive out of order (thread handoffs,
+        several publishing workers). One that arrives after a higher id is re-stamped
+        just past it, so across all rings ids follow append order and a cursor or
+        Last-Event-ID past an event never skips one appended later. In the usual
+        in-order case the id is the publisher's, the same on every worker.
+        """
+        event_id = self._last_id = max(event_id, self._last_id + 1)
+        ring = self._ring(key)
+        self.buffered_bytes += ring.append(make_event(event_id, message))
+        if self.buffered_bytes > MEMORY_BUDGET_BYTES:
+            self._enforce_budget()
+        logger.debug(f"Broadcasted SSE message to {key} on {len(ring.subscribers)} connections")
 
 
 # Global instance
 manager = NotificationManager()
+
+metrics.register_collector("sse_buffered_bytes", lambda: {(): manager.buffered_bytes})
+metrics.register_collector("sse_connections", lambda: {(): sum(len(c) for c in list(manager.active_connections.values()))})
+metrics.register_collector("sse_queue_depth", manager.depth_counts)
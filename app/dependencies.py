@@ -3,15 +3,17 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from jose.exceptions import ExpiredSignatureError
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import ALGORITHM, SECRET_KEY
-from app.services.user import get_user_by_email
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
+from app.core import security
+from app.services.user import get_user_by_email, get_user_by_email_async
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_token_subject(token: str) -> str:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Read at call time, like create_access_token, so both always use the same key
+        payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token: missing subject")
@@ -20,8 +22,21 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError as e:
         # include message to aid debugging (avoid printing token itself)
         raise HTTPException(status_code=401, detail=f"Token error: {str(e)}")
-    
+    return email
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    email = decode_token_subject(token)
+
     user = get_user_by_email(db, email=email)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Async twin of get_current_user for routes running on the AsyncSession path."""
+    email = decode_token_subject(token)
+
+    user = await get_user_by_email_async(db, email=email)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
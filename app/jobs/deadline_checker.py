@@ -5,7 +5,7 @@ from typing import Optional
 from app.core.database import SessionLocal
 from app.models.task import Task
 from app.models.notification import Notification
-from app.services.notification import create_in_app_notification
+from app.services.notification import create_in_app_notifications
 import logging
 import os
 from datetime import timedelta
@@ -15,8 +15,12 @@ logger = logging.getLogger(__name__)
 
 def _check_deadlines_once(db):
     now = datetime.now(timezone.utc)
+    # Everything this pass sends goes out as one bulk insert at the end; admins get
+    # broadcast rows addressed to the role rather than a row each
+    recipients = []
+    broadcasts = []
     # Overdue tasks
-    overdue = db.query(Task).filter(Task.deadline != None).filter(Task.deadline < now).all()
+    overdue = db.query(Task).filter(Task.deadline != None).filter(Task.completed_at == None).filter(Task.deadline < now).all()
     for task in overdue:
         # skip completed
         if getattr(task, "completed_at", None) or str(getattr(task, "status", "")).lower() == "completed":
@@ -29,19 +33,17 @@ def _check_deadlines_once(db):
             # notify assignee
             if task.user_id:
                 if not exists:
-                    create_in_app_notification(db, task.user_id, "Task Overdue", msg)
+                    recipients.append((task.user_id, "Task Overdue", msg))
 
             # notify manager(s) and admins
             # Managers and admins are handled by task service's existing helpers; fallback: notify all admins
-            from app.models.user import User
-            admins = db.query(User).filter(User.role == "admin").all()
-            for a in admins:
-                create_in_app_notification(db, a.id, "Member Task Overdue", f"{task.title} overdue for user {task.user_id}")
+            broadcasts.append({"target_role": "admin", "title": "Member Task Overdue", "message": f"{task.title} overdue for user {task.user_id}"})
 
             logger.info("Created overdue notification for task %s", task.id)
         except Exception as e:
             logger.exception("Failed to create overdue notifications: %s", e)
 
+
     # Approaching deadlines: within threshold hours but not yet overdue
     try:
         threshold_hours = int(os.getenv("DEADLINE_APPROACH_HOURS", "24"))
@@ -49,7 +51,7 @@ def _check_deadlines_once(db):
         threshold_hours = 24
 
     window_end = now + timedelta(hours=threshold_hours)
-    approaching = db.query(Task).filter(Task.deadline != None).filter(Task.deadline >= now).filter(Task.deadline <= window_end).all()
+    approaching = db.query(Task).filter(Task.deadline != None).filter(Task.completed_at == None).filter(Task.deadline >= now).filter(Task.deadline <= window_end).all()
     for task in approaching:
         # skip completed
         if getattr(task, "completed_at", None) or str(getattr(task, "status", "")).lower() == "completed":
@@ -60,21 +62,20 @@ def _check_deadlines_once(db):
         try:
             msg = f"Task nearing deadline: {task.title}. Deadline at {task.deadline}"
             if task.user_id and not exists_app:
-                create_in_app_notification(db, task.user_id, "Task Nearing Deadline", msg)
+                recipients.append((task.user_id, "Task Nearing Deadline", msg))
 
             # notify manager and admins as well
-            from app.models.user import User
             if task.team_id:
                 team = db.query(__import__("app.models.team", fromlist=["Team"]).Team).filter(__import__("app.models.team", fromlist=["Team"]).Team.id == task.team_id).first()
                 if team and team.manager_id:
-                    create_in_app_notification(db, team.manager_id, "Team Member Nearing Deadline", f"{task.title} is nearing deadline for member {task.user_id}")
+                    recipients.append((team.manager_id, "Team Member Nearing Deadline", f"{task.title} is nearing deadline for member {task.user_id}"))
 
-            admins = db.query(User).filter(User.role == "admin").all()
-            for a in admins:
-                create_in_app_notification(db, a.id, "Member Nearing Deadline", f"{task.title} is nearing its deadline")
+            broadcasts.append({"target_role": "admin", "title": "Member Nearing Deadline", "message": f"{task.title} is nearing its deadline"})
         except Exception as e:
             logger.exception("Failed to create approaching deadline notifications: %s", e)
 
+    create_in_app_notifications(db, recipients, broadcasts=broadcasts)
+
 
 def run_deadline_checker(interval_seconds: int = 300, stop_event: Optional[threading.Event] = None):
     """Run periodic deadline checks. Call from a background thread or startup event."""
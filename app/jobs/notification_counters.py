@@ -0,0 +1,40 @@
+import threading
+from typing import Optional
+from app.core.database import SessionLocal
+from app.services.notification import reconcile_unread_counts
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("UNREAD_COUNTER_RECONCILE_SECONDS", "3600"))
+
+
+def _reconcile_counters_once(db):
+    repaired = reconcile_unread_counts(db)
+    if repaired:
+        # Drift means a write path skipped the counter; log it so it can be tracked down
+        logger.warning("Repaired %s drifted unread counters: %s", len(repaired), repaired)
+    return repaired
+
+
+def run_counter_reconciler(interval_seconds: int = RECONCILE_INTERVAL_SECONDS, stop_event: Optional[threading.Event] = None):
+    """Periodically repair unread counters. Call from a background thread."""
+    if stop_event is None:
+        stop_event = threading.Event()
+
+    while not stop_event.wait(interval_seconds):
+        db = SessionLocal()
+        try:
+            _reconcile_counters_once(db)
+        except Exception as e:
+            logger.exception("Unread counter reconcile failed: %s", e)
+        finally:
+            db.close()
+
+
+def start_in_thread(interval_seconds: int = RECONCILE_INTERVAL_SECONDS):
+    stop_event = threading.Event()
+    t = threading.Thread(target=run_counter_reconciler, args=(interval_seconds, stop_event), daemon=True)
+    t.start()
+    return stop_event
@@ -0,0 +1,174 @@
+import asyncio
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, and_, or_
+from app.core.database import SessionLocal
+from app.core.http_client import CircuitOpenError, close_http_client
+from app.core.mailer import close_mailer
+from app.core import metrics
+from app.models.notification import NotificationOutbox
+from app.services.notification import deliver_email, deliver_webhook, log_notification, outbox_wakeup, render_digest
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "10"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+BASE_DELAY = float(os.getenv("OUTBOX_BASE_DELAY", "2.0"))
+MAX_DELAY = float(os.getenv("OUTBOX_MAX_DELAY", "900"))
+# A claimed row whose worker died becomes claimable again after this lease runs out
+LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: half the step is fixed, half is random."""
+    step = min(BASE_DELAY * (2 ** max(attempts - 1, 0)), MAX_DELAY)
+    return step / 2 + random.uniform(0, step / 2)
+
+
+def claim_batch(db, batch_size: int = BATCH_SIZE) -> list:
+    """Claim up to batch_size due rows, most urgent first.
+
+    FOR UPDATE SKIP LOCKED lets several dispatchers drain the same table without
+    handing out a row twice (SQLite ignores it; there is only one writer anyway).
+    """
+    now = datetime.now(timezone.utc)
+    stmt = (
+        select(NotificationOutbox)
+        .where(or_(
+            and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now),
+            and_(NotificationOutbox.status == "processing", NotificationOutbox.locked_until < now),
+        ))
+        .order_by(NotificationOutbox.priority, NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(stmt).scalars().all()
+    for row in rows:
+        row.status = "processing"
+        row.locked_until = now + timedelta(seconds=LEASE_SECONDS)
+        row.attempts += 1
+    db.commit()
+    return [(r.id, r.kind, r.user_id, r.team_id, r.subject, r.payload, r.attempts, r.event) for r in rows]
+
+
+async def _deliver(item, session_factory, semaphore):
+    """Deliver one claimed row. Returns None on success, the error text, or the
+    CircuitOpenError when the endpoint's breaker refused the call."""
+    row_id, kind, user_id, team_id, subject, payload, attempts, event = item
+    async with semaphore:
+        try:
+            # The senders open their own short sessions, so none is held across the network call
+            if kind == "EMAIL":
+                body = render_digest(payload) if event == "digest" else payload
+                await deliver_email(session_factory, user_id, subject, body)
+            elif kind == "WEBHOOK":
+                await deliver_webhook(session_factory, team_id, payload)
+            else:
+                return f"Unknown outbox kind {kind}"
+            return None
+        except CircuitOpenError as e:
+            return e
+        except Exception as e:
+            logger.warning(f"Outbox {kind} {row_id} attempt {attempts} failed: {e}")
+            return str(e) or type(e).__name__
+
+
+def _record_results(db, items: list, errors: list) -> dict:
+    now = datetime.now(timezone.utc)
+    stats = {"sent": 0, "retried": 0, "dead": 0, "deferred": 0}
+    for item, error in zip(items, errors):
+        row = db.get(NotificationOutbox, item[0])
+        if row is None:
+            continue
+        row.locked_until = None
+        if isinstance(error, CircuitOpenError):
+            # Not the row's fault: wait for the breaker's trial window without spending an attempt
+            row.status = "pending"
+            row.attempts = max(row.attempts - 1, 0)
+            row.next_attempt_at = datetime.fromtimestamp(error.retry_at, timezone.utc) + timedelta(seconds=random.uniform(0, 1))
+            stats["deferred"] += 1
+        elif error is None:
+            row.status = "sent"
+            row.sent_at = now
+            row.last_error = None
+            stats["sent"] += 1
+        elif row.attempts >= MAX_ATTEMPTS:
+            row.status = "dead"
+            row.last_error = error
+            stats["dead"] += 1
+            log_notification(db, user_id=row.user_id, team_id=row.team_id, type=row.kind, status="DEAD", payload=row.payload, error=error)
+        else:
+            row.status = "pending"
+            row.last_error = error
+            row.next_attempt_at = now + timedelta(seconds=backoff_delay(row.attempts))
+            stats["retried"] += 1
+    db.commit()
+    for outcome in ("sent", "retried", "dead", "deferred"):
+        if stats[outcome]:
+            metrics.inc("outbox_deliveries_total", stats[outcome], outcome=outcome)
+    return stats
+
+
+async def dispatch_once(session_factory=SessionLocal, batch_size: int = BATCH_SIZE) -> dict:
+    """Claim one batch, deliver it concurrently and record the outcomes."""
+    db = session_factory()
+    try:
+        items = claim_batch(db, batch_size)
+    finally:
+        db.close()
+    if not items:
+        return {"claimed": 0, "sent": 0, "retried": 0, "dead": 0, "deferred": 0}
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    errors = await asyncio.gather(*(_deliver(item, session_factory, semaphore) for item in items))
+
+    db = session_factory()
+    try:
+        stats = _record_results(db, items, errors)
+    finally:
+        db.close()
+    stats["claimed"] = len(items)
+    return stats
+
+
+def run_dispatcher(poll_seconds: float = POLL_SECONDS, stop_event: Optional[threading.Event] = None):
+    """Drain the outbox until stopped. Call from a background thread."""
+    if stop_event is None:
+        stop_event = threading.Event()
+
+    async def _loop():
+        while not stop_event.is_set():
+            try:
+                stats = await dispatch_once()
+            except Exception as e:
+                logger.exception("Outbox dispatch failed: %s", e)
+                stats = {"claimed": 0}
+            # A full batch means there is probably more waiting; go again right away
+            if stats["claimed"] >= BATCH_SIZE:
+                continue
+            await asyncio.to_thread(outbox_wakeup.wait, poll_seconds)
+            outbox_wakeup.clear()
+        # The shared HTTP client and SMTP pool live as long as this loop
+        await close_http_client()
+        await close_mailer()
+
+    asyncio.run(_loop())
+
+
+def start_in_thread(poll_seconds: float = POLL_SECONDS):
+    stop_event = threading.Event()
+    t = threading.Thread(target=run_dispatcher, args=(poll_seconds, stop_event), daemon=True)
+    t.start()
+    return stop_event
+
+
+def stop(stop_event: threading.Event):
+    stop_event.set()
+    # Unblock the wait so the loop notices promptly
+    outbox_wakeup.set()
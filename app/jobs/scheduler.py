@@ -1,6 +1,7 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.core.database import SessionLocal
 from app.jobs.deadline_checker import _check_deadlines_once
+from app.jobs.notification_counters import _reconcile_counters_once, RECONCILE_INTERVAL_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +20,17 @@ def start_scheduler(interval_seconds: int = 300):
         finally:
             db.close()
 
+    def _reconcile_job():
+        db = SessionLocal()
+        try:
+            _reconcile_counters_once(db)
+        except Exception as e:
+            logger.exception("Scheduled unread counter reconcile failed: %s", e)
+        finally:
+            db.close()
+
     sched.add_job(_job, "interval", seconds=interval_seconds, id="deadline_checker", replace_existing=True)
+    sched.add_job(_reconcile_job, "interval", seconds=RECONCILE_INTERVAL_SECONDS, id="unread_counter_reconcile", replace_existing=True)
     sched.start()
     logger.info("APScheduler started for deadline_checker every %s seconds", interval_seconds)
     return sched
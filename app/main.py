@@ -8,10 +8,13 @@ from app.routes import task as task_router
 from app.routes import team as team_router
 from app.core.exceptions import add_exception_handlers
 from app.core.logging_config import logger
+from app.core import db_metrics
 # Database initialization is now handled via Alembic migrations in start.sh
 # Base.metadata.create_all(bind=engine)
 from app.middleware.rate_limiter import SimpleRateLimitMiddleware
 from app.jobs.deadline_checker import start_in_thread
+from app.jobs.notification_counters import start_in_thread as start_counter_reconciler
+from app.jobs import outbox_dispatcher
 # Scheduler (APScheduler) is optional. If available, prefer it for more robust scheduling.
 try:
     from app.jobs.scheduler import start_scheduler, stop_scheduler
@@ -27,14 +30,28 @@ app.add_middleware(SimpleRateLimitMiddleware)
 
 print("--- APP STARTUP: LOGGING INITIALIZED ---") # Sanity check for stdout
 
+# Warn when one statement shape repeats more than this many times in a request
+N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "10"))
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
+    db_stats = db_metrics.begin_request()
     
     # Process the request
     response = await call_next(request)
     
     process_time = (time.time() - start_time) * 1000  # ms
+    pool = db_metrics.pool_status(engine)
+
+    response.headers["X-DB-Queries"] = str(db_stats["queries"])
+    response.headers["Server-Timing"] = db_metrics.server_timing_header(db_stats)
+
+    for statement, count in db_metrics.repeated_statements(db_stats, N_PLUS_ONE_THRESHOLD):
+        logger.warning(
+            f"Possible N+1: statement ran {count} times in {request.method} {request.url.path}: {statement[:200]}",
+            extra={"method": request.method, "path": request.url.path, "repeat_count": count}
+        )
     
     # Log the request details
     log_data = {
@@ -42,11 +59,17 @@ async def log_requests(request: Request, call_next):
         "path": request.url.path,
         "status_code": response.status_code,
         "duration_ms": round(process_time, 2),
-        "ip": request.client.host
+        "ip": request.client.host,
+        "db_queries": db_stats["queries"],
+        "db_time_ms": round(db_stats["db_time_ms"], 2),
+        "db_checkout_wait_ms": round(db_stats["checkout_wait_ms"], 2),
+        "db_pool_checked_out": pool.get("checked_out"),
+        "db_pool_idle": pool.get("idle"),
+        "db_pool_overflow": pool.get("overflow"),
     }
     
     logger.info(
-        f"{request.method} {request.url.path} completed in {process_time:.2f}ms | Status: {response.status_code}",
+        f"{request.method} {request.url.path} completed in {process_time:.2f}ms | Status: {response.status_code} | DB: {db_stats['queries']} queries in {db_stats['db_time_ms']:.2f}ms",
         extra=log_data
     )
     
@@ -66,6 +89,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], 
     allow_headers=["*"], 
+    # Pagination and timing headers must be exposed for browsers to read them
+    expose_headers=["X-Next-Cursor", "X-Sync-Cursor", "X-Total-Estimate", "X-DB-Queries", "Server-Timing"],
 )
 
 @app.get("/")
@@ -80,6 +105,8 @@ app.include_router(team_router.router, prefix="/teams", tags=["Teams"])
 app.include_router(notification_router.router, prefix="/notifications", tags=["Notifications"])
 from app.routes import report as report_router
 app.include_router(report_router.router, prefix="/reports", tags=["Reports"])
+from app.routes import ws as ws_router
+app.include_router(ws_router.router, tags=["WebSocket"])
 
 
 @app.on_event("startup")
@@ -95,14 +122,45 @@ def _start_background_jobs():
                 except Exception:
                     # Fallback to simple thread if scheduler fails
                     app.state._deadline_stop = start_in_thread(interval_seconds=interval)
+                    app.state._counter_stop = start_counter_reconciler()
                     logger.info("Fallback deadline checker thread started with interval %s seconds", interval)
             else:
                 app.state._deadline_stop = start_in_thread(interval_seconds=interval)
+                app.state._counter_stop = start_counter_reconciler()
                 logger.info("Deadline checker started with interval %s seconds", interval)
+
+        # Email/webhook outbox dispatcher; run it in every API process or in a dedicated worker
+        if os.getenv("ENABLE_OUTBOX_DISPATCHER", "true").lower() in ("1", "true", "yes"):
+            app.state._outbox_stop = outbox_dispatcher.start_in_thread()
+            logger.info("Outbox dispatcher started")
     except Exception as e:
         logger.exception("Failed to start background jobs: %s", e)
 
 
+@app.on_event("startup")
+async def _start_sse_broker():
+    # Cross-worker SSE fan-out (SSE_BROKER=postgres); falls back to this process only
+    from app.core.sse import manager
+    from app.core.broker import create_broker, InMemoryBroker
+    try:
+        await manager.start(create_broker())
+    except Exception as e:
+        logger.exception("SSE broker failed to start, delivering in-process only: %s", e)
+        await manager.start(InMemoryBroker())
+
+
+@app.on_event("shutdown")
+async def _stop_sse_broker():
+    from app.core.sse import manager
+    await manager.stop()
+
+
+@app.on_event("shutdown")
+async def _close_http_client():
+    from app.core.http_client import close_http_client
+    await close_http_client()
+
+
 @app.on_event("shutdown")
 def _stop_background_jobs():
     try:
@@ -110,6 +168,12 @@ def _stop_background_jobs():
         if stop:
             stop.set()
             logger.info("Deadline checker stop requested")
+        counter_stop = getattr(app.state, "_counter_stop", None)
+        if counter_stop:
+            counter_stop.set()
+        outbox_stop = getattr(app.state, "_outbox_stop", None)
+        if outbox_stop:
+            outbox_dispatcher.stop(outbox_stop)
         sched = getattr(app.state, "_apscheduler", None)
         if sched:
             try:
@@ -118,3 +182,10 @@ def _stop_background_jobs():
                 pass
     except Exception:
         pass
+
+
+@app.on_event("shutdown")
+def _flush_notification_log():
+    # Runs after the background jobs are told to stop, so their last delivery logs are written too
+    from app.services.notification_log import notification_log_writer
+    notification_log_writer.stop()
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from datetime import datetime
 
 class TaskHistory(Base):
     __tablename__ = "task_history"
+    __table_args__ = (
+        Index("ix_task_history_task_timestamp", "task_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     action = Column(String, nullable=False) # e.g., "created", "status_change", "reassigned"
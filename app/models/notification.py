@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Index, LargeBinary, text
 from datetime import datetime, timezone
 from app.core.database import Base
 
@@ -11,16 +11,97 @@ class NotificationLog(Base):
     
     type = Column(String, nullable=False) # EMAIL, WEBHOOK
     status = Column(String, nullable=False) # SENT, FAILED
-    payload = Column(Text, nullable=True) # JSON payload or message body
+    payload = Column(Text, nullable=True) # Legacy inline payload; new rows use payload_hash
+    payload_hash = Column(String(64), ForeignKey("notification_payloads.hash"), nullable=True, index=True)
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+class NotificationPayload(Base):
+    """Log payloads stored once, keyed by the SHA-256 of the text and zlib-compressed.
+
+    Every delivery of the same email body or webhook JSON points at one row here.
+    """
+    __tablename__ = "notification_payloads"
+
+    hash = Column(String(64), primary_key=True)
+    body = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False) # Uncompressed length in bytes
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
 class Notification(Base):
+    """An in-app notification.
+
+    Personal rows set user_id and track is_read on the row. Broadcast rows leave user_id
+    empty and target a role or a team instead; they are written once and merged into each
+    recipient's inbox on read, with per-user read state kept sparsely in NotificationRead.
+    """
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+        Index("ix_notifications_user_unread", "user_id", postgresql_where=text("is_read = false"), sqlite_where=text("is_read = 0")),
+        Index("ix_notifications_role_created", "target_role", "created_at"),
+        Index("ix_notifications_team_created", "target_team_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Null for broadcast rows
+    target_role = Column(String, nullable=True) # Broadcast to every user with this role
+    target_team_id = Column(Integer, ForeignKey("teams.id"), nullable=True) # Broadcast to every member of this team
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Excluded from its own broadcast
     title = Column(String, nullable=False)
     message = Column(Text, nullable=False)
-    is_read = Column(Boolean, default=False)
+    is_read = Column(Boolean, default=False) # Personal rows only
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class NotificationRead(Base):
+    """Per-user read state for broadcast notifications. A missing row means unread."""
+    __tablename__ = "notification_reads"
+
+    notification_id = Column(Integer, ForeignKey("notifications.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    read_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    dismissed = Column(Boolean, nullable=False, default=False) # Deleted from this user's inbox
+
+class NotificationCounter(Base):
+    """Denormalized unread count per user, kept in step with `notifications` by the notification service.
+
+    The reconcile job in app/jobs/notification_counters.py repairs any drift.
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+class NotificationOutbox(Base):
+    """Transactional outbox for email and webhook delivery.
+
+    Rows are added in the same commit as the change that caused them and drained by
+    app/jobs/outbox_dispatcher.py, so a crash or restart never loses a delivery.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Claim order for the dispatcher; only undelivered rows are indexed
+        Index("ix_notification_outbox_claim", "priority", "next_attempt_at",
+              postgresql_where=text("status IN ('pending', 'processing')"), sqlite_where=text("status IN ('pending', 'processing')")),
+        # Open coalescing windows looked up by enqueue_webhook
+        Index("ix_notification_outbox_dedupe", "dedupe_key",
+              postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False) # EMAIL, WEBHOOK
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True) # EMAIL recipient
+    team_id = Column(Integer, ForeignKey("teams.id", ondelete="CASCADE"), nullable=True) # WEBHOOK owner
+    event = Column(String, nullable=True) # Webhook event name
+    dedupe_key = Column(String, nullable=True) # Events with the same key are merged while the row is held
+    subject = Column(String, nullable=True) # Email subject
+    payload = Column(Text, nullable=False) # Email body or webhook data as JSON
+    priority = Column(Integer, nullable=False, default=5) # Lower is dispatched first
+    status = Column(String, nullable=False, default="pending") # pending, processing, sent, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    locked_until = Column(DateTime(timezone=True), nullable=True) # Lease for a claimed row
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,19 +1,23 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Deadline checker only scans tasks that are still open
+        Index("ix_tasks_deadline_open", "deadline", postgresql_where=text("completed_at IS NULL"), sqlite_where=text("completed_at IS NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(String)
     status = Column(String, default="Open")
     priority = Column(String, default="Medium")
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True) # Nullable if assigned to team but not specific user yet
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True) # Nullable if assigned to team but not specific user yet
     owner = relationship("User", back_populates="tasks")
     
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True, index=True)
     team = relationship("Team", back_populates="tasks")
     
     subtasks = relationship("SubTask", back_populates="task", cascade="all, delete-orphan")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String , Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String , Boolean, ForeignKey, Date, DateTime
+from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -9,13 +10,17 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
-    role = Column(String, nullable=False, default="employee")
+    role = Column(String, nullable=False, default="employee", index=True)
     is_active = Column(Boolean, default=False)
     email_notifications = Column(Boolean, default=True, nullable=False)
+    email_digest = Column(Boolean, default=False, nullable=False) # Batch assignment emails into a periodic digest
     dob = Column(Date, nullable=True) 
     mobile_number = Column(String, nullable=True)
     team_name = Column(String, nullable=True)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True, index=True)
+    # Bound which role and team broadcasts a user sees; null for accounts that predate them
+    created_at = Column(DateTime(timezone=True), nullable=True, default=lambda: datetime.now(timezone.utc))
+    team_joined_at = Column(DateTime(timezone=True), nullable=True, default=lambda: datetime.now(timezone.utc))
     
     # Relationships
     team = relationship("Team", foreign_keys=[team_id], back_populates="members")
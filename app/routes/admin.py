@@ -115,3 +115,58 @@ def reset_user_password(id: int, db: Session = Depends(get_db), current_user: Us
     db.commit()
     
     return {"message": "Password reset successful", "temp_password": temp_password}
+
+@router.get("/db-pool")
+def get_db_pool_status(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from app.core.database import engine, async_engine
+    from app.core.db_metrics import pool_status
+    status = pool_status(engine)
+    if async_engine is not None:
+        status["async"] = pool_status(async_engine)
+    return status
+
+@router.get("/metrics")
+def get_metrics(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from app.core import metrics
+    return metrics.snapshot()
+
+@router.get("/outbox")
+def get_outbox_status(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from sqlalchemy import func
+    from app.models.notification import NotificationOutbox
+    counts = dict(db.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(NotificationOutbox.status).all())
+    oldest = db.query(func.min(NotificationOutbox.created_at)).filter(NotificationOutbox.status == "pending").scalar()
+    dead = db.query(NotificationOutbox).filter(NotificationOutbox.status == "dead") \
+        .order_by(NotificationOutbox.id.desc()).limit(20).all()
+    return {
+        "counts": counts,
+        "oldest_pending_at": oldest,
+        "dead": [{"id": d.id, "kind": d.kind, "attempts": d.attempts, "last_error": d.last_error, "created_at": d.created_at} for d in dead],
+    }
+
+@router.post("/outbox/{outbox_id}/retry")
+def retry_outbox_item(outbox_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    from datetime import datetime, timezone
+    from app.models.notification import NotificationOutbox
+    from app.services.notification import outbox_wakeup
+    row = db.query(NotificationOutbox).filter(NotificationOutbox.id == outbox_id, NotificationOutbox.status == "dead").first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Dead outbox item not found")
+    row.status = "pending"
+    row.attempts = 0
+    row.next_attempt_at = datetime.now(timezone.utc)
+    db.commit()
+    outbox_wakeup.set()
+    return {"status": "requeued", "id": row.id}
@@ -5,7 +5,7 @@ from app.schemas.user import UserCreate, UserResponse
 from app.services.user import create_user, get_user_by_email, delete_user, get_user_by_username_or_email
 from fastapi.security import OAuth2PasswordRequestForm
 from app.core.security import verify_password, create_access_token
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_current_user_async
 from app.models.user import User
 from datetime import timedelta
 from pydantic import BaseModel, EmailStr
@@ -81,7 +81,7 @@ def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db
     return {"message": "Password reset request submitted."}
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user_async)):
     return current_user
 
 @router.delete("/{user_id}")
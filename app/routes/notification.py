@@ -1,81 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Response, BackgroundTasks
+from typing import List, Optional
+from functools import partial
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
 from app.schemas.notification import NotificationResponse
 from app.models.notification import Notification
 from app.models.user import User
-from jose import jwt, JWTError
-from jose.exceptions import ExpiredSignatureError
-from app.core.security import SECRET_KEY, ALGORITHM
-from app.services.user import get_user_by_email
-
-from app.core.sse import manager
-from fastapi.responses import StreamingResponse
-import asyncio
-import json
+from app.services.user import get_user_by_email_async
+from app.services.task import can_subscribe_async
+
+from app.core.sse import manager, encode_frame, EventStreamResponse, SLOW_CONSUMER_POLICIES
 from pydantic import BaseModel
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_current_user_async, decode_token_subject
+from app.services.notification import (
+    get_notifications_for_user_async, get_unread_count_async, mark_notification_read,
+    mark_all_notifications_read, delete_notification, push_unread_count, stream_backlog,
+)
 
 
 class NotificationPreferences(BaseModel):
     email_notifications: bool
+    email_digest: Optional[bool] = None
 
 router = APIRouter()
 
 @router.get("/", response_model=List[NotificationResponse])
-def get_my_notifications(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_my_notifications(
+    response: Response,
+    cursor: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    rows = db.query(Notification).filter(Notification.user_id == current_user.id).order_by(Notification.created_at.desc()).all()
-
-    # Convert created_at to server local timezone before returning so clients see local times
-    results = []
-    for n in rows:
-        try:
-            local_ts = n.created_at.astimezone()
-        except Exception:
-            local_ts = n.created_at
-
-        results.append({
-            "id": n.id,
-            "user_id": n.user_id,
-            "title": n.title,
-            "message": n.message,
-            "is_read": n.is_read,
-            "created_at": local_ts
-        })
-
-    return results
+    # Newest first, keyset-paginated via X-Next-Cursor. Keep X-Sync-Cursor from the first
+    # page and pass it back as `since` to fetch only notifications created after it.
+    try:
+        notifications, next_cursor, sync_cursor = await get_notifications_for_user_async(
+            db, current_user, cursor=cursor, since=since, limit=limit, unread_only=unread_only
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if sync_cursor:
+        response.headers["X-Sync-Cursor"] = sync_cursor
+    return notifications
+
+@router.get("/unread-count")
+async def get_my_unread_count(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Served from the per-user counter; the stream also pushes it on every change
+    return {"unread_count": await get_unread_count_async(db, current_user.id)}
 
 @router.put("/{notification_id}/read")
 def mark_notification_as_read(
     notification_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    notif = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == current_user.id).first()
-    if not notif:
+    count = mark_notification_read(db, current_user, notification_id)
+    if count is None:
         raise HTTPException(status_code=404, detail="Notification not found")
-    
-    notif.is_read = True
-    db.commit()
-    return {"status": "success"}
+
+    push_unread_count(current_user.id, count, background_tasks)
+    return {"status": "success", "unread_count": count}
 
 @router.put("/read-all")
 def mark_all_as_read(
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db.query(Notification).filter(Notification.user_id == current_user.id, Notification.is_read == False).update({Notification.is_read: True})
-    db.commit()
-    return {"status": "success"}
+    count = mark_all_notifications_read(db, current_user)
+    push_unread_count(current_user.id, count, background_tasks)
+    return {"status": "success", "unread_count": count}
+
+@router.delete("/{notification_id}")
+def delete_my_notification(
+    notification_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    count = delete_notification(db, current_user, notification_id)
+    if count is None:
+        raise HTTPException(status_code=404, detail="Notification not found")
+
+    push_unread_count(current_user.id, count, background_tasks)
+    return {"status": "success", "unread_count": count}
 
 
 @router.get("/preferences")
 def get_preferences(current_user: User = Depends(get_current_user)):
-    return {"email_notifications": current_user.email_notifications}
+    return {"email_notifications": current_user.email_notifications, "email_digest": current_user.email_digest}
 
 
 @router.put("/preferences")
@@ -84,14 +108,23 @@ def update_preferences(prefs: NotificationPreferences, current_user: User = Depe
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.email_notifications = bool(prefs.email_notifications)
+    if prefs.email_digest is not None:
+        user.email_digest = prefs.email_digest
     db.commit()
-    return {"status": "success", "email_notifications": user.email_notifications}
+    return {"status": "success", "email_notifications": user.email_notifications, "email_digest": user.email_digest}
 
 @router.get("/stream")
-async def stream_notifications(request: Request, db: Session = Depends(get_db)):
+async def stream_notifications(request: Request, adb: AsyncSession = Depends(get_async_db, scope="function")):
     """
     SSE Endpoint for real-time notifications.
     Supports `Authorization: Bearer <token>` header and legacy `?token=` query param for compatibility.
+    Every event carries an `id:`; a reconnect with `Last-Event-ID` (or `?last_event_id=`) gets only
+    the events it missed, from the replay buffer or, if that has been overrun, from the database.
+    `?topics=team:3,task:42` adds task board events (task_created / task_updated / task_deleted)
+    for topics the user may see. `?overflow=drop_oldest|resync|disconnect` picks what happens if
+    the client falls too far behind (default SSE_SLOW_CONSUMER_POLICY).
+    The database session is only used to authenticate and build the backlog; it is closed
+    before the stream starts, so open streams hold no pooled connection.
     """
 
     # Prefer Authorization header
@@ -106,65 +139,57 @@ async def stream_notifications(request: Request, db: Session = Depends(get_db)):
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token: missing subject")
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail=f"Token error: {str(e)}")
-
-    user = get_user_by_email(db, email=email)
+    email = decode_token_subject(token)
+    user = await get_user_by_email_async(adb, email=email)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
 
     user_id = user.id
-        
-    async def event_generator():
-        queue = await manager.connect(int(user_id))
-        try:
-            while True:
-                # Wait for message or client disconnect
-                if await request.is_disconnected():
-                    break
-                    
-                try:
-                    # Wait for 1 second for a message, then yield a keep-alive comment
-                    # This allows us to check for disconnection
-                    message = await asyncio.wait_for(queue.get(), timeout=15.0)
-                    yield {
-                        "event": "message",
-                        "data": json.dumps(message)
-                    }
-                except asyncio.TimeoutError:
-                    # Keep-alive
-                    yield {"event": "ping", "data": "pong"}
-                    
-        finally:
-            await manager.disconnect(int(user_id), queue)
-
-    # Attempt to use EventSourceResponse if available, otherwise fall back to StreamingResponse
+
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    # Task board topics, e.g. ?topics=team:3,task:42
+    topics = [t for t in dict.fromkeys((request.query_params.get("topics") or "").split(",")) if t]
+    for topic in topics:
+        if not await can_subscribe_async(adb, user, topic):
+            raise HTTPException(status_code=403, detail=f"Not allowed to subscribe to {topic}")
+
+    # How this connection is treated if it falls behind, e.g. ?overflow=resync
+    overflow = request.query_params.get("overflow")
+    if overflow is not None and overflow not in SLOW_CONSUMER_POLICIES:
+        raise HTTPException(status_code=400, detail=f"overflow must be one of: {', '.join(SLOW_CONSUMER_POLICIES)}")
+
+    # Register before computing the backlog so nothing published in between is lost;
+    # the generator skips ring events the backlog already covered
+    subscription = await manager.connect(int(user_id), topics, overflow)
     try:
-        from sse_starlette.sse import EventSourceResponse
-        return EventSourceResponse(event_generator())
+        backlog = await stream_backlog(adb, user, last_event_id, topics) if last_event_id is not None else []
     except Exception:
-        try:
-            from starlette.responses import EventSourceResponse
-            return EventSourceResponse(event_generator())
-        except Exception:
-            async def sse_wrapper():
-                async for item in event_generator():
-                    if isinstance(item, dict):
-                        ev = item.get("event")
-                        data = item.get("data")
-                        if ev == "ping":
-                            yield f": {data}\n\n"
-                        else:
-                            yield f"event: {ev}\n"
-                            for line in str(data).splitlines():
-                                yield f"data: {line}\n"
-                            yield "\n"
-
-            return StreamingResponse(sse_wrapper(), media_type="text/event-stream")
+        await manager.disconnect(int(user_id), subscription)
+        raise
+
+    async def event_generator():
+        last_sent = last_event_id or 0
+        for event_id, message in backlog:
+            # Flagged so the client adds them silently instead of toasting each one
+            yield encode_frame(event_id, {**message, "replay": True})
+            if event_id:
+                last_sent = max(last_sent, event_id)
+
+        while True:
+            # Events, or a ping from the shared heartbeat when the stream has been idle
+            event = await subscription.next_event()
+            if event.id is not None and event.id <= last_sent:
+                continue
+            # Encoded once by the broadcast and shared by every connection of the user
+            yield event.frame
+            if event.message.get("type") == "server_disconnect":
+                break
+
+    # Ends when the client disconnects; on_close unregisters the subscription even if
+    # the client left before the first frame
+    return EventStreamResponse(event_generator(), on_close=partial(manager.disconnect, int(user_id), subscription))
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
 from app.schemas.task import TaskCreate, TaskResponse
-from app.services.task import create_new_task, get_tasks_for_user
+from app.services.task import create_new_task, get_tasks_for_user_async
 from app.models.user import User
 from app.models.task import Task
 from app.models.history import TaskHistory
@@ -15,12 +16,13 @@ from app.models.comment import Comment
 from app.schemas.task import TaskUpdate 
 from app.schemas.comment import CommentCreate, CommentResponse
 from app.services.task import update_task_status, delete_task, update_task_with_history
+from app.services.team import get_managed_team_ids
 from sqlalchemy.orm import joinedload
 
 router = APIRouter() 
 
 
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_current_user_async
 
 # --- ROUTES ---
 
@@ -39,6 +41,8 @@ def create_task(
     
     # Manager permission check: Can only assign to own team members
     if current_user.role == "manager":
+        managed_team_ids = get_managed_team_ids(db, current_user.id)
+
         # If assigning to a user
         if task.user_id:
             assignee = db.query(User).filter(User.id == task.user_id).first()
@@ -52,12 +56,8 @@ def create_task(
             if assignee.id == current_user.id:
                 pass
             else:
-                flag = False
                 # Allow if manager is explicitly manager of the assignee's team
-                for team in current_user.managed_teams:
-                    if team.id == assignee.team_id:
-                        flag = True
-                        break
+                flag = assignee.team_id in managed_team_ids
                 # Also allow if the manager is a member of the same team (common case where role='manager' but manager_id wasn't set)
                 if not flag and current_user.team_id and current_user.team_id == assignee.team_id:
                     flag = True
@@ -66,11 +66,7 @@ def create_task(
 
         # If assigning to a team (Manager must manage that team)
         if task.team_id:
-            flag = False
-            for team in current_user.managed_teams:
-                if team.id == task.team_id:
-                    flag = True
-                    break
+            flag = task.team_id in managed_team_ids
             # Also allow assigning to the manager's own team even if manager_id isn't set on the team record
             if not flag and current_user.team_id and current_user.team_id == task.team_id:
                 flag = True
@@ -86,22 +82,40 @@ def create_task(
     return create_new_task(db=db, task=task, background_tasks=background_tasks, user_id=assignee_id, team_id=task.team_id)
 
 @router.get("/", response_model=List[TaskResponse])
-def read_my_tasks(
+async def read_my_tasks(
+    response: Response,
     status: Optional[str] = None,
     priority: Optional[str] = None,
     sort_by: Optional[str] = None,
     order: str = "asc",
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    include_total: bool = False,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return get_tasks_for_user(
-        db=db, 
-        user=current_user, 
-        status=status, 
-        priority=priority, 
-        sort_by=sort_by, 
-        order=order
-    )
+    # Keyset-paginated: pass the X-Next-Cursor response header back as `cursor`
+    # to fetch the next page. Page size is capped at MAX_PAGE_SIZE.
+    try:
+        tasks, next_cursor, total = await get_tasks_for_user_async(
+            db=db, 
+            user=current_user, 
+            status=status, 
+            priority=priority, 
+            sort_by=sort_by, 
+            order=order,
+            cursor=cursor,
+            limit=limit,
+            include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        response.headers["X-Total-Estimate"] = str(total)
+    return tasks
 
 @router.put("/{task_id}", response_model=TaskResponse)
 def update_task_details(
@@ -149,6 +163,7 @@ def update_task_status_endpoint(
 @router.delete("/{task_id}")
 def delete_my_task(
     task_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -173,15 +188,13 @@ def delete_my_task(
             assignee = db.query(User).filter(User.id == task.user_id).first()
             if assignee and assignee.team_id:
                 # Check if this team is managed by current_user
-                for team in current_user.managed_teams:
-                    if team.id == assignee.team_id:
-                        is_authorized = True
-                        break
+                if assignee.team_id in get_managed_team_ids(db, current_user.id):
+                    is_authorized = True
     
     if not is_authorized:
         raise HTTPException(status_code=403, detail="Not authorized to delete this task")
 
-    delete_task(db, task_id)
+    delete_task(db, task_id, background_tasks)
     return {"message": "Task deleted successfully"}
 
 # --- COMMENT ROUTES ---
@@ -204,14 +217,9 @@ def create_comment(
     )
     db.add(new_comment)
     db.commit()
-    db.refresh(new_comment)
     
-    # Reload with author for response
-    # Actually refresh might load it if we access it? 
-    # Or explicitly query. Easier to return object and generic loading handles it if joinedload used elsewhere?
-    # Pydantic will try to access .author. SQLAlchemy lazy loads it by default. 
-    # Since we are in an active session, lazy load works.
-    return new_comment
+    # Reload with author for response in the same query instead of a lazy load during serialization
+    return db.query(Comment).filter(Comment.id == new_comment.id).options(joinedload(Comment.author)).first()
 
 @router.get("/{task_id}/comments", response_model=List[CommentResponse])
 def get_task_comments(
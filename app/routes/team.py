@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
 from app.models.team import Team
 from app.models.user import User
 from app.schemas.team import TeamCreate, TeamResponse, TeamUpdate
 from app.schemas.user import UserResponse
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_current_user_async
 
 from app.services.team import (
     create_team, get_team_by_name, get_all_teams, get_team_by_id,
-    delete_team, assign_manager_to_team, add_members_to_team, get_user_team
+    delete_team, assign_manager_to_team, add_members_to_team, get_user_team,
+    get_all_teams_async
 )
 
 router = APIRouter()
@@ -43,11 +45,11 @@ def get_my_team_route(
     return team
 
 @router.get("/", response_model=List[TeamResponse])
-def get_all_teams_route(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_all_teams_route(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
-    return get_all_teams(db)
+    return await get_all_teams_async(db)
 
 @router.get("/{team_id}", response_model=TeamResponse)
 def get_team_route(
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+from app.core.database import get_async_db
+from app.core.sse import PING, SLOW_CONSUMER_POLICIES, make_event, manager
+from app.dependencies import decode_token_subject
+from app.services.notification import stream_backlog
+from app.services.task import can_subscribe_async
+from app.services.user import get_user_by_email_async
+
+logger = logging.getLogger("app_logger")
+
+router = APIRouter()
+
+# Events arriving within this window after the first one go out in the same frame
+WS_BATCH_WINDOW_SECONDS = float(os.getenv("WS_BATCH_WINDOW_MS", "25")) / 1000
+WS_BATCH_MAX_EVENTS = int(os.getenv("WS_BATCH_MAX_EVENTS", "100"))
+
+WS_POLICY_VIOLATION = 1008
+# Closed by the server because the user opened too many connections
+WS_REPLACED = 4000
+# "Try again later": the client fell too far behind under the disconnect policy
+WS_SLOW_CONSUMER = 1013
+
+
+@asynccontextmanager
+async def _db_session(websocket: WebSocket):
+    """A session for one lookup, so an open socket holds no pooled connection.
+    Goes through get_async_db (and any override of it, as in the tests)."""
+    provider = websocket.app.dependency_overrides.get(get_async_db, get_async_db)
+    async with asynccontextmanager(provider)() as db:
+        yield db
+
+
+def _events_frame(events) -> str:
+    """{"events": [{"id": ..., "data": {...}}, ...]} built from each event's pre-encoded JSON."""
+    items = ",".join(f'{{"id":{"null" if e.id is None else e.id},"data":{e.data}}}' for e in events)
+    return f'{{"events":[{items}]}}'
+
+
+@router.websocket("/ws")
+async def notification_socket(websocket: WebSocket):
+    """
+    Multiplexed notifications: the user's own events plus any number of task board
+    topics over one socket, fed by the same NotificationManager rings as the SSE stream.
+
+    Authenticate with `?token=` (browsers can't set headers on a WebSocket) or an
+    `Authorization: Bearer` header. `?topics=team:3,task:42`, `?last_event_id=`
+    and `?overflow=` work as on /notifications/stream. Client frames:
+        {"op": "subscribe", "topics": ["team:3"]}
+        {"op": "unsubscribe", "topics": ["team:3"]}
+    are answered with {"op": "subscribed" | "unsubscribed", "topics": [...], "denied": [...]}.
+    Events arrive as {"events": [{"id": ..., "data": {...}}, ...]}; everything published
+    within WS_BATCH_WINDOW_MS of the first event shares one frame.
+    """
+    token = websocket.query_params.get("token")
+    auth = websocket.headers.get("authorization")
+    if not token and auth and auth.lower().startswith("bearer "):
+        token = auth.split(None, 1)[1].strip()
+    try:
+        email = decode_token_subject(token) if token else None
+    except HTTPException:
+        email = None
+    if email is None:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    last_event_id = websocket.query_params.get("last_event_id")
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    topics = [t for t in dict.fromkeys((websocket.query_params.get("topics") or "").split(",")) if t]
+    overflow = websocket.query_params.get("overflow")
+    if overflow is not None and overflow not in SLOW_CONSUMER_POLICIES:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    async with _db_session(websocket) as db:
+        user = await get_user_by_email_async(db, email=email)
+        allowed = user is not None and all([await can_subscribe_async(db, user, t) for t in topics])
+        if not allowed:
+            await websocket.close(code=WS_POLICY_VIOLATION)
+            return
+        # Register before computing the backlog, as the SSE stream does
+        subscription = await manager.connect(user.id, topics, overflow)
+        try:
+            backlog = await stream_backlog(db, user, last_event_id, topics) if last_event_id is not None else []
+        except Exception:
+            await manager.disconnect(user.id, subscription)
+            raise
+
+    async def send_events():
+        last_sent = last_event_id or 0
+        if backlog:
+            await websocket.send_text(_events_frame([make_event(i, {**m, "replay": True}) for i, m in backlog]))
+            last_sent = max([last_sent] + [i for i, _ in backlog if i])
+        while True:
+            batch = await subscription.next_batch(WS_BATCH_WINDOW_SECONDS, WS_BATCH_MAX_EVENTS)
+            # The server's protocol-level pings keep the socket alive
+            events = [e for e in batch if e is not PING and (e.id is None or e.id > last_sent)]
+            if not events:
+                continue
+            await websocket.send_text(_events_frame(events))
+            if events[-1].message.get("type") == "server_disconnect":
+                slow = events[-1].message.get("reason") == "slow_consumer"
+                await websocket.close(code=WS_SLOW_CONSUMER if slow else WS_REPLACED)
+                return
+
+    async def handle_ops():
+        while True:
+            try:
+                frame = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"op": "error", "detail": "Frames must be JSON"})
+                continue
+            op = frame.get("op") if isinstance(frame, dict) else None
+            requested = [t for t in (frame.get("topics") or []) if isinstance(t, str)] if op else []
+            if op == "subscribe":
+                async with _db_session(websocket) as db:
+                    granted = [t for t in requested if await can_subscribe_async(db, user, t)]
+                for topic in granted:
+                    manager.subscribe(subscription, topic)
+                await websocket.send_json({"op": "subscribed", "topics": granted,
+                                           "denied": [t for t in requested if t not in granted]})
+            elif op == "unsubscribe":
+                for topic in requested:
+                    manager.unsubscribe(subscription, topic)
+                await websocket.send_json({"op": "unsubscribed", "topics": requested, "denied": []})
+            else:
+                await websocket.send_json({"op": "error", "detail": f"Unknown op: {op}"})
+
+    await websocket.accept()
+    tasks = [asyncio.ensure_future(send_events()), asyncio.ensure_future(handle_ops())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = None if task.cancelled() else task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"WebSocket for user {user.id} closed with error: {error}")
+    finally:
+        await manager.disconnect(user.id, subscription)
+        for task in tasks:
+            task.cancel()
+        # wait(), not gather(): a cancelled gather re-raises the children's CancelledError
+        # and would escape the server's own cancel scope on shutdown
+        await asyncio.wait(tasks)
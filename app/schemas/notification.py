@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, field_validator
+from datetime import datetime, timezone
 from typing import Optional
 
 class NotificationBase(BaseModel):
@@ -15,5 +15,11 @@ class NotificationResponse(NotificationBase):
     is_read: bool
     created_at: datetime
 
+    @field_validator("created_at")
+    @classmethod
+    def _assume_utc(cls, v: datetime) -> datetime:
+        # Stored in UTC; backends without timezone support return it naive
+        return v.replace(tzinfo=timezone.utc) if v.tzinfo is None else v
+
     class Config:
         from_attributes = True
@@ -1,145 +1,256 @@
+from sqlalchemy import select, insert, update, func, case, literal, true, and_, or_, event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import SessionLocal
-from app.models.notification import NotificationLog, Notification
+from app.models.notification import Notification, NotificationCounter, NotificationRead, NotificationOutbox
 from app.models.user import User
 from app.models.team import Team
 import httpx
 from pydantic import EmailStr
 from fastapi import BackgroundTasks
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import json
 import logging
 import asyncio
 from app.core.sse import manager
+from app.core.pagination import encode_cursor, decode_cursor, clamp_page_size
+from app.core.http_client import get_http_client, get_breaker
+from app.core.mailer import get_mailer
+from app.services.notification_log import log_notification
+from app.core import metrics
 import threading
+from collections import Counter
 
 logger = logging.getLogger("app_logger")
 
-# No top-level email client config: import and build ConnectionConfig inside send_email_notification
+# --- Outbox: email and webhook delivery ---
+# Request handlers only insert NotificationOutbox rows (enqueue_*), committed together with
+# the change that caused them. app/jobs/outbox_dispatcher.py claims and delivers them.
 
-async def send_email_notification(db_session: Session, user_id: int, subject: str, body: str):
-    # We use a new session if possible or the provided one
-    # For background tasks, it's safer to use user_id and fetch fresh
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            logger.error(f"User {user_id} not found for email notification")
-            return
+OUTBOX_PRIORITY_HIGH = 0    # Direct emails to a user
+OUTBOX_PRIORITY_NORMAL = 5  # Team webhooks
+OUTBOX_PRIORITY_LOW = 9     # Bulk / digest traffic
 
-        if not user.email_notifications:
-            logger.info(f"Email notifications disabled for user {user.username}")
-            return
+# Assignment emails for users with email_digest on are gathered into one message per window
+EMAIL_DIGEST_MINUTES = float(os.getenv("EMAIL_DIGEST_MINUTES", "60"))
+# How long a keyed webhook (e.g. one task's status changes) is held so a burst of events goes out as one
+WEBHOOK_COALESCE_SECONDS = float(os.getenv("WEBHOOK_COALESCE_SECONDS", "5"))
 
-        # Log attempt
-        try:
-            log_notification(db, user_id=user.id, type="EMAIL", status="ATTEMPT", payload=body)
-        except Exception:
-            logger.debug("Failed to write initial email attempt log")
+# Set after a commit that enqueued outbox rows, so an in-process dispatcher wakes up
+# immediately instead of waiting for its next poll
+outbox_wakeup = threading.Event()
 
-        # Try to import fastapi_mail locally; if unavailable, fallback to mock logging
-        try:
-            from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-        except Exception:
-            logger.info(f"fastapi_mail not installed; mocking email to {user.email}")
-            log_notification(db, user_id=user.id, type="EMAIL", status="MOCK_SENT", payload=body)
-            return
-
-        # Build connection config
-        conf = ConnectionConfig(
-            MAIL_USERNAME = os.getenv("MAIL_USERNAME", "user@example.com"),
-            MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "password"),
-            MAIL_FROM = os.getenv("MAIL_FROM", "admin@ems-pro.com"),
-            MAIL_PORT = int(os.getenv("MAIL_PORT", 587)),
-            MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com"),
-            MAIL_STARTTLS = True,
-            MAIL_SSL_TLS = False,
-            USE_CREDENTIALS = True,
-            VALIDATE_CERTS = False
-        )
 
-        # Check if we have real credentials
-        if not os.getenv("MAIL_USERNAME"):
-            logger.info(f"[MOC EMAIL] To: {user.email} | Subject: {subject}")
-            log_notification(db, user_id=user.id, type="EMAIL", status="MOCK_SENT", payload=body)
-            return
+@event.listens_for(Session, "after_commit")
+def _wake_outbox_dispatcher(session):
+    if session.info.pop("outbox_enqueued", False):
+        outbox_wakeup.set()
 
-        message = MessageSchema(
-            subject=subject,
-            recipients=[user.email],
-            body=body,
-            subtype=MessageType.html
-        )
 
-        fm = FastMail(conf)
-        await fm.send_message(message)
+def _held_outbox_row(db: Session, dedupe_key: str, now: datetime):
+    """The row still holding events for dedupe_key, locked for merging, or None.
+
+    Only untouched rows inside their window qualify; the lock makes concurrent merges
+    queue up, and the dispatcher skips a locked row until the merge commits.
+    """
+    return db.execute(
+        select(NotificationOutbox)
+        .where(NotificationOutbox.dedupe_key == dedupe_key, NotificationOutbox.status == "pending",
+               NotificationOutbox.attempts == 0, NotificationOutbox.next_attempt_at > now)
+        .order_by(NotificationOutbox.id.desc())
+        .limit(1)
+        .with_for_update()
+    ).scalars().first()
+
+
+def enqueue_email(db: Session, user_id: int, subject: str, body: str, priority: int = OUTBOX_PRIORITY_HIGH,
+                  digest: bool = False) -> NotificationOutbox:
+    """Queue an email for the dispatcher. Does not commit.
+
+    With digest=True (the user's email_digest preference) the email is added to the
+    user's open digest instead, which goes out as one message EMAIL_DIGEST_MINUTES
+    after its first item.
+    """
+    if not digest:
+        row = NotificationOutbox(kind="EMAIL", user_id=user_id, subject=subject, payload=body, priority=priority)
+        db.add(row)
+        db.info["outbox_enqueued"] = True
+        return row
+
+    now = datetime.now(timezone.utc)
+    item = {"subject": subject, "body": body}
+    dedupe_key = f"email_digest:{user_id}"
+    held = _held_outbox_row(db, dedupe_key, now)
+    if held is not None:
+        items = json.loads(held.payload)["items"]
+        items.append(item)
+        held.payload = json.dumps({"items": items})
+        held.subject = _digest_subject(len(items))
+        metrics.inc("emails_digested_total")
+        return held
+
+    row = NotificationOutbox(kind="EMAIL", user_id=user_id, event="digest", subject=_digest_subject(1),
+                             payload=json.dumps({"items": [item]}), priority=OUTBOX_PRIORITY_LOW,
+                             dedupe_key=dedupe_key, next_attempt_at=now + timedelta(minutes=EMAIL_DIGEST_MINUTES))
+    db.add(row)
+    db.info["outbox_enqueued"] = True
+    return row
+
+
+def _digest_subject(count: int) -> str:
+    return "1 new notification" if count == 1 else f"{count} new notifications"
+
+
+def render_digest(payload: str) -> str:
+    """HTML body for a digest row: every queued email in order, separated by rules."""
+    items = json.loads(payload)["items"]
+    sections = [f"<h3>{item['subject']}</h3>{item['body']}" for item in items]
+    return "<hr>".join(sections)
+
+
+def enqueue_webhook(db: Session, team_id: int, event_name: str, data: dict, priority: int = OUTBOX_PRIORITY_NORMAL,
+                    dedupe_key: str = None) -> NotificationOutbox:
+    """Queue a team webhook for the dispatcher. Does not commit.
+
+    The event timestamp is fixed here so every retry posts the same body. With a
+    dedupe_key the row is held for WEBHOOK_COALESCE_SECONDS, and further events with
+    the same key inside that window are merged into it instead of adding rows.
+    """
+    now = datetime.now(timezone.utc)
+    if dedupe_key and WEBHOOK_COALESCE_SECONDS > 0:
+        held = _held_outbox_row(db, dedupe_key, now)
+        if held is not None:
+            previous = json.loads(held.payload)
+            merged = {"event": event_name, "timestamp": now.isoformat(), "data": _coalesce_webhook_data(previous["data"], data)}
+            held.payload = json.dumps(merged, default=str)
+            metrics.inc("webhooks_coalesced_total", event=event_name)
+            return held
+
+    payload = {"event": event_name, "timestamp": now.isoformat(), "data": data}
+    row = NotificationOutbox(kind="WEBHOOK", team_id=team_id, event=event_name, payload=json.dumps(payload, default=str),
+                             priority=priority, dedupe_key=dedupe_key)
+    if dedupe_key and WEBHOOK_COALESCE_SECONDS > 0:
+        row.next_attempt_at = now + timedelta(seconds=WEBHOOK_COALESCE_SECONDS)
+    db.add(row)
+    db.info["outbox_enqueued"] = True
+    return row
+
+
+def _coalesce_webhook_data(previous: dict, data: dict) -> dict:
+    """Merge a newer event into a held one: latest fields win, but the first
+    old_status is kept (the net transition) and transitions are concatenated."""
+    merged = {**previous, **data}
+    if "old_status" in previous:
+        merged["old_status"] = previous["old_status"]
+    if "transitions" in previous or "transitions" in data:
+        merged["transitions"] = previous.get("transitions", []) + data.get("transitions", [])
+    return merged
+
+
+async def deliver_email(session_factory, user_id: int, subject: str, body: str) -> str:
+    """Send one email, once. Returns the logged status; raises so the dispatcher can retry.
+
+    Sessions from session_factory are held only around the lookup and the log write,
+    never across the SMTP call, so slow mail servers don't tie up pooled connections.
+    """
+    with session_factory() as db:
+        user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        logger.error(f"User {user_id} not found for email notification")
+        return "SKIPPED"
+
+    if not user.email_notifications:
+        logger.info(f"Email notifications disabled for user {user.username}")
+        return "SKIPPED"
+
+    # Without credentials or an explicit relay there is nowhere to send; log instead
+    if not os.getenv("MAIL_USERNAME") and not os.getenv("MAIL_SERVER"):
+        logger.info(f"[MOC EMAIL] To: {user.email} | Subject: {subject}")
+        with session_factory() as db:
+            log_notification(db, user_id=user.id, type="EMAIL", status="MOCK_SENT", payload=body)
+        return "MOCK_SENT"
+
+    # Pooled, already-authenticated SMTP connection instead of a login per message
+    await get_mailer().send(user.email, subject, body)
+    with session_factory() as db:
         log_notification(db, user_id=user.id, type="EMAIL", status="SENT", payload=body)
-        logger.info(f"Email sent successfully to {user.email}")
-    except Exception as e:
-        logger.error(f"Email failed to {user_id}: {e}")
-        log_notification(db, user_id=user_id, type="EMAIL", status="FAILED", error=str(e), payload=body)
-    finally:
-        db.close()
+    logger.info(f"Email sent successfully to {user.email}")
+    return "SENT"
 
-async def send_webhook_notification(db_session: Session, team_id: int, event: str, data: dict):
-    db = SessionLocal()
-    try:
+async def deliver_webhook(session_factory, team_id: int, payload: str) -> str:
+    """POST one webhook, once. Returns the logged status; raises so the dispatcher can retry.
+
+    Like deliver_email, no session is open during the HTTP call.
+    """
+    with session_factory() as db:
         team = db.query(Team).filter(Team.id == team_id).first()
-        if not team or not team.webhook_url:
-            return
-
-        payload = {
-            "event": event,
-            "team": team.name,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "data": data
-        }
-        
-        # Retry logic
-        max_retries = int(os.getenv("WEBHOOK_MAX_RETRIES", "3"))
-        base_delay = float(os.getenv("WEBHOOK_BASE_DELAY", "1.0"))
-
-        last_error = None
-        async with httpx.AsyncClient() as client:
-            for attempt in range(1, max_retries + 1):
-                try:
-                    # Log attempt
-                    try:
-                        log_notification(db, team_id=team.id, type="WEBHOOK", status=f"ATTEMPT_{attempt}", payload=json.dumps(payload))
-                    except Exception:
-                        logger.debug("Failed to write webhook attempt log")
-
-                    resp = await client.post(team.webhook_url, json=payload, timeout=5.0)
-                    if resp.status_code < 400:
-                        status = "SENT"
-                        log_notification(db, team_id=team.id, type="WEBHOOK", status=status, payload=json.dumps(payload))
-                        logger.info(f"Webhook {event} sent to {team.name} with status {status}")
-                        return
-                    else:
-                        last_error = f"HTTP_{resp.status_code}"
-                        logger.warning(f"Webhook attempt {attempt} got status {resp.status_code} for team {team.name}")
-                except Exception as e:
-                    last_error = str(e)
-                    logger.warning(f"Webhook attempt {attempt} failed for team {team.name}: {e}")
-
-                # Backoff before next attempt
-                if attempt < max_retries:
-                    await asyncio.sleep(base_delay * (2 ** (attempt - 1)))
-
-        # All attempts failed
-        final_status = f"FAILED_{last_error}" if last_error else "FAILED"
-        log_notification(db, team_id=team_id, type="WEBHOOK", status=final_status, payload=json.dumps(payload), error=str(last_error))
-        logger.error(f"Webhook {event} ultimately failed for team {team.name}: {last_error}")
-    except Exception as e:
-        logger.error(f"Webhook failed for team {team_id}: {e}")
-        log_notification(db, team_id=team_id, type="WEBHOOK", status="FAILED", error=str(e), payload=json.dumps(data))
-    finally:
-        db.close()
+    if not team or not team.webhook_url:
+        return "SKIPPED"
+
+    body = json.loads(payload)
+    body["team"] = team.name
+
+    # Shared keep-alive pool; the per-team breaker raises CircuitOpenError instead of
+    # calling an endpoint that keeps failing
+    resp = await get_http_client().post(team.webhook_url, breaker=get_breaker(("team", team.id)), json=body)
+    if resp.status_code >= 400:
+        raise RuntimeError(f"HTTP_{resp.status_code}")
+
+    with session_factory() as db:
+        log_notification(db, team_id=team.id, type="WEBHOOK", status="SENT", payload=json.dumps(body))
+    logger.info(f"Webhook {body.get('event')} sent to {team.name}")
+    return "SENT"
 
 async def broadcast_notification(user_id: int, payload: dict):
     await manager.broadcast(user_id, payload)
 
+async def broadcast_notifications(messages: list):
+    """Deliver a batch of (user_id, payload) messages in one pass."""
+    await manager.broadcast_many(messages)
+
+def _schedule_broadcasts(messages: list, background_tasks: BackgroundTasks = None):
+    if not messages:
+        return
+    if background_tasks:
+        background_tasks.add_task(broadcast_notifications, messages)
+        return
+    # If there's a running loop, schedule a task; otherwise run broadcast in a short-lived thread
+    try:
+        loop = asyncio.get_running_loop()
+        loop.create_task(broadcast_notifications(messages))
+    except RuntimeError:
+        # No running event loop in this thread — run broadcast in a separate thread
+        def _runner(msgs):
+            try:
+                asyncio.run(broadcast_notifications(msgs))
+            except Exception as e:
+                logger.debug(f"Background broadcast failed: {e}")
+
+        t = threading.Thread(target=_runner, args=(messages,), daemon=True)
+        t.start()
+
+def _schedule_broadcast(user_id: int, payload: dict, background_tasks: BackgroundTasks = None):
+    _schedule_broadcasts([(user_id, payload)], background_tasks)
+
+def publish_topic_events(events: list, background_tasks: BackgroundTasks = None):
+    """Publish (topic, message) pairs to SSE topic subscribers, e.g. ("team:3", {...}).
+
+    Call after the change is committed; delivery is scheduled like a user broadcast.
+    """
+    _schedule_broadcasts(events, background_tasks)
+
+def _notification_payload(notif) -> dict:
+    # Timestamps go out in UTC, same as the REST listing; the client converts to local time
+    return {
+        "id": notif.id,
+        "title": notif.title,
+        "message": notif.message,
+        "created_at": as_utc(notif.created_at).isoformat(),
+        "is_read": False
+    }
+
 def create_in_app_notification(db: Session, user_id: int, title: str, message: str, background_tasks: BackgroundTasks = None):
     try:
         notif = Notification(
@@ -148,42 +259,20 @@ def create_in_app_notification(db: Session, user_id: int, title: str, message: s
             message=message
         )
         db.add(notif)
+        # Bump the counter in the same transaction as the insert
+        unread = None
+        try:
+            unread = adjust_unread_count(db, user_id, 1)
+        except Exception as e:
+            logger.warning(f"Unread counter update failed for user {user_id}; reconcile will repair it: {e}")
         db.commit()
         db.refresh(notif)
 
         # Broadcast via SSE
-        # Convert created_at to server local timezone for client display convenience
-        try:
-            local_ts = notif.created_at.astimezone()
-        except Exception:
-            # fallback: use original timestamp
-            local_ts = notif.created_at
-
-        payload = {
-            "id": notif.id,
-            "title": notif.title,
-            "message": notif.message,
-            "created_at": local_ts.isoformat(),
-            "is_read": False
-        }
-
-        if background_tasks:
-            background_tasks.add_task(broadcast_notification, user_id, payload)
-        else:
-            # If there's a running loop, schedule a task; otherwise run broadcast in a short-lived thread
-            try:
-                loop = asyncio.get_running_loop()
-                loop.create_task(manager.broadcast(user_id, payload))
-            except RuntimeError:
-                # No running event loop in this thread — run broadcast in a separate thread
-                def _runner(u_id, pl):
-                    try:
-                        asyncio.run(manager.broadcast(u_id, pl))
-                    except Exception as e:
-                        logger.debug(f"Background broadcast failed: {e}")
-
-                t = threading.Thread(target=_runner, args=(user_id, payload), daemon=True)
-                t.start()
+        messages = [(user_id, _notification_payload(notif))]
+        if unread is not None:
+            messages.append((user_id, unread_count_payload(unread)))
+        _schedule_broadcasts(messages, background_tasks)
 
         return notif
     except Exception as e:
@@ -191,19 +280,446 @@ def create_in_app_notification(db: Session, user_id: int, title: str, message: s
         db.rollback()
         return None
 
-def log_notification(db: Session, user_id: int = None, team_id: int = None, type: str = "", status: str = "", payload: str = "", error: str = None):
-    # Ensure we use the provided session correctly
+def create_in_app_notifications(db: Session, notifications: list, background_tasks: BackgroundTasks = None, broadcasts: list = None) -> list:
+    """Fan out many in-app notifications in one transaction.
+
+    `notifications` is a list of personal (user_id, title, message). `broadcasts` is a list
+    of dicts with title, message, target_role or target_team_id and optional actor_id; each
+    becomes a single row that every matching user sees on read, instead of one row per
+    recipient. Rows go in with multi-row INSERT ... RETURNING, unread counters are bumped
+    with one UPDATE per distinct delta or audience, and one SSE broadcast pass is
+    scheduled after the commit. Returns the created Notification rows ([] on failure).
+    """
+    rows = [{"user_id": u, "title": t, "message": m} for u, t, m in notifications if u]
+    broadcast_rows = [
+        {"title": b["title"], "message": b["message"], "target_role": b.get("target_role"),
+         "target_team_id": b.get("target_team_id"), "actor_id": b.get("actor_id")}
+        for b in (broadcasts or []) if b.get("target_role") or b.get("target_team_id")
+    ]
+    if not rows and not broadcast_rows:
+        return []
     try:
-        log = NotificationLog(
-            user_id=user_id,
-            team_id=team_id,
-            type=type,
-            status=status,
-            payload=payload[:5000] if payload else None,
-            error_message=error
-        )
-        db.add(log)
+        created = db.scalars(insert(Notification).returning(Notification), rows).all() if rows else []
+        created_broadcasts = db.scalars(insert(Notification).returning(Notification), broadcast_rows).all() if broadcast_rows else []
+
+        counts = {}
+        try:
+            if rows:
+                counts.update(adjust_unread_counts(db, Counter(r["user_id"] for r in rows)))
+            for n in created_broadcasts:
+                counts.update(_bump_audience_counters(db, n))
+        except Exception as e:
+            logger.warning(f"Bulk unread counter update failed; reconcile will repair it: {e}")
+
+        # Payloads are built from the RETURNING values before the commit expires them;
+        # reading them afterwards would reload every row with its own SELECT
+        messages = [(n.user_id, _notification_payload(n)) for n in created]
+        for n in created_broadcasts:
+            payload = _notification_payload(n)
+            # Recipients of broadcast rows, resolved once for the SSE pass (ids only, no writes)
+            messages.extend((user_id, payload) for user_id in db.execute(_audience_ids(n)).scalars().all())
+        messages.extend((user_id, unread_count_payload(count)) for user_id, count in counts.items())
         db.commit()
+
+        _schedule_broadcasts(messages, background_tasks)
+        return created + created_broadcasts
     except Exception as e:
-        logger.error(f"Failed to log notification: {e}")
-        if db: db.rollback()
+        logger.error(f"Failed to create in-app notifications: {e}")
+        db.rollback()
+        return []
+
+def as_utc(ts: datetime) -> datetime:
+    """created_at is written in UTC; SQLite hands it back naive, so label it rather than convert."""
+    if ts is not None and ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+# --- Visibility and read state ---
+
+def _joined_since(joined_at):
+    """Rows created after a user joined an audience. Accounts that predate the timestamp see everything."""
+    if joined_at is None:
+        return true()
+    if isinstance(joined_at, datetime):
+        return Notification.created_at >= joined_at
+    return or_(joined_at.is_(None), Notification.created_at >= joined_at)
+
+
+def _broadcast_visible_to(user):
+    """Broadcast rows addressed to a user, sent since they took their role or joined their team.
+
+    `user` may be a User instance or the User class itself, for a correlated query over all users.
+    """
+    return and_(
+        Notification.user_id.is_(None),
+        or_(
+            and_(Notification.target_role == user.role, _joined_since(user.created_at)),
+            and_(Notification.target_team_id == user.team_id, _joined_since(user.team_joined_at)),
+        ),
+        or_(Notification.actor_id.is_(None), Notification.actor_id != user.id),
+    )
+
+
+def _visible_to(user: User):
+    return or_(Notification.user_id == user.id, _broadcast_visible_to(user))
+
+
+def _unread_condition():
+    # Personal rows carry their own flag; broadcast rows are unread until a receipt exists
+    return or_(
+        and_(Notification.user_id.is_not(None), Notification.is_read == False),
+        and_(Notification.user_id.is_(None), NotificationRead.notification_id.is_(None)),
+    )
+
+
+def _audience_ids(n: Notification):
+    stmt = select(User.id)
+    if n.target_role:
+        stmt = stmt.where(User.role == n.target_role)
+    else:
+        stmt = stmt.where(User.team_id == n.target_team_id)
+    if n.actor_id:
+        stmt = stmt.where(User.id != n.actor_id)
+    return stmt
+
+
+def _unread_counts_stmt(user_ids: list = None):
+    """True unread counts per user, personal and broadcast rows merged, in one GROUP BY."""
+    stmt = (
+        select(User.id, func.count(Notification.id))
+        .select_from(User)
+        .join(Notification, or_(Notification.user_id == User.id, _broadcast_visible_to(User)))
+        .outerjoin(NotificationRead, and_(NotificationRead.notification_id == Notification.id, NotificationRead.user_id == User.id))
+        .where(_unread_condition())
+        .group_by(User.id)
+    )
+    if user_ids is not None:
+        stmt = stmt.where(User.id.in_(user_ids))
+    return stmt
+
+
+def _notification_cursor(n: Notification) -> str:
+    return encode_cursor({"t": as_utc(n.created_at).isoformat(), "id": n.id})
+
+
+def _decode_notification_cursor(cursor: str):
+    data = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(data["t"]), int(data["id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+async def get_notifications_for_user_async(db: AsyncSession, user: User, cursor: str = None, since: str = None,
+                                           limit: int = None, unread_only: bool = False):
+    """One keyset page of a user's inbox, seeked on (created_at, id).
+
+    The inbox merges the user's personal rows with broadcast rows for their role and
+    team in a single statement; read state for broadcast rows comes from NotificationRead.
+
+    Listing mode (no `since`) pages newest first; `cursor` continues past the previous page.
+    Sync mode (`since`) returns only rows newer than the given position, oldest first, so a
+    reconnecting client can catch up in order.
+
+    Returns (notifications, next_cursor, sync_cursor). next_cursor is None on the last page;
+    in sync mode it equals sync_cursor and means more new rows remain. sync_cursor marks the
+    newest row the client has seen and is what it should pass as `since` next time.
+    Raises ValueError for a malformed cursor.
+    """
+    page_size = clamp_page_size(limit)
+    is_unread = _unread_condition()
+    stmt = (
+        select(Notification, is_unread.label("unread"))
+        .outerjoin(NotificationRead, and_(NotificationRead.notification_id == Notification.id, NotificationRead.user_id == user.id))
+        .where(_visible_to(user))
+        .where(or_(NotificationRead.dismissed.is_(None), NotificationRead.dismissed == False))
+    )
+    if unread_only:
+        stmt = stmt.where(is_unread)
+
+    if since:
+        ts, last_id = _decode_notification_cursor(since)
+        stmt = stmt.where(or_(Notification.created_at > ts, and_(Notification.created_at == ts, Notification.id > last_id)))
+        stmt = stmt.order_by(Notification.created_at.asc(), Notification.id.asc())
+    else:
+        if cursor:
+            ts, last_id = _decode_notification_cursor(cursor)
+            stmt = stmt.where(or_(Notification.created_at < ts, and_(Notification.created_at == ts, Notification.id < last_id)))
+        stmt = stmt.order_by(Notification.created_at.desc(), Notification.id.desc())
+
+    result = await db.execute(stmt.limit(page_size + 1))
+    rows = result.all()
+    page = [n for n, _ in rows[:page_size]]
+    has_more = len(rows) > page_size
+
+    # Broadcast rows belong to everyone in the audience; present them as the caller's own
+    notifications = [
+        {"id": n.id, "user_id": user.id, "title": n.title, "message": n.message, "is_read": not unread, "created_at": n.created_at}
+        for n, unread in rows[:page_size]
+    ]
+
+    if since:
+        sync_cursor = _notification_cursor(page[-1]) if page else since
+        next_cursor = sync_cursor if has_more else None
+    else:
+        next_cursor = _notification_cursor(page[-1]) if has_more else None
+        # Only the first page knows the newest row; later pages leave the watermark alone
+        sync_cursor = _notification_cursor(page[0]) if page and not cursor else None
+
+    return notifications, next_cursor, sync_cursor
+
+# Reconnects whose Last-Event-ID is older than the replay buffer are served from the inbox
+SSE_REPLAY_DB_LIMIT = int(os.getenv("SSE_REPLAY_DB_LIMIT", "100"))
+SSE_REPLAY_DB_SLACK_SECONDS = 5
+
+# --- Unread counters ---
+
+def unread_count_payload(count: int) -> dict:
+    """SSE message carrying the badge count, so clients never poll for it."""
+    return {"type": "unread_count", "unread_count": count}
+
+
+def push_unread_count(user_id: int, count: int, background_tasks: BackgroundTasks = None):
+    _schedule_broadcast(user_id, unread_count_payload(count), background_tasks)
+
+
+def _count_unread(db: Session, user_id: int) -> int:
+    return dict(db.execute(_unread_counts_stmt([user_id])).all()).get(user_id, 0)
+
+
+def _counter_update(delta: int):
+    new_value = NotificationCounter.unread_count + delta
+    return (
+        update(NotificationCounter)
+        .values(unread_count=case((new_value < 0, 0), else_=new_value), updated_at=datetime.now(timezone.utc))
+        .returning(NotificationCounter.user_id, NotificationCounter.unread_count)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def adjust_unread_count(db: Session, user_id: int, delta: int) -> int:
+    """Add `delta` to the user's unread counter and return the new value.
+
+    Runs as a single atomic UPDATE so concurrent writers don't lose increments. The
+    first write for a user seeds the row from the notifications table. Does not commit;
+    callers commit together with the notification change the delta describes.
+    """
+    stmt = _counter_update(delta).where(NotificationCounter.user_id == user_id)
+    row = db.execute(stmt).first()
+    if row is not None:
+        return row[1]
+
+    # No counter yet: seed it from the rows (which already include any pending insert)
+    db.flush()
+    count = _count_unread(db, user_id)
+    try:
+        with db.begin_nested():
+            db.add(NotificationCounter(user_id=user_id, unread_count=count))
+    except IntegrityError:
+        # A concurrent request seeded it first; its count could not see our uncommitted change
+        count = db.execute(stmt).first()[1]
+    return count
+
+
+def adjust_unread_counts(db: Session, deltas: dict) -> dict:
+    """Bulk form of adjust_unread_count for {user_id: delta}. Returns {user_id: new count}.
+
+    Fan-outs almost always add the same delta to every recipient, so this is usually one
+    UPDATE ... WHERE user_id IN (...) RETURNING, plus one seeding pass for new users.
+    """
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(user_id)
+
+    counts = {}
+    for delta, user_ids in by_delta.items():
+        counts.update(db.execute(_counter_update(delta).where(NotificationCounter.user_id.in_(user_ids))).all())
+
+    missing = [user_id for user_id in deltas if user_id not in counts]
+    if missing:
+        # First write for these users: seed from the rows, which include the pending change
+        db.flush()
+        seeded = dict(db.execute(_unread_counts_stmt(missing)).all())
+        try:
+            with db.begin_nested():
+                db.add_all([NotificationCounter(user_id=u, unread_count=seeded.get(u, 0)) for u in missing])
+            counts.update({u: seeded.get(u, 0) for u in missing})
+        except IntegrityError:
+            # Raced with a concurrent seed; fall back to per-user updates
+            for user_id in missing:
+                counts[user_id] = adjust_unread_count(db, user_id, deltas[user_id])
+    return counts
+
+
+def _bump_audience_counters(db: Session, n: Notification) -> dict:
+    """+1 for every existing counter in a broadcast row's audience, in one UPDATE.
+
+    Users without a counter yet are skipped; their first read seeds it from the rows.
+    """
+    stmt = _counter_update(1).where(NotificationCounter.user_id.in_(_audience_ids(n)))
+    return dict(db.execute(stmt).all())
+
+
+def set_unread_count(db: Session, user_id: int, count: int) -> int:
+    counter = db.get(NotificationCounter, user_id)
+    if counter is None:
+        db.add(NotificationCounter(user_id=user_id, unread_count=count))
+    else:
+        counter.unread_count = count
+        counter.updated_at = datetime.now(timezone.utc)
+    return count
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    counter = db.get(NotificationCounter, user_id)
+    if counter is not None:
+        return counter.unread_count
+    count = _count_unread(db, user_id)
+    set_unread_count(db, user_id, count)
+    db.commit()
+    return count
+
+
+async def get_unread_count_async(db: AsyncSession, user_id: int) -> int:
+    counter = await db.get(NotificationCounter, user_id)
+    if counter is not None:
+        return counter.unread_count
+    # Not seeded yet: answer from the rows; the next write creates the counter
+    result = await db.execute(_unread_counts_stmt([user_id]))
+    return dict(result.all()).get(user_id, 0)
+
+
+async def replay_from_db(db: AsyncSession, user: User, last_event_id: int) -> list:
+    """Rebuild missed SSE events from the inbox once the replay buffer has been overrun.
+
+    Event ids are publish times in microseconds, so notifications created after
+    last_event_id (less some slack, since rows are committed before they are published)
+    are resent oldest first, followed by the current unread count. Returns
+    (event_id, message) pairs without ids; the client drops notifications it already has.
+    """
+    try:
+        since_ts = datetime.fromtimestamp(last_event_id / 1_000_000, timezone.utc) - timedelta(seconds=SSE_REPLAY_DB_SLACK_SECONDS)
+        since = encode_cursor({"t": since_ts.isoformat(), "id": 0})
+        rows, _, _ = await get_notifications_for_user_async(db, user, since=since, limit=SSE_REPLAY_DB_LIMIT)
+        events = [(None, {"id": n["id"], "title": n["title"], "message": n["message"],
+                          "created_at": as_utc(n["created_at"]).isoformat(), "is_read": n["is_read"]}) for n in rows]
+        events.append((None, unread_count_payload(await get_unread_count_async(db, user.id))))
+        return events
+    except Exception as e:
+        logger.warning(f"SSE replay from database failed for user {user.id}: {e}")
+        return []
+
+
+async def stream_backlog(db: AsyncSession, user: User, last_event_id: int, topics: list = ()) -> list:
+    """(event_id, message) pairs a reconnecting stream missed after last_event_id.
+
+    The user's own events come from the replay buffer, or the database once that has
+    been overrun. Topic events are only buffered; a topic that can't be replayed gets a
+    resync event so the client re-fetches the board instead.
+    """
+    backlog = manager.replay(user.id, last_event_id)
+    if backlog is None:
+        backlog = await replay_from_db(db, user, last_event_id)
+    topic_backlog = []
+    for topic in topics:
+        missed = manager.replay(topic, last_event_id)
+        if missed is None:
+            backlog.append((None, {"type": "resync", "topic": topic}))
+        else:
+            topic_backlog.extend(missed)
+    return backlog + sorted(topic_backlog, key=lambda e: e[0])
+
+
+def _get_visible(db: Session, user: User, notification_id: int):
+    return db.query(Notification).filter(Notification.id == notification_id, _visible_to(user)).first()
+
+
+def _record_receipt(db: Session, user_id: int, notification_id: int, dismiss: bool = False) -> bool:
+    """Create or update the user's receipt for a broadcast row. Returns True if it was unread."""
+    receipt = db.get(NotificationRead, (notification_id, user_id))
+    if receipt is not None:
+        if dismiss:
+            receipt.dismissed = True
+        return False
+    try:
+        with db.begin_nested():
+            db.add(NotificationRead(notification_id=notification_id, user_id=user_id, dismissed=dismiss))
+        return True
+    except IntegrityError:
+        # Concurrent click already recorded it
+        if dismiss:
+            db.query(NotificationRead).filter_by(notification_id=notification_id, user_id=user_id).update({NotificationRead.dismissed: True})
+        return False
+
+
+def mark_notification_read(db: Session, user: User, notification_id: int):
+    """Mark one notification read. Returns the new unread count, or None if it doesn't exist."""
+    notif = _get_visible(db, user, notification_id)
+    if not notif:
+        return None
+    if notif.user_id is None:
+        changed = 1 if _record_receipt(db, user.id, notification_id) else 0
+    else:
+        # Conditional UPDATE so two concurrent clicks only decrement once
+        changed = db.query(Notification).filter(Notification.id == notification_id, Notification.is_read == False) \
+            .update({Notification.is_read: True}, synchronize_session=False)
+    count = adjust_unread_count(db, user.id, -changed) if changed else get_unread_count(db, user.id)
+    db.commit()
+    return count
+
+
+def mark_all_notifications_read(db: Session, user: User) -> int:
+    db.query(Notification).filter(Notification.user_id == user.id, Notification.is_read == False) \
+        .update({Notification.is_read: True}, synchronize_session=False)
+    # Receipts for every unread broadcast row in one INSERT ... SELECT
+    unread_broadcasts = (
+        select(Notification.id, literal(user.id), literal(datetime.now(timezone.utc)), literal(False))
+        .outerjoin(NotificationRead, and_(NotificationRead.notification_id == Notification.id, NotificationRead.user_id == user.id))
+        .where(_broadcast_visible_to(user), NotificationRead.notification_id.is_(None))
+    )
+    db.execute(insert(NotificationRead).from_select(["notification_id", "user_id", "read_at", "dismissed"], unread_broadcasts))
+    set_unread_count(db, user.id, 0)
+    db.commit()
+    return 0
+
+
+def delete_notification(db: Session, user: User, notification_id: int):
+    """Remove one notification from the user's inbox. Returns the new unread count, or None if it doesn't exist.
+
+    Personal rows are deleted; broadcast rows are only dismissed for this user.
+    """
+    notif = _get_visible(db, user, notification_id)
+    if not notif:
+        return None
+    if notif.user_id is None:
+        was_unread = _record_receipt(db, user.id, notification_id, dismiss=True)
+    else:
+        was_unread = not notif.is_read
+        db.delete(notif)
+    count = adjust_unread_count(db, user.id, -1) if was_unread else get_unread_count(db, user.id)
+    db.commit()
+    return count
+
+
+def reconcile_unread_counts(db: Session) -> dict:
+    """Recompute every user's unread count from the rows and repair counters that drifted.
+
+    Returns {user_id: (stored, actual)} for each repaired counter.
+    """
+    actual = dict(db.execute(_unread_counts_stmt()).all())
+    stored = dict(db.query(NotificationCounter.user_id, NotificationCounter.unread_count).all())
+
+    repaired = {}
+    for user_id in set(actual) | set(stored):
+        expected = actual.get(user_id, 0)
+        current = stored.get(user_id)
+        if current == expected or (current is None and expected == 0):
+            continue
+        set_unread_count(db, user_id, expected)
+        repaired[user_id] = (current, expected)
+    db.commit()
+
+    for user_id, (_, expected) in repaired.items():
+        push_unread_count(user_id, expected)
+    return repaired
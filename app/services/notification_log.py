@@ -0,0 +1,195 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.models.notification import NotificationLog, NotificationPayload
+
+logger = logging.getLogger("app_logger")
+
+# Flush when this many records are waiting, or every LOG_FLUSH_SECONDS, whichever comes first
+LOG_BATCH_SIZE = int(os.getenv("NOTIFICATION_LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_SECONDS = float(os.getenv("NOTIFICATION_LOG_FLUSH_SECONDS", "2"))
+# Beyond this the oldest records are dropped rather than letting the buffer grow without bound
+LOG_MAX_BUFFER = int(os.getenv("NOTIFICATION_LOG_MAX_BUFFER", "10000"))
+LOG_PAYLOAD_LIMIT = 5000
+
+
+def pack_payload(payload: str):
+    """(sha256 hex, zlib-compressed bytes, uncompressed size) for a log payload."""
+    raw = payload.encode("utf-8")
+    return hashlib.sha256(raw).hexdigest(), zlib.compress(raw), len(raw)
+
+
+def load_payload(db: Session, log: NotificationLog) -> Optional[str]:
+    """The payload text of a log row, whether stored by hash or inline (rows from before payload dedupe)."""
+    if not log.payload_hash:
+        return log.payload
+    row = db.get(NotificationPayload, log.payload_hash)
+    return zlib.decompress(row.body).decode("utf-8") if row else None
+
+
+def _store_payloads(db: Session, payloads: dict):
+    """Insert the payloads not stored yet. payloads maps hash -> (compressed body, size)."""
+    hashes = list(payloads)
+    existing = set()
+    for i in range(0, len(hashes), 500):
+        existing.update(db.execute(select(NotificationPayload.hash).where(NotificationPayload.hash.in_(hashes[i:i + 500]))).scalars())
+    now = datetime.now(timezone.utc)
+    missing = [{"hash": h, "body": body, "size": size, "created_at": now}
+               for h, (body, size) in payloads.items() if h not in existing]
+    if not missing:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(NotificationPayload).values(missing))
+    except IntegrityError:
+        # Another process stored some of them in the meantime; insert the rest one by one
+        for row in missing:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(NotificationPayload).values(row))
+            except IntegrityError:
+                pass
+
+
+class NotificationLogWriter:
+    """Write-behind buffer for NotificationLog audit rows.
+
+    Senders call add(), which only appends to an in-memory list; a background thread
+    writes the records with multi-row INSERTs in their own session. Records are kept
+    per engine so a caller's session decides which database the row lands in.
+    Delivery code never waits on, or fails because of, audit logging.
+
+    Payloads are hashed and compressed at flush time and stored once in
+    notification_payloads; log rows only carry the hash.
+    """
+
+    def __init__(self, batch_size: int = LOG_BATCH_SIZE, flush_seconds: float = LOG_FLUSH_SECONDS,
+                 max_buffer: int = LOG_MAX_BUFFER, autostart: bool = True):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.autostart = autostart
+        self._buffer: list = []  # (engine, record)
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def add(self, bind, record: dict):
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.pop(0)
+                metrics.inc("notification_log_dropped_total")
+            self._buffer.append((bind, record))
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+            start = self.autostart and self._thread is None and not self._stopping
+            if start:
+                self._thread = threading.Thread(target=self._run, name="notification-log-writer", daemon=True)
+        if start:
+            self._thread.start()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._buffer)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_seconds)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            by_bind: dict = {}
+            for bind, record in batch:
+                by_bind.setdefault(bind, []).append(record)
+
+            written = 0
+            for bind, records in by_bind.items():
+                payloads = {}
+                rows = []
+                for record in records:
+                    text = record.get("payload")
+                    row = {**record, "payload": None, "payload_hash": None}
+                    if text:
+                        payload_hash, body, size = pack_payload(text)
+                        payloads[payload_hash] = (body, size)
+                        row["payload_hash"] = payload_hash
+                    rows.append(row)
+                try:
+                    with Session(bind=bind) as db:
+                        if payloads:
+                            _store_payloads(db, payloads)
+                        for i in range(0, len(rows), 500):
+                            db.execute(insert(NotificationLog).values(rows[i:i + 500]))
+                        db.commit()
+                    written += len(records)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(records)} notification log rows: {e}")
+                    metrics.inc("notification_log_dropped_total", len(records))
+            if written:
+                metrics.inc("notification_log_written_total", written)
+            return written
+
+    def stop(self):
+        """Stop the background thread and write whatever is left."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+        with self._cond:
+            self._thread = None
+            self._stopping = False
+
+
+notification_log_writer = NotificationLogWriter()
+# Covers worker processes that never run the FastAPI shutdown hook
+atexit.register(notification_log_writer.flush)
+
+
+def log_notification(db: Session, user_id: int = None, team_id: int = None, type: str = "", status: str = "", payload: str = "", error: str = None):
+    """Buffer one NotificationLog row for the write-behind writer; never blocks the sender.
+
+    The row goes to the database behind db, but db itself is not touched or committed.
+    """
+    try:
+        if db is not None:
+            bind = db.get_bind()
+        else:
+            from app.core.database import engine as bind
+        bind = getattr(bind, "engine", bind)
+        notification_log_writer.add(bind, {
+            "user_id": user_id,
+            "team_id": team_id,
+            "type": type,
+            "status": status,
+            "payload": payload[:LOG_PAYLOAD_LIMIT] if payload else None,
+            "error_message": error,
+            "created_at": datetime.now(timezone.utc),
+        })
+    except Exception as e:
+        logger.error(f"Failed to log notification: {e}")
@@ -0,0 +1,83 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, desc
+from datetime import datetime
+from typing import List, Optional
+from app.models.task import Task
+from app.models.team import Team
+from app.models.user import User
+
+# Task has no creation timestamp, so date ranges apply to one of these columns
+DATE_FIELDS = {
+    "deadline": Task.deadline,
+    "completed_at": Task.completed_at,
+}
+
+
+def _task_conditions(status: str = None, start: datetime = None, end: datetime = None, date_field: str = "deadline") -> list:
+    """Build the task-side filters shared by every report.
+
+    They are applied to the JOIN condition rather than the WHERE clause so users and
+    teams with no matching tasks still appear with a count of zero.
+    """
+    col = DATE_FIELDS.get(date_field)
+    if col is None:
+        raise ValueError(f"Unsupported date field: {date_field}")
+
+    conditions = []
+    if status:
+        conditions.append(Task.status.ilike(status))
+    if start:
+        conditions.append(col >= start)
+    if end:
+        conditions.append(col <= end)
+    return conditions
+
+
+def tasks_per_user(db: Session, team_id: int = None, status: str = None, start: datetime = None, end: datetime = None,
+                   date_field: str = "deadline", limit: Optional[int] = None) -> List[dict]:
+    """Task count per user computed with a single GROUP BY.
+
+    With `limit` set the database orders by count and returns only the top N rows.
+    """
+    join_on = and_(Task.user_id == User.id, *_task_conditions(status, start, end, date_field))
+    task_count = func.count(Task.id).label("task_count")
+
+    query = db.query(User.id, User.username, task_count).outerjoin(Task, join_on)
+    if team_id:
+        query = query.filter(User.team_id == team_id)
+    query = query.group_by(User.id, User.username)
+
+    if limit:
+        query = query.order_by(desc(task_count), User.id.asc()).limit(limit)
+    else:
+        query = query.order_by(User.id.asc())
+
+    return [{"user_id": r.id, "username": r.username, "task_count": r.task_count} for r in query.all()]
+
+
+def tasks_per_team(db: Session, team_id: int = None, status: str = None, start: datetime = None, end: datetime = None,
+                   date_field: str = "deadline", limit: Optional[int] = None) -> List[dict]:
+    """Task count per team computed with a single GROUP BY."""
+    join_on = and_(Task.team_id == Team.id, *_task_conditions(status, start, end, date_field))
+    task_count = func.count(Task.id).label("task_count")
+
+    query = db.query(Team.id, Team.name, task_count).outerjoin(Task, join_on)
+    if team_id:
+        query = query.filter(Team.id == team_id)
+    query = query.group_by(Team.id, Team.name)
+
+    if limit:
+        query = query.order_by(desc(task_count), Team.id.asc()).limit(limit)
+    else:
+        query = query.order_by(Team.id.asc())
+
+    return [{"team_id": r.id, "team_name": r.name, "task_count": r.task_count} for r in query.all()]
+
+
+def workload_distribution(db: Session, team_id: int = None, status: str = None, start: datetime = None, end: datetime = None,
+                          date_field: str = "deadline", top: int = 10) -> dict:
+    """Tasks grouped by team plus the busiest users. Two queries regardless of org size."""
+    return {
+        "teams": tasks_per_team(db, team_id=team_id, status=status, start=start, end=end, date_field=date_field),
+        "top_users": tasks_per_user(db, team_id=team_id, status=status, start=start, end=end, date_field=date_field, limit=top),
+    }
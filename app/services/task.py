@@ -1,10 +1,41 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.task import Task
 from app.schemas.task import TaskCreate, TaskUpdate
+from app.core.pagination import encode_cursor, decode_cursor, clamp_page_size, estimate_count_async
 from fastapi import BackgroundTasks
-from app.services.notification import send_email_notification, send_webhook_notification, create_in_app_notification
+from app.services.notification import enqueue_email, enqueue_webhook, create_in_app_notifications, publish_topic_events
+from app.core.sse import team_topic, task_topic
 from app.models.team import Team 
 from app.models.user import User
+from datetime import datetime
+
+# Fields carried by task board events; updates send only the ones that changed
+TASK_EVENT_FIELDS = ("title", "description", "status", "priority", "user_id", "team_id", "deadline", "completed_at")
+
+
+def _task_fields(task: Task) -> dict:
+    fields = {}
+    for field in TASK_EVENT_FIELDS:
+        value = getattr(task, field)
+        fields[field] = value.isoformat() if isinstance(value, datetime) else value
+    return fields
+
+
+def _task_team_ids(db: Session, task: Task) -> set:
+    """Teams whose board shows the task: its own team and the assignee's."""
+    team_ids = {task.team_id}
+    if task.user_id:
+        assignee = db.get(User, task.user_id)
+        team_ids.add(assignee.team_id if assignee else None)
+    return {t for t in team_ids if t}
+
+
+def _publish_task_event(task_id: int, team_ids: set, message: dict, background_tasks: BackgroundTasks = None):
+    """Send a task board event to task:{id} and every affected team:{id} topic."""
+    topics = [task_topic(task_id)] + [team_topic(t) for t in sorted(team_ids)]
+    publish_topic_events([(topic, {**message, "topic": topic}) for topic in topics], background_tasks)
+
 
 def create_new_task(db: Session, task: TaskCreate, background_tasks: BackgroundTasks = None, user_id: int = None, team_id: int = None):
     # We map the Pydantic schema to the Database Model
@@ -17,62 +48,60 @@ def create_new_task(db: Session, task: TaskCreate, background_tasks: BackgroundT
         deadline=task.deadline
     )
     db.add(db_task)
+    db.flush()
+
+    # Email to Assignee goes through the outbox, committed atomically with the task
+    if db_task.user_id:
+        assignee = db.get(User, db_task.user_id)
+        enqueue_email(
+            db,
+            db_task.user_id,
+            f"New Task Assigned: {db_task.title}",
+            f"<p>You have been assigned a new task: <b>{db_task.title}</b></p><p>Description: {db_task.description}</p>",
+            digest=bool(assignee and assignee.email_digest),
+        )
     db.commit()
     db.refresh(db_task)
 
+    _publish_task_event(db_task.id, _task_team_ids(db, db_task),
+                        {"type": "task_created", "task_id": db_task.id, "task": _task_fields(db_task)}, background_tasks)
+
     # Trigger Notification
-    # 1. Email to Assignee
+    recipients = []
+    broadcasts = []
     try:
         # If assigned to a specific user
         if db_task.user_id:
             assignee = db.query(User).filter(User.id == db_task.user_id).first()
             if assignee:
-                if background_tasks:
-                    background_tasks.add_task(
-                        send_email_notification,
-                        None,
-                        assignee.id,
-                        f"New Task Assigned: {db_task.title}",
-                        f"<p>You have been assigned a new task: <b>{db_task.title}</b></p><p>Description: {db_task.description}</p>"
-                    )
-
-                create_in_app_notification(db, assignee.id, "New Task Assigned", f"You have been assigned: {db_task.title}", background_tasks=background_tasks)
+                recipients.append((assignee.id, "New Task Assigned", f"You have been assigned: {db_task.title}"))
 
                 # Notify manager of assignee if they exist and are different
                 if assignee.team_id:
                     team = db.query(Team).filter(Team.id == assignee.team_id).first()
                     if team and team.manager_id and team.manager_id != assignee.id:
-                        create_in_app_notification(db, team.manager_id, "Team Member Assigned Task", f"{assignee.username} was assigned: {db_task.title}", background_tasks=background_tasks)
+                        recipients.append((team.manager_id, "Team Member Assigned Task", f"{assignee.username} was assigned: {db_task.title}"))
                 
-                # Notify admins about new assignment so dashboards refresh for oversight
-                try:
-                    admins = db.query(User).filter(User.role == "admin").all()
-                    for a in admins:
-                        # avoid notifying the creator twice if they are admin and the assignee
-                        create_in_app_notification(db, a.id, "Task Assigned", f"{assignee.username} was assigned task: {db_task.title}", background_tasks=background_tasks)
-                except Exception:
-                    pass
+                # Notify admins about new assignment so dashboards refresh for oversight.
+                # One broadcast row for the role instead of a row per admin.
+                broadcasts.append({"target_role": "admin", "title": "Task Assigned", "message": f"{assignee.username} was assigned task: {db_task.title}"})
 
         # If assigned to a team (no specific user), notify all team members and manager
         if db_task.team_id and not db_task.user_id:
             team = db.query(Team).filter(Team.id == db_task.team_id).first()
             if team:
-                members = db.query(User).filter(User.team_id == team.id).all()
-                for m in members:
-                    # Skip if member has no notifications or is the creator (not tracked here)
-                    create_in_app_notification(db, m.id, "New Team Task", f"A new task was created for {team.name}: {db_task.title}", background_tasks=background_tasks)
+                # One broadcast row the whole team sees on read
+                broadcasts.append({"target_team_id": team.id, "title": "New Team Task", "message": f"A new task was created for {team.name}: {db_task.title}"})
 
                 # Notify team manager
                 if team.manager_id:
-                    create_in_app_notification(db, team.manager_id, "Team Task Created", f"New task for your team {team.name}: {db_task.title}", background_tasks=background_tasks)
+                    recipients.append((team.manager_id, "Team Task Created", f"New task for your team {team.name}: {db_task.title}"))
                 
                 # Notify admins for visibility
-                try:
-                    admins = db.query(User).filter(User.role == "admin").all()
-                    for a in admins:
-                        create_in_app_notification(db, a.id, "Team Task Created", f"New task for team {team.name}: {db_task.title}", background_tasks=background_tasks)
-                except Exception:
-                    pass
+                broadcasts.append({"target_role": "admin", "title": "Team Task Created", "message": f"New task for team {team.name}: {db_task.title}"})
+
+        # One transaction and one broadcast pass for the whole fan-out
+        create_in_app_notifications(db, recipients, background_tasks=background_tasks, broadcasts=broadcasts)
     except Exception as e:
         print(f"Notification Error: {e}")
 
@@ -80,61 +109,143 @@ def create_new_task(db: Session, task: TaskCreate, background_tasks: BackgroundT
 
 from app.models.user import User
 
-def get_tasks_for_user(db: Session, user: User, status: str = None, priority: str = None, sort_by: str = None, order: str = "asc"):
-    from sqlalchemy import desc, asc
-    
+def _tasks_for_user_stmt(user: User, status: str = None, priority: str = None):
+    from sqlalchemy import or_, select
+    from sqlalchemy.orm import selectinload
+    from app.models.team import Team
+
     if user.role == 'admin':
         # Admin sees ALL tasks
-        query = db.query(Task)
+        stmt = select(Task)
     elif user.role == 'manager':
         # Manager should see tasks assigned to themselves, tasks assigned to teams they manage,
         # and tasks assigned to members of teams they manage.
-        from app.models.team import Team
-        from sqlalchemy import or_
-
-        # Query managed teams using current DB session (robust even if user object is detached)
-        managed_team_ids = [t.id for t in db.query(Team).filter(Team.manager_id == user.id).all()]
+        # Expressed as subqueries so the whole listing is a single statement.
+        managed_team_ids = select(Team.id).where(Team.manager_id == user.id)
+        member_ids = select(User.id).where(User.team_id.in_(managed_team_ids))
 
-        # Gather member user ids for those teams
-        member_ids = []
-        if managed_team_ids:
-            members = db.query(User).filter(User.team_id.in_(managed_team_ids)).all()
-            member_ids = [m.id for m in members]
-
-        conditions = [Task.user_id == user.id]
-        if managed_team_ids:
-            conditions.append(Task.team_id.in_(managed_team_ids))
-        if member_ids:
-            conditions.append(Task.user_id.in_(member_ids))
-
-        query = db.query(Task).filter(or_(*conditions))
+        stmt = select(Task).where(or_(
+            Task.user_id == user.id,
+            Task.team_id.in_(managed_team_ids),
+            Task.user_id.in_(member_ids),
+        ))
     else:
         # Regular employee: only tasks assigned to them
-        query = db.query(Task).filter(Task.user_id == user.id)
+        stmt = select(Task).where(Task.user_id == user.id)
     
     if status:
-        query = query.filter(Task.status.ilike(status))
+        stmt = stmt.where(Task.status.ilike(status))
     if priority:
-        query = query.filter(Task.priority.ilike(priority))
-        
-    if sort_by:
-        if sort_by == "deadline":
-            col = Task.deadline
-        elif sort_by == "priority":
-            col = Task.priority
-        elif sort_by == "created_at":
-            col = Task.id
-        else:
-            col = Task.id
-            
-        if order == "desc":
-             query = query.order_by(desc(col))
-        else:
-             query = query.order_by(asc(col))
+        stmt = stmt.where(Task.priority.ilike(priority))
+
+    # TaskResponse serializes subtasks; load them in one extra query instead of one per task
+    return stmt.options(selectinload(Task.subtasks))
+
+
+def _sort_spec(sort_by: str = None, order: str = "asc"):
+    """Resolve the requested sort into (cursor key, column, descending).
+
+    Tasks have no creation timestamp; ids are assigned in creation order so
+    created_at sorts by id. Without sort_by the listing is newest first.
+    """
+    if not sort_by:
+        return "id", Task.id, True
+    if sort_by == "deadline":
+        return "deadline", Task.deadline, order == "desc"
+    if sort_by == "priority":
+        return "priority", Task.priority, order == "desc"
+    return "id", Task.id, order == "desc"
+
+
+def _apply_keyset(stmt, key: str, col, descending: bool, cursor: str = None):
+    """Order by (col, id) with NULLs last and, given a cursor, seek past the previous page."""
+    from sqlalchemy import and_, or_
+
+    id_order = Task.id.desc() if descending else Task.id.asc()
+    if key == "id":
+        stmt = stmt.order_by(id_order)
     else:
-        query = query.order_by(Task.id.desc())
+        # Portable NULLS LAST: false (0) sorts before true (1) on every backend
+        stmt = stmt.order_by(col.is_(None), col.desc() if descending else col.asc(), id_order)
+
+    if cursor:
+        data = decode_cursor(cursor)
+        if data.get("k") != key or data.get("d") != descending or not isinstance(data.get("id"), int):
+            raise ValueError("Cursor does not match the requested sort order")
+        last_id = data["id"]
+        id_seek = Task.id < last_id if descending else Task.id > last_id
+
+        if key == "id":
+            stmt = stmt.where(id_seek)
+        elif data.get("v") is None:
+            # Already inside the trailing NULL group
+            stmt = stmt.where(and_(col.is_(None), id_seek))
+        else:
+            # Both sort keys are stored as strings (deadline as ISO 8601); anything else was tampered with
+            if not isinstance(data["v"], str):
+                raise ValueError("Invalid cursor")
+            value = datetime.fromisoformat(data["v"]) if key == "deadline" else data["v"]
+            col_seek = col < value if descending else col > value
+            stmt = stmt.where(or_(col_seek, and_(col == value, id_seek), col.is_(None)))
+    return stmt
+
+
+def _next_cursor(task: Task, key: str, descending: bool) -> str:
+    value = None
+    if key == "deadline" and task.deadline is not None:
+        value = task.deadline.isoformat()
+    elif key == "priority":
+        value = task.priority
+    return encode_cursor({"k": key, "d": descending, "v": value, "id": task.id})
+
+
+def get_tasks_for_user(db: Session, user: User, status: str = None, priority: str = None, sort_by: str = None, order: str = "asc"):
+    key, col, descending = _sort_spec(sort_by, order)
+    stmt = _apply_keyset(_tasks_for_user_stmt(user, status, priority), key, col, descending)
+    return db.execute(stmt).scalars().all()
+
 
-    return query.all()
+async def get_tasks_for_user_async(db: AsyncSession, user: User, status: str = None, priority: str = None, sort_by: str = None, order: str = "asc",
+                                   cursor: str = None, limit: int = None, include_total: bool = False):
+    """One keyset page of the user's tasks.
+
+    Returns (tasks, next_cursor, total_estimate). next_cursor is None on the last page;
+    total_estimate is only computed when include_total is set.
+    Raises ValueError for a malformed or mismatched cursor.
+    """
+    key, col, descending = _sort_spec(sort_by, order)
+    base = _tasks_for_user_stmt(user, status, priority)
+    page_size = clamp_page_size(limit)
+
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    stmt = _apply_keyset(base, key, col, descending, cursor).limit(page_size + 1)
+    result = await db.execute(stmt)
+    rows = result.scalars().all()
+
+    tasks = rows[:page_size]
+    next_cursor = _next_cursor(tasks[-1], key, descending) if len(rows) > page_size else None
+    total = await estimate_count_async(db, base) if include_total else None
+    return tasks, next_cursor, total
+
+
+async def can_subscribe_async(db: AsyncSession, user: User, topic: str) -> bool:
+    """Whether user may follow an SSE topic: team:{id} for their own or a managed team,
+    task:{id} for a task in their task listing. Admins may follow any topic."""
+    from sqlalchemy import select
+
+    kind, _, raw_id = topic.partition(":")
+    if kind not in ("team", "task") or not raw_id.isdigit():
+        return False
+    object_id = int(raw_id)
+    if user.role == "admin":
+        return True
+    if kind == "team":
+        if user.team_id == object_id:
+            return True
+        managed = await db.execute(select(Team.id).where(Team.id == object_id, Team.manager_id == user.id))
+        return managed.first() is not None
+    visible = await db.execute(_tasks_for_user_stmt(user).where(Task.id == object_id).limit(1))
+    return visible.first() is not None
 
 
 def update_task_status(db: Session, task_id: int, status: str, user_id: int):
@@ -146,12 +257,16 @@ def update_task_status(db: Session, task_id: int, status: str, user_id: int):
     db.commit()
     return task
 
-from datetime import datetime
+from datetime import datetime, timezone
 from app.models.history import TaskHistory
 
 def update_task_with_history(db: Session, task: Task, updates: TaskUpdate, user: User, background_tasks: BackgroundTasks = None):
     # Track changes
     changes = []
+    before, teams_before = _task_fields(task), _task_team_ids(db, task)
+    # In-app notifications are collected and sent in one batch after the update commits
+    recipients = []
+    broadcasts = []
     
     if updates.status and updates.status != task.status:
         old_status = task.status
@@ -164,8 +279,8 @@ def update_task_with_history(db: Session, task: Task, updates: TaskUpdate, user:
         else:
             task.completed_at = None
             
-        # Trigger Webhook if Team has URL (schedule if background tasks available)
-        if task.team_id and background_tasks:
+        # Trigger Webhook if Team has URL. Queued in the outbox and committed with the update below.
+        if task.team_id:
             team = db.query(Team).filter(Team.id == task.team_id).first()
             if team and team.webhook_url:
                 payload = {
@@ -173,48 +288,32 @@ def update_task_with_history(db: Session, task: Task, updates: TaskUpdate, user:
                     "title": task.title,
                     "old_status": changes[-1][1],
                     "new_status": updates.status,
-                    "updated_by": user.username
+                    "updated_by": user.username,
+                    "transitions": [{"from": changes[-1][1], "to": updates.status, "by": user.username,
+                                     "at": datetime.now(timezone.utc).isoformat()}],
                 }
-                background_tasks.add_task(send_webhook_notification, None, task.team_id, "task_status_updated", payload)
+                # Rapid moves of the same card are merged into one webhook with every intermediate state
+                enqueue_webhook(db, task.team_id, "task_status_updated", payload,
+                                dedupe_key=f"task_status:{task.team_id}:{task.id}")
 
         # In-App Notification to Assignee (always run when status changes)
         if task.user_id:
-            try:
-                create_in_app_notification(db, task.user_id, "Task Status Updated", f"Task '{task.title}' status changed to {updates.status}", background_tasks=background_tasks)
-            except Exception:
-                pass
+            recipients.append((task.user_id, "Task Status Updated", f"Task '{task.title}' status changed to {updates.status}"))
 
         # SPECIAL COMPLETION NOTIFICATIONS: If task was completed, notify relevant parties
         if str(new_status).lower() == "completed":
-            # 1. Get all Admins
-            admins = db.query(User).filter(User.role == "admin").all()
+            completed_msg = f"{user.username} has completed the task: {task.title}"
+
+            # 1. All Admins, as one broadcast row that excludes the completing user
+            broadcasts.append({"target_role": "admin", "actor_id": user.id, "title": "Task Completed", "message": completed_msg})
             
-            # 2. Get Team Manager (if any)
-            manager = None
+            # 2. Team Manager (if any, and not already covered as an admin)
             if task.team_id:
                 team = db.query(Team).filter(Team.id == task.team_id).first()
-                if team and team.manager_id:
+                if team and team.manager_id and team.manager_id != user.id:
                     manager = db.query(User).filter(User.id == team.manager_id).first()
-
-            # Notification Targets: admins + team manager (if present)
-            targets = set()
-            for a in admins:
-                if a and a.id != user.id:
-                    targets.add(a.id)
-            if manager and manager.id != user.id:
-                targets.add(manager.id)
-
-            for target_id in targets:
-                try:
-                    create_in_app_notification(
-                        db,
-                        target_id,
-                        "Task Completed",
-                        f"{user.username} has completed the task: {task.title}",
-                        background_tasks=background_tasks
-                    )
-                except Exception:
-                    pass
+                    if manager and manager.role != "admin":
+                        recipients.append((manager.id, "Task Completed", completed_msg))
 
     if updates.priority and updates.priority != task.priority:
         # Employee Restriction: cannot change priority
@@ -266,14 +365,24 @@ def update_task_with_history(db: Session, task: Task, updates: TaskUpdate, user:
             
     db.commit()
     db.refresh(task)
+
+    # Boards patch the card with just the fields that changed
+    diff = {f: v for f, v in _task_fields(task).items() if before[f] != v}
+    if diff:
+        _publish_task_event(task.id, teams_before | _task_team_ids(db, task),
+                            {"type": "task_updated", "task_id": task.id, "changes": diff, "by": user.id}, background_tasks)
+
+    create_in_app_notifications(db, recipients, background_tasks=background_tasks, broadcasts=broadcasts)
     return task
 
-def delete_task(db: Session, task_id: int):
+def delete_task(db: Session, task_id: int, background_tasks: BackgroundTasks = None):
     task = db.query(Task).filter(Task.id == task_id).first()
 
     if not task:
         return None
-        
+
+    team_ids = _task_team_ids(db, task)
     db.delete(task)
     db.commit()
-    return True
\ No newline at end of file
+    _publish_task_event(task_id, team_ids, {"type": "task_deleted", "task_id": task_id}, background_tasks)
+    return True
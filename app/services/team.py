@@ -1,7 +1,11 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime, timezone
 from app.models.team import Team
 from app.models.user import User
+from app.models.task import Task
 
 def create_team(db: Session, name: str, description: str = None) -> Team:
     new_team = Team(name=name, description=description)
@@ -10,26 +14,45 @@ def create_team(db: Session, name: str, description: str = None) -> Team:
     db.refresh(new_team)
     return new_team
 
+def get_managed_team_ids(db: Session, user_id: int) -> set:
+    return {row.id for row in db.query(Team.id).filter(Team.manager_id == user_id).all()}
+
 def get_team_by_name(db: Session, name: str) -> Optional[Team]:
     return db.query(Team).filter(Team.name == name).first()
 
 def get_all_teams(db: Session) -> List[Team]:
-    return db.query(Team).options(joinedload(Team.members), joinedload(Team.manager)).order_by(Team.id.asc()).all()
+    return db.query(Team).options(joinedload(Team.members).joinedload(User.team), joinedload(Team.manager).joinedload(User.team)).order_by(Team.id.asc()).all()
+
+async def get_all_teams_async(db: AsyncSession) -> List[Team]:
+    # Everything TeamResponse touches must be loaded up front: AsyncSession can't lazy load
+    stmt = select(Team).options(
+        selectinload(Team.manager).selectinload(User.team),
+        selectinload(Team.members).selectinload(User.team),
+        selectinload(Team.tasks).selectinload(Task.subtasks),
+    ).order_by(Team.id.asc())
+    result = await db.execute(stmt)
+    return result.scalars().all()
 
 def get_team_by_id(db: Session, team_id: int) -> Optional[Team]:
-    return db.query(Team).filter(Team.id == team_id).options(joinedload(Team.members), joinedload(Team.tasks), joinedload(Team.manager)).first()
+    return db.query(Team).filter(Team.id == team_id).options(joinedload(Team.members).joinedload(User.team), selectinload(Team.tasks).selectinload(Task.subtasks), joinedload(Team.manager).joinedload(User.team)).first()
 
 def delete_team(db: Session, team: Team):
     db.delete(team)
     db.commit()
 
+def _join_team(user: User, team: Team):
+    # Team broadcasts sent before this moment stay out of the new member's inbox
+    if user.team_id != team.id:
+        user.team_id = team.id
+        user.team_joined_at = datetime.now(timezone.utc)
+
 def assign_manager_to_team(db: Session, team: Team, manager_id: int) -> Optional[Team]:
     user = db.query(User).filter(User.id == manager_id).first()
     if not user:
         return None
     
     team.manager_id = manager_id
-    user.team_id = team.id
+    _join_team(user, team)
     db.commit()
     db.refresh(team)
     return team
@@ -40,14 +63,14 @@ def add_members_to_team(db: Session, team: Team, user_ids: List[int]) -> bool:
         return False
         
     for user in users:
-        user.team_id = team.id
+        _join_team(user, team)
         
     db.commit()
     db.refresh(team)
     return True
 
 def get_user_team(db: Session, user: User) -> Optional[Team]:
-    team_query = db.query(Team).options(joinedload(Team.members), joinedload(Team.tasks))
+    team_query = db.query(Team).options(joinedload(Team.members).joinedload(User.team), selectinload(Team.tasks).selectinload(Task.subtasks), joinedload(Team.manager).joinedload(User.team))
     
     if user.team_id:
         return team_query.filter(Team.id == user.team_id).first()
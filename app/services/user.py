@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.schemas.user import UserCreate
 from app.core.security import get_password_hash
@@ -61,6 +63,11 @@ def get_user_by_email(db: Session, email: str) -> User | None:
 
     return None
 
+async def get_user_by_email_async(db: AsyncSession, email: str) -> User | None:
+    # Eager-load team: UserResponse reads display_team_name and lazy loads can't run on AsyncSession
+    result = await db.execute(select(User).options(selectinload(User.team)).where(User.email == email))
+    return result.scalars().first()
+
 def get_user_by_username_or_email(db: Session, identifier: str) -> User | None:
     result = db.query(User).filter((User.email == identifier) | (User.username == identifier)).first()
     if result:
@@ -27,4 +27,10 @@ api.interceptors.response.use(
     }
 );
 
+// One page of a keyset-paginated listing; pass nextCursor back to get the page after it
+export const fetchPage = async (url, params = {}, cursor = null) => {
+    const response = await api.get(url, { params: cursor ? { ...params, cursor } : params });
+    return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
 export default api;
\ No newline at end of file
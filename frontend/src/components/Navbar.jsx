@@ -9,6 +9,7 @@ function Navbar() {
     const navigate = useNavigate();
     const location = useLocation();
     const [notifications, setNotifications] = useState([]);
+    const [unreadCount, setUnreadCount] = useState(0);
     const [showNotifs, setShowNotifs] = useState(false);
     const notifRef = useRef(null);
     const { addToast } = useToast();
@@ -21,7 +22,7 @@ function Navbar() {
     const fetchNotifications = async () => {
         if (!user) return;
         try {
-            const res = await api.get('/notifications/');
+            const res = await api.get('/notifications/', { params: { limit: 50 } });
             const newNotifsList = res.data;
 
             // Check for new notifications to show toast
@@ -40,10 +41,20 @@ function Navbar() {
         }
     };
 
+    const fetchUnreadCount = async () => {
+        try {
+            const res = await api.get('/notifications/unread-count');
+            setUnreadCount(res.data.unread_count);
+        } catch (err) {
+            console.error("Failed to fetch unread count", err);
+        }
+    };
+
     const markAsRead = async (id) => {
         try {
-            await api.put(`/notifications/${id}/read`);
+            const res = await api.put(`/notifications/${id}/read`);
             setNotifications(notifications.map(n => n.id === id ? { ...n, is_read: true } : n));
+            setUnreadCount(res.data.unread_count);
         } catch (err) {
             console.error("Failed to mark as read", err);
         }
@@ -53,6 +64,7 @@ function Navbar() {
         try {
             await api.put(`/notifications/read-all`);
             setNotifications(notifications.map(n => ({ ...n, is_read: true })));
+            setUnreadCount(0);
         } catch (err) {
             console.error("Failed to mark all read", err);
         }
@@ -62,13 +74,15 @@ function Navbar() {
         if (user) {
             // Initial fetch
             fetchNotifications();
+            fetchUnreadCount();
 
             // Connect to SSE
             const token = sessionStorage.getItem('token');
             const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000';
             const eventSource = new EventSource(`${apiUrl}/notifications/stream?token=${token}`);
 
-            // Log when connection opens
+            // On automatic reconnects the browser sends Last-Event-ID and the server
+            // replays whatever was missed, so there is nothing to refetch here
             eventSource.onopen = () => {
                 console.info('SSE connected for notifications');
             };
@@ -76,6 +90,24 @@ function Navbar() {
             eventSource.onmessage = (event) => {
                 const data = JSON.parse(event.data);
 
+                // Badge updates are pushed by the server whenever the counter changes
+                if (data.type === 'unread_count') {
+                    setUnreadCount(data.unread_count);
+                    return;
+                }
+
+                // The server skipped events this stream fell behind on; reload instead
+                if (data.type === 'resync') {
+                    fetchNotifications();
+                    fetchUnreadCount();
+                    return;
+                }
+
+                // Other control messages (e.g. server_disconnect) aren't notifications
+                if (data.type) {
+                    return;
+                }
+
                 // Ensure created_at is parsed correctly as local time.
                 if (data.created_at && typeof data.created_at === 'string') {
                     // If the string lacks timezone info, append 'Z' to treat as UTC
@@ -90,8 +122,10 @@ function Navbar() {
                     return [data, ...prev];
                 });
 
-                // Show toast
-                addToast(data.title, data.message);
+                // Show toast, except for events replayed after a reconnect
+                if (!data.replay) {
+                    addToast(data.title, data.message);
+                }
             };
 
             eventSource.onerror = (err) => {
@@ -117,8 +151,6 @@ function Navbar() {
 
     if (!user) return null;
 
-    const unreadCount = notifications.filter(n => !n.is_read).length;
-
     const isActive = (path) => location.pathname === path ? 'active-link' : '';
 
     return (
@@ -1,12 +1,17 @@
 import { useState, useEffect, useContext } from 'react';
-import api from '../api';
+import api, { fetchPage } from '../api';
 import AuthContext from '../context/AuthContext';
 import Navbar from '../components/Navbar';
 import { useToast } from '../context/ToastContext';
 
+// Tasks per "Load more" click; further pages are only fetched on demand
+const TASK_PAGE_SIZE = 50;
+
 function Dashboard() {
     const { user } = useContext(AuthContext);
     const [tasks, setTasks] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [showModal, setShowModal] = useState(false);
     const [showCompleted, setShowCompleted] = useState(false);
@@ -32,17 +37,37 @@ function Dashboard() {
         }
     }, [user]);
 
+    // Reloads what is on screen: the first page, or as many tasks as have been loaded so far
     const fetchTasks = async () => {
         try {
-            const response = await api.get('/tasks/');
-            setTasks(response.data);
+            const page = await fetchPage('/tasks/', { limit: Math.max(tasks.length, TASK_PAGE_SIZE) });
+            setTasks(page.items);
+            setNextCursor(page.nextCursor);
+            return page.items;
         } catch (error) {
             console.error("Failed to fetch tasks", error);
+            return tasks;
         } finally {
             setLoading(false);
         }
     };
 
+    const loadMoreTasks = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await fetchPage('/tasks/', { limit: TASK_PAGE_SIZE }, nextCursor);
+            setTasks(prev => {
+                const seen = new Set(prev.map(t => t.id));
+                return [...prev, ...page.items.filter(t => !seen.has(t.id))];
+            });
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error("Failed to load more tasks", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const fetchTeams = async () => {
         try {
             const res = await api.get('/teams/');
@@ -89,7 +114,6 @@ function Dashboard() {
             await api.post(`/tasks/${selectedTask.id}/subtasks`, { title: subtaskTitle });
             setSubtaskTitle('');
             refreshSelectedTask();
-            fetchTasks(); // Refresh main list too for progress bars
         } catch (err) {
             alert(err.response?.data?.detail || "Failed to add subtask");
         }
@@ -99,7 +123,6 @@ function Dashboard() {
         try {
             await api.put(`/subtasks/${subtaskId}`, { is_completed: !currentStatus, title: title });
             refreshSelectedTask();
-            fetchTasks();
         } catch (err) {
             console.error(err);
         }
@@ -110,7 +133,6 @@ function Dashboard() {
         try {
             await api.delete(`/subtasks/${subtaskId}`);
             refreshSelectedTask();
-            fetchTasks();
         } catch (err) {
             console.error(err);
         }
@@ -120,16 +142,15 @@ function Dashboard() {
         try {
             await api.put(`/tasks/${selectedTask.id}`, updates);
             refreshSelectedTask();
-            fetchTasks();
         } catch (err) {
             alert("Failed to update task");
         }
     };
 
+    // Reloads the main list too (progress bars) and picks the selected task out of it
     const refreshSelectedTask = async () => {
-        const response = await api.get('/tasks/');
-        setTasks(response.data);
-        const updated = response.data.find(t => t.id === selectedTask.id);
+        const loaded = await fetchTasks();
+        const updated = loaded.find(t => t.id === selectedTask.id);
         setSelectedTask(updated);
     };
 
@@ -234,6 +255,13 @@ function Dashboard() {
                         })}
                     </div>
                 )}
+                {!loading && nextCursor && (
+                    <div style={{ display: 'flex', justifyContent: 'center', marginTop: '20px' }}>
+                        <button onClick={loadMoreTasks} className="create-btn" disabled={loadingMore}>
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
 
             {showModal && (
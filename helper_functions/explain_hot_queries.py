@@ -0,0 +1,167 @@
+"""Print EXPLAIN plans for the hot service queries before and after the index pack.
+
+Seeds a large synthetic dataset, drops the indexes added in migration a7c1e5d2f9b4,
+prints the plan of every hot query, recreates the indexes and prints the plans again.
+
+    python helper_functions/explain_hot_queries.py --url sqlite:///./explain.db --users 5000
+    python helper_functions/explain_hot_queries.py --url postgresql://... --analyze
+
+Never point this at a database you care about: it drops and recreates all tables.
+"""
+import sys
+import os
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, insert, text
+
+from app.core.database import Base
+from app.models.user import User
+from app.models.team import Team
+from app.models.task import Task
+from app.models.notification import Notification
+from app.models.history import TaskHistory
+from app.models.comment import Comment
+
+PACK_INDEXES = [
+    "ix_tasks_user_id",
+    "ix_tasks_team_id",
+    "ix_tasks_deadline_open",
+    "ix_notifications_user_created",
+    "ix_notifications_user_unread",
+    "ix_task_history_task_timestamp",
+    "ix_comments_task_created",
+    "ix_users_team_id",
+    "ix_users_role",
+]
+
+# Mirrors of the queries issued by app/services, app/routes and app/jobs
+HOT_QUERIES = [
+    ("employee task list (services.task.get_tasks_for_user)",
+     "SELECT * FROM tasks WHERE user_id = :user_id ORDER BY id DESC"),
+    ("manager task list (services.task.get_tasks_for_user)",
+     "SELECT * FROM tasks WHERE user_id = :user_id OR team_id IN (SELECT id FROM teams WHERE manager_id = :user_id) "
+     "OR user_id IN (SELECT id FROM users WHERE team_id IN (SELECT id FROM teams WHERE manager_id = :user_id)) ORDER BY id DESC"),
+    ("team tasks (services.team.get_user_team)",
+     "SELECT * FROM tasks WHERE team_id = :team_id"),
+    ("overdue tasks (jobs.deadline_checker)",
+     "SELECT * FROM tasks WHERE deadline IS NOT NULL AND completed_at IS NULL AND deadline < :now"),
+    ("approaching deadlines (jobs.deadline_checker)",
+     "SELECT * FROM tasks WHERE deadline IS NOT NULL AND completed_at IS NULL AND deadline >= :now AND deadline <= :window_end"),
+    ("notification list (routes.notification.get_my_notifications)",
+     "SELECT * FROM notifications WHERE user_id = :user_id ORDER BY created_at DESC"),
+    ("mark all read (routes.notification.mark_all_as_read)",
+     "SELECT id FROM notifications WHERE user_id = :user_id AND is_read = :unread"),
+    ("task history (routes.task.get_task_history)",
+     "SELECT * FROM task_history WHERE task_id = :task_id ORDER BY timestamp DESC"),
+    ("task comments (routes.task.get_task_comments)",
+     "SELECT * FROM comments WHERE task_id = :task_id ORDER BY created_at ASC"),
+    ("team members (services.team.get_user_team)",
+     "SELECT * FROM users WHERE team_id = :team_id ORDER BY id"),
+    ("admins (services.task.create_new_task)",
+     "SELECT * FROM users WHERE role = 'admin'"),
+]
+
+
+def seed(engine, n_users, tasks_per_user, notifications_per_user):
+    random.seed(7)
+    n_teams = max(1, n_users // 25)
+    now = datetime.now(timezone.utc)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Team), [{"id": i, "name": f"team_{i}"} for i in range(1, n_teams + 1)])
+        roles = ["admin"] * 5 + ["manager"] * n_teams
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user_{i}", "email": f"user_{i}@ems.com", "hashed_password": "x",
+             "role": roles[i - 1] if i <= len(roles) else "employee", "team_id": random.randint(1, n_teams)}
+            for i in range(1, n_users + 1)
+        ])
+        conn.execute(text("UPDATE teams SET manager_id = id + 5"))
+
+        n_tasks = n_users * tasks_per_user
+        conn.execute(insert(Task), [
+            {"id": i, "title": f"task_{i}", "user_id": random.randint(1, n_users), "team_id": random.randint(1, n_teams),
+             "status": "Completed" if i % 3 == 0 else "Open",
+             "completed_at": now if i % 3 == 0 else None,
+             "deadline": now + timedelta(hours=random.randint(-500, 500))}
+            for i in range(1, n_tasks + 1)
+        ])
+        conn.execute(insert(Notification), [
+            {"user_id": random.randint(1, n_users), "title": "Seed", "message": f"notification {i}",
+             "is_read": i % 4 != 0, "created_at": now - timedelta(minutes=i)}
+            for i in range(n_users * notifications_per_user)
+        ])
+        conn.execute(insert(TaskHistory), [
+            {"task_id": random.randint(1, n_tasks), "user_id": random.randint(1, n_users), "action": "update",
+             "timestamp": now - timedelta(minutes=i)}
+            for i in range(n_tasks * 2)
+        ])
+        conn.execute(insert(Comment), [
+            {"task_id": random.randint(1, n_tasks), "user_id": random.randint(1, n_users), "content": "seed",
+             "created_at": now - timedelta(minutes=i)}
+            for i in range(n_tasks)
+        ])
+
+
+def _pack_indexes():
+    found = {}
+    for table in Base.metadata.tables.values():
+        for idx in table.indexes:
+            if idx.name in PACK_INDEXES:
+                found[idx.name] = idx
+    return [found[name] for name in PACK_INDEXES]
+
+
+def explain_all(engine, label, analyze=False):
+    now = datetime.now(timezone.utc)
+    params = {"user_id": 42, "team_id": 3, "task_id": 17, "unread": False, "now": now, "window_end": now + timedelta(hours=24)}
+
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        if engine.dialect.name == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        elif analyze:
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+        else:
+            prefix = "EXPLAIN "
+
+        print(f"\n==================== {label} ====================")
+        for name, sql in HOT_QUERIES:
+            print(f"\n--- {name}")
+            for row in conn.execute(text(prefix + sql), params):
+                # SQLite returns (id, parent, notused, detail); Postgres returns one text column
+                print("   ", row[-1])
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default="sqlite:///./explain.db")
+    p.add_argument("--users", type=int, default=5000)
+    p.add_argument("--tasks-per-user", type=int, default=20)
+    p.add_argument("--notifications-per-user", type=int, default=50)
+    p.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE on Postgres")
+    args = p.parse_args()
+
+    engine = create_engine(args.url)
+    print(f"Seeding {args.users} users into {engine.url.render_as_string(hide_password=True)} ...")
+    seed(engine, args.users, args.tasks_per_user, args.notifications_per_user)
+
+    indexes = _pack_indexes()
+    with engine.begin() as conn:
+        for idx in indexes:
+            idx.drop(bind=conn, checkfirst=True)
+    explain_all(engine, "BEFORE index pack", analyze=args.analyze)
+
+    with engine.begin() as conn:
+        for idx in indexes:
+            idx.create(bind=conn, checkfirst=True)
+    explain_all(engine, "AFTER index pack", analyze=args.analyze)
+
+
+if __name__ == "__main__":
+    main()
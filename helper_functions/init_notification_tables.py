@@ -6,7 +6,7 @@ from app.models.task import Task
 from app.models.subtask import SubTask
 from app.models.comment import Comment
 from app.models.history import TaskHistory
-from app.models.notification import NotificationLog
+from app.models.notification import NotificationLog, NotificationPayload
 from app.models.password_reset import PasswordReset
 from sqlalchemy import text
 import traceback
@@ -23,8 +23,9 @@ def migrate_notifications():
             except Exception as e:
                 print(f"Column add warning: {e}")
 
-            # Create NotificationLog table
+            # Create NotificationLog table (and the payload table its rows point at)
             print("Creating notification_logs table...")
+            NotificationPayload.__table__.create(conn, checkfirst=True)
             NotificationLog.__table__.create(conn, checkfirst=True)
             
             print("Migration success.")
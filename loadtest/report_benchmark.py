@@ -0,0 +1,96 @@
+"""Benchmark the /reports aggregates against the old per-row COUNT implementation.
+
+Seeds an in-memory SQLite database with a growing number of users/teams/tasks and
+reports the number of SQL statements and wall time for each implementation.
+
+    python loadtest/report_benchmark.py --sizes 100 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.user import User
+from app.models.team import Team
+from app.models.task import Task
+from app.services import report as report_service
+
+
+def legacy_workload(db):
+    # The pre-engine implementation: one COUNT per team and per user
+    team_data = []
+    for t in db.query(Team.id, Team.name).all():
+        team_data.append({"team_id": t.id, "task_count": db.query(Task).filter(Task.team_id == t.id).count()})
+    user_load = []
+    for u in db.query(User.id, User.username).all():
+        user_load.append({"user_id": u.id, "task_count": db.query(Task).filter(Task.user_id == u.id).count()})
+    user_load = sorted(user_load, key=lambda x: x["task_count"], reverse=True)[:10]
+    return {"teams": team_data, "top_users": user_load}
+
+
+def seed(engine, n_users, tasks_per_user=5):
+    n_teams = max(1, n_users // 50)
+    with engine.begin() as conn:
+        conn.execute(insert(Team), [{"id": i, "name": f"team_{i}"} for i in range(1, n_teams + 1)])
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user_{i}", "email": f"user_{i}@ems.com", "hashed_password": "x",
+             "role": "employee", "team_id": random.randint(1, n_teams)}
+            for i in range(1, n_users + 1)
+        ])
+        conn.execute(insert(Task), [
+            {"title": f"task_{i}", "user_id": random.randint(1, n_users), "team_id": random.randint(1, n_teams),
+             "status": random.choice(["Open", "In Progress", "Completed"])}
+            for i in range(n_users * tasks_per_user)
+        ])
+
+
+def measure(engine, fn):
+    counter = {"n": 0}
+
+    def _count(*args, **kwargs):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        with Session(bind=engine) as db:
+            start = time.perf_counter()
+            fn(db)
+            elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return counter["n"], elapsed
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    p.add_argument("--skip-legacy-above", type=int, default=5000, help="Skip the slow legacy path above this many users")
+    args = p.parse_args()
+
+    random.seed(42)
+    print(f"{'users':>8} | {'legacy queries':>14} | {'legacy ms':>10} | {'engine queries':>14} | {'engine ms':>10}")
+    for n in args.sizes:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        seed(engine, n)
+
+        if n <= args.skip_legacy_above:
+            legacy_q, legacy_ms = measure(engine, legacy_workload)
+        else:
+            legacy_q, legacy_ms = "-", float("nan")
+        engine_q, engine_ms = measure(engine, report_service.workload_distribution)
+
+        print(f"{n:>8} | {legacy_q:>14} | {legacy_ms:>10.1f} | {engine_q:>14} | {engine_ms:>10.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark email throughput: one SMTP session per message vs the pooled SMTPPool.
+
+Starts a local aiosmtpd stand-in (pip install aiosmtpd) unless --host/--port point at
+a real relay, then sends the same messages both ways and reports messages per second:
+
+  1. per-message - connect, EHLO, (AUTH), send, QUIT for every email, which is what
+     building a FastMail client per message did.
+  2. pooled      - SMTPPool with --pool-size long-lived connections.
+
+    python loadtest/smtp_benchmark.py --messages 500 --pool-size 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import aiosmtplib
+
+from app.core.mailer import SMTPPool, build_message
+
+
+class Sink:
+    def __init__(self):
+        self.count = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.count += 1
+        return "250 OK"
+
+
+async def per_message(host, port, n, concurrency, username, password):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            smtp = aiosmtplib.SMTP(hostname=host, port=port, start_tls=False)
+            await smtp.connect()
+            if username:
+                await smtp.login(username, password)
+            await smtp.send_message(build_message("bench@ems", f"user{i}@ems", f"Task {i}", "<p>assigned</p>"))
+            await smtp.quit()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start
+
+
+async def pooled(host, port, n, pool_size, username, password):
+    pool = SMTPPool(hostname=host, port=port, username=username, password=password, sender="bench@ems",
+                    size=pool_size, start_tls=False, use_tls=False)
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.send(f"user{i}@ems", f"Task {i}", "<p>assigned</p>") for i in range(n)))
+    elapsed = time.perf_counter() - start
+    await pool.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--host", default=None, help="Existing SMTP relay (default: local aiosmtpd)")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--username", default="")
+    parser.add_argument("--password", default="")
+    args = parser.parse_args()
+
+    controller = None
+    sink = None
+    host, port = args.host, args.port
+    if host is None:
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            sys.exit("aiosmtpd is required for the local stand-in: pip install aiosmtpd (or pass --host/--port)")
+        sink = Sink()
+        controller = Controller(sink, hostname="127.0.0.1", port=0)
+        controller.start()
+        host, port = controller.hostname, controller.port
+
+    try:
+        print(f"{args.messages} messages to {host}:{port}")
+        for name, run in (
+            ("per-message session", per_message(host, port, args.messages, args.pool_size, args.username, args.password)),
+            (f"pool of {args.pool_size}", pooled(host, port, args.messages, args.pool_size, args.username, args.password)),
+        ):
+            elapsed = asyncio.run(run)
+            print(f"  {name:<22} {elapsed:7.2f}s  {args.messages / elapsed:8.0f} msg/s")
+        if sink is not None:
+            print(f"  received {sink.count} messages")
+    finally:
+        if controller is not None:
+            controller.stop()
+
+
+if __name__ == "__main__":
+    main()
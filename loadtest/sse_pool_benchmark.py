@@ -0,0 +1,151 @@
+"""Load test: database pool checkouts while SSE streams are open.
+
+Serves the app with uvicorn against a throwaway SQLite file (or --database-url),
+opens one SSE stream per user in steps and, once each step's streams are
+established, reports how many pooled connections are checked out on the sync and
+async engines and how long a regular endpoint (/notifications/unread-count) takes.
+Streams should hold no connection, so checked_out stays flat as streams grow.
+
+    python loadtest/sse_pool_benchmark.py --steps 0,50,200,500 --pool-size 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="0,50,200,500", help="comma-separated numbers of open streams")
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=5)
+    parser.add_argument("--database-url", default=None, help="default: a temporary SQLite file")
+    return parser.parse_args()
+
+
+def configure(args):
+    """Settings the app reads at import time; call before importing app."""
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/sse_pool.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(args.max_overflow)
+    # A drained pool shows up as failed requests rather than a 30s stall
+    os.environ["DB_POOL_TIMEOUT"] = "3"
+    os.environ["ENABLE_DEADLINE_CHECKER"] = "false"
+    os.environ["ENABLE_OUTBOX_DISPATCHER"] = "false"
+    os.environ["RATE_LIMIT_REQUESTS"] = "1000000"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int):
+    from app.main import app
+
+    # Per-request access logs would drown the table
+    logging.getLogger("app_logger").setLevel(logging.WARNING)
+
+    class Server(uvicorn.Server):
+        def install_signal_handlers(self):
+            pass
+
+    server = Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error", backlog=4096))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def create_users(n: int) -> list:
+    """Tokens for n load-test users (one stream each; a user is capped at MAX_CONNECTIONS_PER_USER)."""
+    from app.core.database import Base, SessionLocal, engine
+    from app.core.security import create_access_token
+    from app.models.user import User
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    emails = [f"sse-load-{i}@ems.local" for i in range(max(n, 1))]
+    existing = {e for (e,) in db.query(User.email).filter(User.email.in_(emails))}
+    db.add_all([User(username=e.split("@")[0], email=e, hashed_password="x", role="employee", is_active=True)
+                for e in emails if e not in existing])
+    db.commit()
+    db.close()
+    return [create_access_token({"sub": e}) for e in emails]
+
+
+async def open_stream(client: httpx.AsyncClient, url: str, headers: dict, ready: asyncio.Event, stop: asyncio.Event):
+    async with client.stream("GET", url, headers=headers) as response:
+        response.raise_for_status()
+        ready.set()
+        await stop.wait()
+
+
+async def run(base: str, tokens: list, steps):
+    from app.core.database import async_engine, engine
+    from app.core.db_metrics import pool_status
+
+    headers = {"Authorization": f"Bearer {tokens[0]}"}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    stop = asyncio.Event()
+    streams = []
+    failed = 0
+    async with httpx.AsyncClient(base_url=base, timeout=10, limits=limits) as streams_client, \
+            httpx.AsyncClient(base_url=base, timeout=10) as client:
+        print(f"{'streams':>8} {'sync out':>9} {'async out':>10} {'unread-count':>13}")
+        for target in steps:
+            new = []
+            while len(streams) + len(new) < target:
+                ready = asyncio.Event()
+                stream_headers = {"Authorization": f"Bearer {tokens[len(streams) + len(new)]}"}
+                task = asyncio.create_task(open_stream(streams_client, "/notifications/stream", stream_headers, ready, stop))
+                new.append((task, ready))
+            for task, ready in new:
+                done, _ = await asyncio.wait({task, asyncio.ensure_future(ready.wait())}, return_when=asyncio.FIRST_COMPLETED)
+                if task in done and task.exception() is not None:
+                    failed += 1
+            streams.extend(new)
+
+            sync_out = pool_status(engine).get("checked_out", "-")
+            async_out = pool_status(async_engine).get("checked_out", "-")
+            started = time.perf_counter()
+            try:
+                status = (await client.get("/notifications/unread-count", headers=headers)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{len(streams):>8} {sync_out:>9} {async_out:>10} {elapsed:>9.1f} ms {status}  (streams failed: {failed})")
+
+        stop.set()
+        await asyncio.gather(*(task for task, _ in streams), return_exceptions=True)
+
+
+def main():
+    args = parse_args()
+    configure(args)
+    steps = [int(n) for n in args.steps.split(",")]
+    tokens = create_users(max(steps))
+    server = start_server(free_port())
+    base = f"http://127.0.0.1:{server.config.port}"
+    print(f"pool_size={args.pool_size} max_overflow={args.max_overflow} database={os.environ['DATABASE_URL']}")
+    try:
+        asyncio.run(run(base, tokens, steps))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""Scale test: thousands of SSE listeners against a local server and SQLite.
+
+Seeds a throwaway SQLite file with --teams teams (a manager each) and enough
+employees for the largest step, starts uvicorn on it in a subprocess, logs the
+users in through /auth/login and opens --per-user streams per employee on
+/notifications/stream?topics=team:{id}. At each step the managers then create
+--events tasks through POST /tasks/ at --rate per second, each assigned to a
+listening member of their team, and the step reports:
+
+  * end-to-end latency from sending the POST to a listener reading the event
+    (p50/p95/p99/max), for the team board event (task_created on team:{id})
+    and for the assignee's own notification
+  * server memory per connection: VmRSS growth over the pre-stream baseline
+  * server event-loop lag during the burst (event_loop_lag_seconds from
+    /admin/metrics) and this harness's own loop lag, which inflates the
+    latencies it measures
+
+    python loadtest/sse_scale_harness.py --steps 100,500,2000 --events 50 --rate 10
+"""
+import argparse
+import asyncio
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+PASSWORD = "password123"
+TITLE = "sse-load-{}"
+TITLE_RE = re.compile(r"sse-load-(\d+)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="100,500,2000", help="comma-separated numbers of open streams")
+    parser.add_argument("--per-user", type=int, default=5, help="streams per employee (at most MAX_CONNECTIONS_PER_USER)")
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--events", type=int, default=50, help="tasks created per step")
+    parser.add_argument("--rate", type=float, default=10, help="tasks created per second")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for every listener to get every event")
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    return parser.parse_args()
+
+
+def configure(workdir: str):
+    """Point this process and the server at a throwaway SQLite file; call before importing app."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/sse_scale.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ["ENABLE_DEADLINE_CHECKER"] = "false"
+    os.environ["ENABLE_OUTBOX_DISPATCHER"] = "false"
+    os.environ["RATE_LIMIT_REQUESTS"] = "1000000"
+
+
+def raise_fd_limit():
+    """Each stream is a socket on both ends; the server subprocess inherits the limit."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+
+
+def seed(n_teams: int, n_employees: int):
+    """Teams with a manager each, employees spread round-robin over them, and an admin for /admin/metrics."""
+    from app.core.database import Base, SessionLocal, engine
+    from app.core.security import get_password_hash
+    from app.models.team import Team
+    from app.models.user import User
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    hashed = get_password_hash(PASSWORD)
+    teams = [Team(name=f"Load team {i}") for i in range(n_teams)]
+    db.add_all(teams)
+    db.flush()
+    managers = [User(username=f"load_mgr_{i}", email=f"load-mgr-{i}@ems.local", hashed_password=hashed,
+                     role="manager", is_active=True, team_id=team.id) for i, team in enumerate(teams)]
+    employees = [User(username=f"load_emp_{i}", email=f"load-emp-{i}@ems.local", hashed_password=hashed,
+                      role="employee", is_active=True, team_id=teams[i % n_teams].id) for i in range(n_employees)]
+    admin = User(username="load_admin", email="load-admin@ems.local", hashed_password=hashed, role="admin", is_active=True)
+    db.add_all(managers + employees + [admin])
+    db.flush()
+    for team, manager in zip(teams, managers):
+        team.manager_id = manager.id
+    db.commit()
+    result = (
+        [(m.email, m.team_id) for m in managers],
+        [(e.email, e.id, e.team_id) for e in employees],
+        admin.email,
+    )
+    db.close()
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workdir: str) -> subprocess.Popen:
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--backlog", "4096"],
+        # logs/ lands in the temp dir rather than the checkout
+        cwd=workdir, env={**os.environ, "PYTHONPATH": ROOT}, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited; see {log.name}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("Server did not start within 60s")
+
+
+def rss_bytes(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentiles(values) -> str:
+    if not values:
+        return "-"
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))] * 1000
+    return f"p50 {pick(0.5):.1f}  p95 {pick(0.95):.1f}  p99 {pick(0.99):.1f}  max {values[-1] * 1000:.1f} ms"
+
+
+def lag_delta(before: dict, after: dict) -> str:
+    """Mean and p99 bucket of the server's event_loop_lag_seconds between two /admin/metrics snapshots."""
+    def series(snap):
+        found = snap.get("histograms", {}).get("event_loop_lag_seconds", [])
+        return found[0] if found else {"buckets": {}, "count": 0, "sum": 0.0}
+    a, b = series(before), series(after)
+    count = b["count"] - a["count"]
+    if count <= 0:
+        return "-"
+    mean = (b["sum"] - a["sum"]) / count * 1000
+    p99 = next((bound for bound, n in b["buckets"].items() if n - a["buckets"].get(bound, 0) >= 0.99 * count), "+Inf")
+    return f"mean {mean:.1f} ms  p99 <= {p99 if p99 == '+Inf' else f'{float(p99) * 1000:g} ms'}"
+
+
+async def login(client: httpx.AsyncClient, email: str, sem: asyncio.Semaphore) -> dict:
+    async with sem:
+        res = await client.post("/auth/login", data={"username": email, "password": PASSWORD})
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+async def listen(client: httpx.AsyncClient, headers: dict, team_id: int, deliveries: list, ready: asyncio.Event):
+    async with client.stream("GET", "/notifications/stream", params={"topics": f"team:{team_id}"}, headers=headers) as res:
+        res.raise_for_status()
+        ready.set()
+        async for line in res.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            match = TITLE_RE.search(line)
+            if match:
+                kind = "board" if "task_created" in line else "personal"
+                deliveries.append((int(match.group(1)), kind, time.perf_counter()))
+
+
+async def watch_loop_lag(samples: list, interval: float = 0.05):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def run(args, base: str, pid: int, managers, employees, admin_email, steps):
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client, \
+            httpx.AsyncClient(base_url=base, timeout=None, limits=limits) as streams_client:
+        sem = asyncio.Semaphore(args.login_concurrency)
+        started = time.perf_counter()
+        users_needed = math.ceil(max(steps) / args.per_user)
+        employee_headers = await asyncio.gather(*(login(client, email, sem) for email, _, _ in employees[:users_needed]))
+        manager_headers = {team_id: h for (_, team_id), h in
+                           zip(managers, await asyncio.gather(*(login(client, email, sem) for email, _ in managers)))}
+        admin_headers = await login(client, admin_email, sem)
+        print(f"logged in {len(employee_headers) + len(managers) + 1} users in {time.perf_counter() - started:.1f}s")
+
+        baseline = rss_bytes(pid)
+        deliveries: list = []
+        streams = []
+        streams_by_user = defaultdict(int)
+        failed = 0
+        seq = 0
+        print(f"{'streams':>8} {'rss/conn':>9}  latency (POST sent -> event read)")
+        for target in steps:
+            new = []
+            while len(streams) + len(new) < target:
+                index = (len(streams) + len(new)) // args.per_user
+                _, user_id, team_id = employees[index]
+                ready = asyncio.Event()
+                task = asyncio.create_task(listen(streams_client, employee_headers[index], team_id, deliveries, ready))
+                new.append((task, ready, user_id, team_id))
+            for task, ready, user_id, _ in new:
+                waiter = asyncio.ensure_future(ready.wait())
+                done, _ = await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if task in done:
+                    failed += 1
+                else:
+                    streams_by_user[user_id] += 1
+            streams.extend(new)
+
+            listening = defaultdict(list)
+            for _, user_id, team_id in employees:
+                if streams_by_user[user_id]:
+                    listening[team_id].append(user_id)
+            team_streams = {t: sum(streams_by_user[u] for u in members) for t, members in listening.items()}
+            rss = rss_bytes(pid)
+            open_streams = sum(streams_by_user.values())
+            per_conn = f"{(rss - baseline) / max(open_streams, 1) / 1024:.1f} KiB" if rss and baseline else "n/a"
+
+            # Fire tasks at a fixed rate whatever the response times, like independent users would
+            before = (await client.get("/admin/metrics", headers=admin_headers)).json()
+            del deliveries[:]
+            client_lag: list = []
+            lag_task = asyncio.create_task(watch_loop_lag(client_lag))
+            sent, expected, posts = {}, 0, []
+            teams = sorted(listening)
+            for k in range(args.events):
+                team_id = teams[k % len(teams)]
+                assignee = listening[team_id][(k // len(teams)) % len(listening[team_id])]
+                expected += team_streams[team_id] + streams_by_user[assignee]
+                sent[seq] = time.perf_counter()
+                posts.append(asyncio.create_task(client.post(
+                    "/tasks/", json={"title": TITLE.format(seq), "user_id": assignee, "priority": "Low"},
+                    headers=manager_headers[team_id])))
+                seq += 1
+                await asyncio.sleep(1 / args.rate)
+            responses = await asyncio.gather(*posts, return_exceptions=True)
+            post_errors = sum(1 for r in responses if isinstance(r, Exception) or r.status_code != 200)
+            deadline = time.perf_counter() + args.timeout
+            while len(deliveries) < expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            lag_task.cancel()
+            after = (await client.get("/admin/metrics", headers=admin_headers)).json()
+
+            latencies = defaultdict(list)
+            for event_seq, kind, received in deliveries:
+                latencies[kind].append(received - sent[event_seq])
+            gauges = {name: series[0]["value"] for name, series in after["gauges"].items() if series and not series[0]["labels"]}
+            print(f"{open_streams:>8} {per_conn:>9}  board    {percentiles(latencies['board'])}")
+            print(f"{'':>8} {'':>9}  personal {percentiles(latencies['personal'])}")
+            print(f"{'':>8} {'':>9}  delivered {len(deliveries)}/{expected}, POST errors {post_errors}, "
+                  f"streams failed {failed}, buffered {gauges.get('sse_buffered_bytes', 0) / 1024:.0f} KiB")
+            print(f"{'':>8} {'':>9}  server loop lag {lag_delta(before, after)}; "
+                  f"harness loop lag max {max(client_lag, default=0) * 1000:.1f} ms")
+
+        for task, *_ in streams:
+            task.cancel()
+        await asyncio.gather(*(task for task, *_ in streams), return_exceptions=True)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="sse_scale_")
+    configure(workdir)
+    from app.core.sse import MAX_CONNECTIONS_PER_USER
+
+    steps = [int(n) for n in args.steps.split(",")]
+    if not 1 <= args.per_user <= MAX_CONNECTIONS_PER_USER:
+        raise SystemExit(f"--per-user must be between 1 and {MAX_CONNECTIONS_PER_USER}")
+    raise_fd_limit()
+    managers, employees, admin_email = seed(args.teams, math.ceil(max(steps) / args.per_user))
+    port = free_port()
+    proc = start_server(port, workdir)
+    print(f"server pid {proc.pid} on port {port}, database {os.environ['DATABASE_URL']}")
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{port}", proc.pid, managers, employees, admin_email, steps))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark webhook delivery: a new httpx client per call vs the shared pooled client.
+
+Starts a local stand-in webhook receiver with uvicorn and posts to it:
+
+  1. healthy endpoint - per-call AsyncClient (the old send_webhook_notification) vs
+     SharedHTTPClient with keep-alive; reports throughput and connections opened.
+  2. dead endpoint (always 503) - how many requests reach it with and without the
+     per-team circuit breaker.
+
+    python loadtest/webhook_benchmark.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import uvicorn
+
+from app.core.http_client import SharedHTTPClient, CircuitBreaker, CircuitOpenError
+
+STATS = {"requests": 0, "clients": set()}
+
+
+async def receiver(scope, receive, send):
+    """Minimal ASGI webhook endpoint: /ok answers 200, /dead answers 503."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    while (await receive()).get("more_body"):
+        pass
+    STATS["requests"] += 1
+    # Each TCP connection has its own client port, so distinct ports = connections opened
+    STATS["clients"].add(tuple(scope.get("client") or ()))
+    status = 503 if scope["path"] == "/dead" else 200
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+class CountingServer(uvicorn.Server):
+    def install_signal_handlers(self):
+        pass
+
+
+def start_receiver(port: int) -> CountingServer:
+    config = uvicorn.Config(receiver, host="127.0.0.1", port=port, log_level="error", lifespan="on", backlog=4096)
+    server = CountingServer(config)
+
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_batch(post, n, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            try:
+                await post({"event": "task_status_updated", "data": {"task_id": i}})
+            except CircuitOpenError:
+                pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start
+
+
+async def healthy(url, n, concurrency):
+    async def per_call(body):
+        # The old implementation: a fresh client, connection and handshake per webhook
+        async with httpx.AsyncClient() as client:
+            await client.post(url, json=body, timeout=5.0)
+
+    shared = SharedHTTPClient(per_host_limit=concurrency)
+
+    async def pooled(body):
+        await shared.post(url, json=body)
+
+    results = {}
+    for name, post in (("per-call client", per_call), ("shared client", pooled)):
+        STATS["requests"] = 0
+        STATS["clients"] = set()
+        elapsed = await run_batch(post, n, concurrency)
+        results[name] = (elapsed, STATS["requests"], len(STATS["clients"]))
+    await shared.aclose()
+    return results
+
+
+async def dead(url, n, concurrency, legacy_retries=3):
+    results = {}
+
+    # Old behaviour: every status change retried the dead endpoint WEBHOOK_MAX_RETRIES times
+    async with httpx.AsyncClient() as client:
+        async def legacy(body):
+            for _ in range(legacy_retries):
+                resp = await client.post(url, json=body, timeout=5.0)
+                if resp.status_code < 400:
+                    return
+
+        STATS["requests"] = 0
+        elapsed = await run_batch(legacy, n, concurrency)
+        results["no breaker (3 retries)"] = (elapsed, STATS["requests"])
+
+    shared = SharedHTTPClient(per_host_limit=concurrency)
+    breaker = CircuitBreaker("bench-team", failure_threshold=5, reset_seconds=60)
+
+    async def guarded(body):
+        await shared.post(url, breaker=breaker, json=body)
+
+    STATS["requests"] = 0
+    elapsed = await run_batch(guarded, n, concurrency)
+    results["circuit breaker"] = (elapsed, STATS["requests"])
+    await shared.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_receiver(port)
+    base = f"http://127.0.0.1:{port}"
+
+    print(f"Healthy endpoint, {args.requests} webhooks, concurrency {args.concurrency}")
+    for name, (elapsed, hits, conns) in asyncio.run(healthy(f"{base}/ok", args.requests, args.concurrency)).items():
+        print(f"  {name:<24} {elapsed:7.2f}s  {args.requests / elapsed:8.0f} req/s  {conns:6d} connections  ({hits} received)")
+
+    print(f"Dead endpoint (503), {args.requests} webhooks")
+    for name, (elapsed, hits) in asyncio.run(dead(f"{base}/dead", args.requests, args.concurrency)).items():
+        print(f"  {name:<24} {elapsed:7.2f}s  {hits:8d} requests reached the endpoint")
+
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Add indexes for hot filter and sort columns
+
+Revision ID: a7c1e5d2f9b4
+Revises: cd433eb8892a
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c1e5d2f9b4'
+down_revision: Union[str, Sequence[str], None] = 'cd433eb8892a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, partial predicate as {dialect: sql})
+INDEXES = [
+    ("ix_tasks_user_id", "tasks", ["user_id"], None),
+    ("ix_tasks_team_id", "tasks", ["team_id"], None),
+    ("ix_tasks_deadline_open", "tasks", ["deadline"], {"postgresql": "completed_at IS NULL", "sqlite": "completed_at IS NULL"}),
+    ("ix_notifications_user_created", "notifications", ["user_id", "created_at"], None),
+    ("ix_notifications_user_unread", "notifications", ["user_id"], {"postgresql": "is_read = false", "sqlite": "is_read = 0"}),
+    ("ix_task_history_task_timestamp", "task_history", ["task_id", "timestamp"], None),
+    ("ix_comments_task_created", "comments", ["task_id", "created_at"], None),
+    ("ix_users_team_id", "users", ["team_id"], None),
+    ("ix_users_role", "users", ["role"], None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block on Postgres,
+    # so build the indexes in autocommit mode to avoid locking writes on large tables.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where["postgresql"]) if where else None,
+                sqlite_where=sa.text(where["sqlite"]) if where else None,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,95 @@
+"""Store notification log payloads once, compressed and keyed by hash
+
+Revision ID: a8d3e5f1c9b7
+Revises: f4c8a1e6b2d5
+Create Date: 2026-10-18 17:03:52.271946
+
+"""
+import hashlib
+import zlib
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d3e5f1c9b7'
+down_revision: Union[str, Sequence[str], None] = 'f4c8a1e6b2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHUNK = 1000
+
+logs = sa.table(
+    'notification_logs',
+    sa.column('id', sa.Integer()),
+    sa.column('payload', sa.Text()),
+    sa.column('payload_hash', sa.String()),
+)
+payloads = sa.table(
+    'notification_payloads',
+    sa.column('hash', sa.String()),
+    sa.column('body', sa.LargeBinary()),
+    sa.column('size', sa.Integer()),
+)
+
+
+def _move_inline_payloads(conn):
+    """Hash, compress and store each distinct inline payload once, then point the rows at it."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(logs.c.id, logs.c.payload)
+            .where(logs.c.id > last_id, logs.c.payload.isnot(None), logs.c.payload_hash.is_(None))
+            .order_by(logs.c.id).limit(CHUNK)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+
+        hashes = {}
+        for row in rows:
+            raw = row.payload.encode('utf-8')
+            hashes.setdefault(hashlib.sha256(raw).hexdigest(), (raw, []))[1].append(row.id)
+        existing = set(conn.execute(sa.select(payloads.c.hash).where(payloads.c.hash.in_(list(hashes)))).scalars())
+        missing = [{'hash': h, 'body': zlib.compress(raw), 'size': len(raw)}
+                   for h, (raw, _) in hashes.items() if h not in existing]
+        if missing:
+            conn.execute(sa.insert(payloads), missing)
+        for h, (_, ids) in hashes.items():
+            conn.execute(sa.update(logs).where(logs.c.id.in_(ids)).values(payload_hash=h, payload=None))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notification_payloads',
+        sa.Column('hash', sa.String(length=64), primary_key=True),
+        sa.Column('body', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True, server_default=sa.func.now()),
+    )
+    op.add_column('notification_logs', sa.Column('payload_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key('fk_notification_logs_payload_hash', 'notification_logs', 'notification_payloads',
+                          ['payload_hash'], ['hash'])
+    op.create_index('ix_notification_logs_payload_hash', 'notification_logs', ['payload_hash'])
+
+    # Hashing and zlib need Python, so the data move only runs online; with --sql old rows
+    # keep their inline payload, which load_payload still reads. On PostgreSQL, run
+    # VACUUM FULL notification_logs afterwards to give the freed space back.
+    if not context.is_offline_mode():
+        _move_inline_payloads(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not context.is_offline_mode():
+        conn = op.get_bind()
+        for h, body in conn.execute(sa.select(payloads.c.hash, payloads.c.body)).all():
+            conn.execute(sa.update(logs).where(logs.c.payload_hash == h)
+                         .values(payload=zlib.decompress(body).decode('utf-8')))
+    op.drop_index('ix_notification_logs_payload_hash', table_name='notification_logs')
+    op.drop_constraint('fk_notification_logs_payload_hash', 'notification_logs', type_='foreignkey')
+    op.drop_column('notification_logs', 'payload_hash')
+    op.drop_table('notification_payloads')
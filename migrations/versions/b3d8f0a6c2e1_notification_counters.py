@@ -0,0 +1,39 @@
+"""Add per-user unread notification counters
+
+Revision ID: b3d8f0a6c2e1
+Revises: a7c1e5d2f9b4
+Create Date: 2026-10-18 11:40:07.318264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d8f0a6c2e1'
+down_revision: Union[str, Sequence[str], None] = 'a7c1e5d2f9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notification_counters',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    # Backfill from existing rows; the reconcile job keeps them honest afterwards
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread_count, updated_at) "
+        "SELECT user_id, COUNT(*), CURRENT_TIMESTAMP FROM notifications "
+        "WHERE is_read = false AND user_id IS NOT NULL GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('notification_counters')
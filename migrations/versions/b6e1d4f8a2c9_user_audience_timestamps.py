@@ -0,0 +1,31 @@
+"""Add created_at and team_joined_at to users
+
+Revision ID: b6e1d4f8a2c9
+Revises: a8d3e5f1c9b7
+Create Date: 2026-10-18 21:04:17.512630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1d4f8a2c9'
+down_revision: Union[str, Sequence[str], None] = 'a8d3e5f1c9b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Left null for existing accounts, which keep seeing the full broadcast history
+    op.add_column('users', sa.Column('created_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('users', sa.Column('team_joined_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'team_joined_at')
+    op.drop_column('users', 'created_at')
@@ -0,0 +1,60 @@
+"""Add role and team broadcast notifications with sparse read receipts
+
+Revision ID: c5e2a9d7b418
+Revises: b3d8f0a6c2e1
+Create Date: 2026-10-18 13:05:52.671930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2a9d7b418'
+down_revision: Union[str, Sequence[str], None] = 'b3d8f0a6c2e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('notifications', 'user_id', existing_type=sa.Integer(), nullable=True)
+    op.add_column('notifications', sa.Column('target_role', sa.String(), nullable=True))
+    op.add_column('notifications', sa.Column('target_team_id', sa.Integer(), nullable=True))
+    op.add_column('notifications', sa.Column('actor_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('notifications_target_team_id_fkey', 'notifications', 'teams', ['target_team_id'], ['id'])
+    op.create_foreign_key('notifications_actor_id_fkey', 'notifications', 'users', ['actor_id'], ['id'])
+
+    op.create_table(
+        'notification_reads',
+        sa.Column('notification_id', sa.Integer(), sa.ForeignKey('notifications.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('read_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('dismissed', sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+    # Same approach as the hot-path index pack: build without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index('ix_notifications_role_created', 'notifications', ['target_role', 'created_at'],
+                        if_not_exists=True, postgresql_concurrently=True)
+        op.create_index('ix_notifications_team_created', 'notifications', ['target_team_id', 'created_at'],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_team_created', table_name='notifications', if_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_notifications_role_created', table_name='notifications', if_exists=True, postgresql_concurrently=True)
+
+    op.drop_table('notification_reads')
+    # Broadcast rows have no single owner and cannot survive the NOT NULL constraint
+    op.execute("DELETE FROM notifications WHERE user_id IS NULL")
+    op.drop_constraint('notifications_actor_id_fkey', 'notifications', type_='foreignkey')
+    op.drop_constraint('notifications_target_team_id_fkey', 'notifications', type_='foreignkey')
+    op.drop_column('notifications', 'actor_id')
+    op.drop_column('notifications', 'target_team_id')
+    op.drop_column('notifications', 'target_role')
+    op.alter_column('notifications', 'user_id', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,34 @@
+"""Add dedupe_key to notification outbox for webhook coalescing
+
+Revision ID: e2b7c4a9d1f6
+Revises: d9a4f6b1e3c7
+Create Date: 2026-10-18 15:41:07.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c4a9d1f6'
+down_revision: Union[str, Sequence[str], None] = 'd9a4f6b1e3c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notification_outbox', sa.Column('dedupe_key', sa.String(), nullable=True))
+    op.create_index(
+        'ix_notification_outbox_dedupe', 'notification_outbox', ['dedupe_key'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notification_outbox_dedupe', table_name='notification_outbox')
+    op.drop_column('notification_outbox', 'dedupe_key')
@@ -0,0 +1,28 @@
+"""Add email_digest preference to users
+
+Revision ID: f4c8a1e6b2d5
+Revises: e2b7c4a9d1f6
+Create Date: 2026-10-18 16:12:44.908317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c8a1e6b2d5'
+down_revision: Union[str, Sequence[str], None] = 'e2b7c4a9d1f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('email_digest', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'email_digest')
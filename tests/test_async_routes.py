@@ -0,0 +1,244 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.main import app
+from app.core.database import Base, get_db, get_async_db
+from app.models.user import User
+from app.models.team import Team
+from app.models.task import Task
+from app.models.subtask import SubTask
+from app.models.notification import Notification
+from app.core.security import get_password_hash
+from app.core.pagination import encode_cursor
+
+# Sync and async engines pointed at the same SQLite file
+engine = create_engine("sqlite:///./test_async_routes.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_async_routes.db")
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    Base.metadata.create_all(bind=engine)
+
+    db = TestingSessionLocal()
+    team = Team(name="Async Team")
+    db.add(team)
+    db.flush()
+    manager = User(username="async_mgr", email="async_mgr@ems.com", hashed_password=get_password_hash("pass"),
+                   role="manager", is_active=True, team_id=team.id)
+    member = User(username="async_member", email="async_member@ems.com", hashed_password=get_password_hash("pass"),
+                  role="employee", is_active=True, team_id=team.id)
+    db.add_all([manager, member])
+    db.flush()
+    team.manager_id = manager.id
+    task = Task(title="Member task", user_id=member.id, team_id=team.id)
+    db.add(task)
+    db.flush()
+    db.add(SubTask(title="Step 1", task_id=task.id))
+    db.add(Notification(user_id=manager.id, title="Hello", message="World"))
+    db.commit()
+    db.close()
+
+    yield
+
+    Base.metadata.drop_all(bind=engine)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+def _headers(username):
+    res = client.post("/auth/login", data={"username": username, "password": "pass"})
+    assert res.status_code == 200
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+def test_async_read_endpoints():
+    headers = _headers("async_mgr")
+
+    res = client.get("/auth/me", headers=headers)
+    assert res.status_code == 200
+    assert res.json()["username"] == "async_mgr"
+    assert res.json()["team_name"] == "Async Team"
+
+    # Manager sees tasks of members in the team they manage, with subtasks loaded
+    res = client.get("/tasks/", headers=headers)
+    assert res.status_code == 200
+    tasks = res.json()
+    assert [t["title"] for t in tasks] == ["Member task"]
+    assert tasks[0]["subtasks"][0]["title"] == "Step 1"
+
+    res = client.get("/teams/", headers=headers)
+    assert res.status_code == 200
+    team = [t for t in res.json() if t["name"] == "Async Team"][0]
+    assert team["manager"]["username"] == "async_mgr"
+    assert {m["username"] for m in team["members"]} == {"async_mgr", "async_member"}
+    assert team["tasks"][0]["subtasks"][0]["title"] == "Step 1"
+
+    res = client.get("/notifications/", headers=headers)
+    assert res.status_code == 200
+    assert [n["title"] for n in res.json()] == ["Hello"]
+
+    res = client.get("/notifications/unread-count", headers=headers)
+    assert res.status_code == 200
+    assert res.json() == {"unread_count": 1}
+
+def test_employee_only_sees_own_tasks():
+    headers = _headers("async_member")
+    res = client.get("/tasks/", headers=headers)
+    assert res.status_code == 200
+    assert [t["title"] for t in res.json()] == ["Member task"]
+    assert client.get("/notifications/", headers=headers).json() == []
+
+def test_task_keyset_pagination():
+    from datetime import datetime, timedelta
+    db = TestingSessionLocal()
+    member = db.query(User).filter(User.username == "async_member").first()
+    base = datetime(2030, 1, 1)
+    # Duplicate and NULL deadlines exercise the (deadline, id) tie-break and the NULL group
+    deadlines = [base, base, None, base + timedelta(days=1), None, base - timedelta(days=1)]
+    db.add_all([Task(title=f"Paged {i}", user_id=member.id, deadline=d, priority="High") for i, d in enumerate(deadlines)])
+    db.commit()
+    db.close()
+
+    headers = _headers("async_member")
+    full = client.get("/tasks/", params={"sort_by": "deadline", "limit": 500}, headers=headers).json()
+
+    for sort_by, order in [("deadline", "asc"), ("deadline", "desc"), (None, "asc"), ("priority", "asc")]:
+        params = {"limit": 2, "include_total": True}
+        if sort_by:
+            params.update({"sort_by": sort_by, "order": order})
+        seen = []
+        cursor = None
+        while True:
+            res = client.get("/tasks/", params={**params, **({"cursor": cursor} if cursor else {})}, headers=headers)
+            assert res.status_code == 200
+            assert res.headers["X-Total-Estimate"] == str(len(full))
+            seen.extend(t["id"] for t in res.json())
+            cursor = res.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen)) == len(full)
+
+    # Deadline order puts NULL deadlines last
+    assert full[-1]["deadline"] is None and full[-2]["deadline"] is None
+
+    res = client.get("/tasks/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert res.status_code == 400
+    # Well-formed but with a value of the wrong type for the sort key
+    for v in (123, ["x"], "not-a-date"):
+        tampered = encode_cursor({"k": "deadline", "d": False, "v": v, "id": 1})
+        res = client.get("/tasks/", params={"sort_by": "deadline", "cursor": tampered}, headers=headers)
+        assert res.status_code == 400
+
+def test_notification_pagination_and_since_sync():
+    from datetime import datetime, timedelta, timezone
+    db = TestingSessionLocal()
+    member_id = db.query(User).filter(User.username == "async_member").first().id
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    # Two rows share a timestamp to exercise the id tie-break
+    offsets = [0, 1, 1, 2, 3]
+    db.add_all([Notification(user_id=member_id, title=f"N{i}", message="m", created_at=base + timedelta(minutes=o), is_read=(i == 0))
+                for i, o in enumerate(offsets)])
+    db.commit()
+    db.close()
+
+    headers = _headers("async_member")
+    first = client.get("/notifications/", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert [n["title"] for n in first.json()] == ["N4", "N3"]
+    assert first.json()[0]["created_at"].endswith(("Z", "+00:00"))
+    sync_cursor = first.headers["X-Sync-Cursor"]
+
+    titles = [n["title"] for n in first.json()]
+    cursor = first.headers.get("X-Next-Cursor")
+    while cursor:
+        res = client.get("/notifications/", params={"limit": 2, "cursor": cursor}, headers=headers)
+        titles.extend(n["title"] for n in res.json())
+        cursor = res.headers.get("X-Next-Cursor")
+    assert titles == ["N4", "N3", "N2", "N1", "N0"]
+
+    res = client.get("/notifications/", params={"unread_only": True}, headers=headers)
+    assert "N0" not in [n["title"] for n in res.json()]
+
+    # Nothing new since the first page
+    res = client.get("/notifications/", params={"since": sync_cursor}, headers=headers)
+    assert res.json() == [] and res.headers["X-Sync-Cursor"] == sync_cursor
+
+    db = TestingSessionLocal()
+    db.add_all([Notification(user_id=member_id, title=f"New{i}", message="m", created_at=base + timedelta(minutes=10 + i)) for i in range(3)])
+    db.commit()
+    db.close()
+
+    res = client.get("/notifications/", params={"since": sync_cursor, "limit": 2}, headers=headers)
+    assert [n["title"] for n in res.json()] == ["New0", "New1"]
+    assert res.headers["X-Next-Cursor"] == res.headers["X-Sync-Cursor"]
+    res = client.get("/notifications/", params={"since": res.headers["X-Sync-Cursor"], "limit": 2}, headers=headers)
+    assert [n["title"] for n in res.json()] == ["New2"]
+    assert "X-Next-Cursor" not in res.headers
+
+    assert client.get("/notifications/", params={"since": "bogus"}, headers=headers).status_code == 400
+
+
+def test_team_broadcast_merged_into_inbox():
+    from app.services.notification import create_in_app_notifications
+    db = TestingSessionLocal()
+    team = db.query(Team).filter(Team.name == "Async Team").first()
+    manager_id = team.manager_id
+    create_in_app_notifications(db, [], broadcasts=[
+        {"target_team_id": team.id, "actor_id": manager_id, "title": "Team news", "message": "m"},
+    ])
+    db.close()
+
+    member = _headers("async_member")
+    unread_before = client.get("/notifications/unread-count", headers=member).json()["unread_count"]
+    news = [n for n in client.get("/notifications/", headers=member).json() if n["title"] == "Team news"]
+    assert len(news) == 1 and news[0]["is_read"] is False
+
+    res = client.put(f"/notifications/{news[0]['id']}/read", headers=member)
+    assert res.status_code == 200 and res.json()["unread_count"] == unread_before - 1
+    unread = client.get("/notifications/", params={"unread_only": True}, headers=member).json()
+    assert "Team news" not in [n["title"] for n in unread]
+
+    # The manager posted it and does not see their own broadcast
+    titles = [n["title"] for n in client.get("/notifications/", headers=_headers("async_mgr")).json()]
+    assert "Team news" not in titles
+
+
+def test_sse_replay_falls_back_to_the_inbox():
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+    from app.services.notification import replay_from_db
+    db = TestingSessionLocal()
+    member_id = db.query(User).filter(User.username == "async_member").first().id
+    db.add(Notification(user_id=member_id, title="Missed while offline", message="m"))
+    db.commit()
+    member = db.get(User, member_id)
+    db.expunge(member)
+    db.close()
+
+    async def run():
+        async with TestingAsyncSessionLocal() as adb:
+            a_minute_ago = int((datetime.now(timezone.utc) - timedelta(minutes=1)).timestamp() * 1_000_000)
+            return await replay_from_db(adb, member, a_minute_ago)
+
+    events = asyncio.run(run())
+    # Earlier tests left 2030-dated rows, which count as newer too
+    assert "Missed while offline" in [m["title"] for _, m in events[:-1]]
+    assert events[-1][1]["type"] == "unread_count"
@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine, text
+
+from app.core import db_metrics
+from app.core.db_metrics import TimedQueuePool, pool_status
+
+
+def test_pool_status_reports_checkouts_and_wait(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=2, max_overflow=1)
+    stats = db_metrics.begin_request()
+
+    conns = [engine.connect() for _ in range(3)]
+    status = pool_status(engine)
+    assert status["pool_class"] == "TimedQueuePool"
+    assert status["pool_size"] == 2
+    assert status["checked_out"] == 3
+    assert status["overflow"] == 1
+    assert status["checkout_wait"]["count"] == 3
+    assert stats["checkouts"] == 3
+
+    for c in conns:
+        c.execute(text("SELECT 1"))
+        c.close()
+
+    status = pool_status(engine)
+    assert status["checked_out"] == 0
+    assert status["idle"] == 2
+    engine.dispose()
+
+
+def test_session_start_needs_one_connection(tmp_path):
+    # The first session on each database checks its tables; with a one-connection
+    # pool that check has to reuse the session's connection rather than wait for another
+    from sqlalchemy.orm import Session
+    from app.core.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.5)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        assert session.execute(text("SELECT 1")).scalar() == 1
+    assert engine.pool.wait_stats()["timeouts"] == 0
+    engine.dispose()
@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import http_client, metrics
+from app.core.http_client import CircuitBreaker, CircuitOpenError, SharedHTTPClient
+
+
+def test_per_host_limit_caps_concurrency():
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return httpx.Response(200)
+
+    async def run():
+        client = SharedHTTPClient(per_host_limit=3, transport=httpx.MockTransport(handler))
+        try:
+            await asyncio.gather(*(client.post("http://hooks.test/x", json={}) for _ in range(12)))
+            # A different host has its own slots
+            await client.post("http://other.test/x", json={})
+        finally:
+            await client.aclose()
+
+    metrics.reset()
+    asyncio.run(run())
+    assert state["peak"] == 3
+    snap = metrics.snapshot()
+    in_flight = {s["labels"]["host"]: s["value"] for s in snap["gauges"]["http_client_in_flight"]}
+    assert in_flight == {"hooks.test": 0, "other.test": 0}
+    total = {s["labels"]["host"]: s["value"] for s in snap["counters"]["http_client_requests_total"]}
+    assert total == {"hooks.test": 12, "other.test": 1}
+
+
+def test_breaker_opens_short_circuits_and_recovers(monkeypatch):
+    calls = {"n": 0, "status": 503}
+
+    async def handler(request):
+        calls["n"] += 1
+        return httpx.Response(calls["status"])
+
+    breaker = CircuitBreaker("team-1", failure_threshold=2, reset_seconds=60)
+
+    async def run():
+        client = SharedHTTPClient(transport=httpx.MockTransport(handler))
+        try:
+            for _ in range(2):
+                await client.post("http://hooks.test/x", breaker=breaker)
+            assert breaker.state == CircuitBreaker.OPEN
+            with pytest.raises(CircuitOpenError):
+                await client.post("http://hooks.test/x", breaker=breaker)
+            assert calls["n"] == 2
+
+            # After the cool-down one trial request goes through and closes the breaker
+            monkeypatch.setattr(breaker, "reset_seconds", 0)
+            calls["status"] = 200
+            await client.post("http://hooks.test/x", breaker=breaker)
+            assert breaker.state == CircuitBreaker.CLOSED
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_breaker_states_are_reported():
+    http_client.reset_breakers()
+    breaker = http_client.get_breaker(("team", 7))
+    assert http_client.get_breaker(("team", 7)) is breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    states = metrics.snapshot()["gauges"]["circuit_breaker_state"]
+    assert states == [{"labels": {"key": "('team', 7)"}, "value": 2}]
+    http_client.reset_breakers()
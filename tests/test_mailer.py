@@ -0,0 +1,52 @@
+import asyncio
+import socket
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+from app.core import metrics
+from app.core.mailer import SMTPPool
+
+
+class _Collect:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 OK"
+
+
+def _free_port():
+    # Controller connects back to its configured port on start, so port=0 won't do
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = _Collect()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=_free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+def test_pool_reuses_connections(smtp_server):
+    controller, handler = smtp_server
+    metrics.reset()
+
+    async def run():
+        pool = SMTPPool(hostname=controller.hostname, port=controller.port, username="", sender="ems@test",
+                        size=3, start_tls=False, use_tls=False)
+        await asyncio.gather(*(pool.send(f"user{i}@test", f"Subject {i}", f"<p>{i}</p>") for i in range(30)))
+        await pool.aclose()
+
+    asyncio.run(run())
+    assert len(handler.messages) == 30
+    assert {rcpt[0] for rcpt, _ in handler.messages} == {f"user{i}@test" for i in range(30)}
+    # 30 messages over at most 3 sessions instead of 30 logins
+    opened = metrics.snapshot()["counters"]["smtp_connections_opened_total"][0]["value"]
+    assert opened <= 3
@@ -0,0 +1,161 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.team import Team
+from app.models.user import User
+from app.models.notification import Notification, NotificationCounter
+from app.services import notification as notif_service
+from app.services import team as team_service
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([User(username=f"c{i}", email=f"c{i}@ems.com", hashed_password="x") for i in range(2)])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _counter(db, user_id):
+    db.expire_all()
+    counter = db.get(NotificationCounter, user_id)
+    return counter.unread_count if counter else None
+
+
+def test_counter_tracks_inserts_reads_and_deletes(db):
+    u1, u2 = db.get(User, 1), db.get(User, 2)
+    ids = [notif_service.create_in_app_notification(db, 1, f"T{i}", "M").id for i in range(3)]
+    assert _counter(db, 1) == 3
+    assert notif_service.get_unread_count(db, 1) == 3
+
+    assert notif_service.mark_notification_read(db, u1, ids[0]) == 2
+    # Marking the same notification again must not decrement twice
+    assert notif_service.mark_notification_read(db, u1, ids[0]) == 2
+    # Deleting a read notification leaves the count alone; an unread one decrements it
+    assert notif_service.delete_notification(db, u1, ids[0]) == 2
+    assert notif_service.delete_notification(db, u1, ids[1]) == 1
+    assert notif_service.mark_notification_read(db, u1, 9999) is None
+    # Another user's notification is not visible
+    assert notif_service.delete_notification(db, u2, ids[2]) is None
+
+    assert notif_service.mark_all_notifications_read(db, u1) == 0
+    assert _counter(db, 1) == 0
+
+
+def test_counter_is_seeded_from_existing_rows(db):
+    # Rows written before counters existed (e.g. before the migration backfill ran)
+    db.add_all([Notification(user_id=2, title="old", message="m") for _ in range(2)])
+    db.commit()
+
+    notif_service.create_in_app_notification(db, 2, "new", "m")
+    assert _counter(db, 2) == 3
+
+
+def test_reconcile_repairs_drift(db):
+    notif_service.create_in_app_notification(db, 1, "T", "M")
+    # Simulate a write path that bypassed the counter
+    db.add(Notification(user_id=1, title="raw", message="m"))
+    db.add(NotificationCounter(user_id=2, unread_count=5))
+    db.commit()
+
+    repaired = notif_service.reconcile_unread_counts(db)
+    assert repaired == {1: (1, 2), 2: (5, 0)}
+    assert _counter(db, 1) == 2 and _counter(db, 2) == 0
+    assert notif_service.reconcile_unread_counts(db) == {}
+
+
+def test_bulk_fan_out_uses_one_insert_and_one_commit(db):
+    from app.core import db_metrics
+    db.add_all([User(username=f"b{i}", email=f"b{i}@ems.com", hashed_password="x") for i in range(40)])
+    db.commit()
+    user_ids = [u.id for u in db.query(User).all()]
+    notif_service.create_in_app_notification(db, user_ids[0], "existing", "m")
+
+    stats = db_metrics.begin_request()
+    created = notif_service.create_in_app_notifications(db, [(u, "Fan-out", f"for {u}") for u in user_ids])
+    inserts = [n for sql, n in stats["statements"].items() if sql.startswith("INSERT INTO notifications")]
+    assert sum(inserts) == 1
+    # Insert, counter bump, counter seeding (select, savepoint, insert, release): none per recipient
+    assert stats["queries"] == 6
+    assert max(stats["statements"].values()) == 1
+
+    assert sorted(n.user_id for n in created) == sorted(user_ids)
+    assert all(n.id and n.created_at for n in created)
+    assert _counter(db, user_ids[0]) == 2
+    assert all(_counter(db, u) == 1 for u in user_ids[1:])
+    assert notif_service.create_in_app_notifications(db, []) == []
+
+
+def test_broadcast_rows_are_written_once_and_tracked_per_user(db):
+    admins = [User(username=f"a{i}", email=f"a{i}@ems.com", hashed_password="x", role="admin") for i in range(3)]
+    db.add_all(admins)
+    db.commit()
+    actor, reader, other = admins
+    # Seed counters for two admins; the third is seeded lazily on first read
+    notif_service.create_in_app_notification(db, reader.id, "personal", "m")
+    notif_service.create_in_app_notification(db, actor.id, "personal", "m")
+
+    created = notif_service.create_in_app_notifications(db, [], broadcasts=[
+        {"target_role": "admin", "actor_id": actor.id, "title": "Done", "message": "x"},
+    ])
+    assert len(created) == 1 and created[0].user_id is None
+    assert db.query(Notification).filter(Notification.user_id.is_(None)).count() == 1
+
+    # The actor is excluded from their own broadcast; other admins count it as unread
+    assert _counter(db, actor.id) == 1
+    assert _counter(db, reader.id) == 2
+    assert notif_service.get_unread_count(db, other.id) == 1
+    # Non-admins never see it
+    assert notif_service.get_unread_count(db, 1) == 0
+
+    broadcast_id = created[0].id
+    assert notif_service.mark_notification_read(db, reader, broadcast_id) == 1
+    assert notif_service.mark_notification_read(db, reader, broadcast_id) == 1
+    assert notif_service.mark_notification_read(db, actor, broadcast_id) is None
+    # Dismissing removes it from one inbox only
+    assert notif_service.delete_notification(db, other, broadcast_id) == 0
+    assert db.get(Notification, broadcast_id) is not None
+
+    assert notif_service.mark_all_notifications_read(db, reader) == 0
+    assert notif_service.reconcile_unread_counts(db) == {}
+
+
+def test_broadcasts_sent_before_a_user_joined_stay_out_of_their_inbox(db):
+    team = Team(name="Board")
+    veteran = User(username="v", email="v@ems.com", hashed_password="x", role="admin")
+    db.add_all([team, veteran])
+    db.commit()
+    team_service.add_members_to_team(db, team, [veteran.id])
+    notif_service.create_in_app_notifications(db, [], broadcasts=[
+        {"target_role": "admin", "title": "Old role news", "message": "x"},
+        {"target_team_id": team.id, "title": "Old team news", "message": "x"},
+    ])
+    assert notif_service.get_unread_count(db, veteran.id) == 2
+
+    # A new admin and a new team member start with an empty inbox
+    newcomer = User(username="n", email="n@ems.com", hashed_password="x", role="admin")
+    db.add(newcomer)
+    db.commit()
+    team_service.add_members_to_team(db, team, [1])
+    assert notif_service.get_unread_count(db, newcomer.id) == 0
+    assert notif_service.get_unread_count(db, 1) == 0
+
+    notif_service.create_in_app_notifications(db, [], broadcasts=[
+        {"target_team_id": team.id, "title": "New team news", "message": "x"},
+    ])
+    assert _counter(db, 1) == 1
+    assert _counter(db, veteran.id) == 3
+    assert notif_service.reconcile_unread_counts(db) == {}
+
+    # Accounts that predate the join timestamps keep the full history
+    db.query(User).filter(User.id == newcomer.id).update({User.created_at: None})
+    db.commit()
+    db.expire_all()
+    assert notif_service.reconcile_unread_counts(db) == {newcomer.id: (0, 1)}
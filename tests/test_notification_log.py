@@ -0,0 +1,102 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.notification import NotificationLog, NotificationPayload
+from app.models.team import Team
+from app.services import notification_log
+from app.services.notification_log import NotificationLogWriter
+
+
+def _engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def _record(i):
+    return {"type": "WEBHOOK", "status": "SENT", "payload": f"p{i}", "user_id": None, "team_id": None,
+            "error_message": None, "created_at": None}
+
+
+def test_buffer_flushes_with_multi_row_inserts():
+    engine = _engine()
+    statements = []
+    from sqlalchemy import event
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, stmt, *a: statements.append(stmt))
+
+    writer = NotificationLogWriter(batch_size=100, autostart=False)
+    for i in range(250):
+        writer.add(engine, _record(i))
+    assert writer.pending() == 250
+    db = sessionmaker(bind=engine)()
+    assert db.query(NotificationLog).count() == 0
+
+    assert writer.flush() == 250
+    assert db.query(NotificationLog).count() == 250
+    assert len([s for s in statements if s.startswith("INSERT INTO notification_logs")]) == 1
+    db.close()
+
+
+def test_size_trigger_and_bounded_buffer():
+    engine = _engine()
+    writer = NotificationLogWriter(batch_size=5, flush_seconds=60, max_buffer=1000)
+    for i in range(5):
+        writer.add(engine, _record(i))
+    # The background thread is woken by the size trigger, not the 60s timer
+    deadline = time.time() + 5
+    while writer.pending() and time.time() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    db = sessionmaker(bind=engine)()
+    assert db.query(NotificationLog).count() == 5
+    db.close()
+
+    small = NotificationLogWriter(max_buffer=3, autostart=False)
+    for i in range(5):
+        small.add(engine, _record(i))
+    assert small.pending() == 3
+
+
+def test_log_notification_does_not_touch_callers_transaction(monkeypatch):
+    engine = _engine()
+    writer = NotificationLogWriter(autostart=False)
+    monkeypatch.setattr(notification_log, "notification_log_writer", writer)
+    db = sessionmaker(bind=engine)()
+    db.add(Team(name="Uncommitted"))
+    notification_log.log_notification(db, type="EMAIL", status="SENT", payload="x" * 6000)
+    db.rollback()
+
+    writer.flush()
+    assert db.query(Team).count() == 0
+    row = db.query(NotificationLog).one()
+    assert row.status == "SENT" and len(notification_log.load_payload(db, row)) == 5000
+    db.close()
+
+
+def test_identical_payloads_are_stored_once_compressed():
+    engine = _engine()
+    writer = NotificationLogWriter(autostart=False)
+    body = "<p>You have been assigned a new task</p>" * 50
+    for _ in range(3):
+        writer.add(engine, {**_record(0), "payload": body})
+    writer.flush()
+    # A later flush finds the payload already stored
+    writer.add(engine, {**_record(0), "payload": body})
+    writer.add(engine, {**_record(0), "payload": None})
+    writer.flush()
+
+    db = sessionmaker(bind=engine)()
+    stored = db.query(NotificationPayload).one()
+    assert stored.size == len(body) and len(stored.body) < len(body) / 10
+    logs = db.query(NotificationLog).all()
+    assert len(logs) == 5 and all(log.payload is None for log in logs)
+    assert [notification_log.load_payload(db, log) for log in logs] == [body] * 4 + [None]
+
+    # Rows written before payload dedupe still read their inline text
+    legacy = NotificationLog(type="EMAIL", status="SENT", payload="inline")
+    assert notification_log.load_payload(db, legacy) == "inline"
+    db.close()
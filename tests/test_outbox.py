@@ -0,0 +1,203 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.core.http_client import reset_breakers
+from app.jobs import outbox_dispatcher
+from app.models.notification import NotificationLog, NotificationOutbox
+from app.models.team import Team
+from app.models.user import User
+from app.services import notification as notif_service
+from app.services.notification_log import notification_log_writer
+
+
+@pytest.fixture
+def factory(monkeypatch):
+    monkeypatch.delenv("MAIL_USERNAME", raising=False)
+    monkeypatch.delenv("MAIL_SERVER", raising=False)
+    # Breakers are process-wide; start every test with team 1's closed
+    reset_breakers()
+    # Audit rows are flushed explicitly below rather than from the writer thread
+    monkeypatch.setattr(notification_log_writer, "autostart", False)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    # Nothing listens on port 9 (discard), so webhook posts fail fast with a connection error
+    db.add(Team(id=1, name="Hooks", webhook_url="http://127.0.0.1:9/hook"))
+    db.add(User(id=1, username="o1", email="o1@ems.com", hashed_password="x", team_id=1))
+    db.commit()
+    db.close()
+    yield factory
+    notification_log_writer.flush()
+    engine.dispose()
+
+
+def _rows(factory):
+    db = factory()
+    rows = {r.kind: (r.status, r.attempts, r.last_error) for r in db.query(NotificationOutbox).all()}
+    db.close()
+    return rows
+
+
+def test_enqueue_is_part_of_the_callers_transaction(factory):
+    notif_service.outbox_wakeup.clear()
+    db = factory()
+    notif_service.enqueue_email(db, 1, "Hi", "<p>body</p>")
+    db.rollback()
+    assert db.query(NotificationOutbox).count() == 0
+    assert not notif_service.outbox_wakeup.is_set()
+
+    notif_service.enqueue_email(db, 1, "Hi", "<p>body</p>")
+    db.commit()
+    assert db.query(NotificationOutbox).count() == 1
+    assert notif_service.outbox_wakeup.is_set()
+    db.close()
+
+
+def test_dispatch_delivers_retries_and_dead_letters(factory, monkeypatch):
+    monkeypatch.setattr(outbox_dispatcher, "MAX_ATTEMPTS", 2)
+    db = factory()
+    notif_service.enqueue_webhook(db, 1, "task_status_updated", {"task_id": 1})
+    notif_service.enqueue_email(db, 1, "Hi", "<p>body</p>")
+    db.commit()
+    db.close()
+
+    stats = asyncio.run(outbox_dispatcher.dispatch_once(factory))
+    assert stats == {"claimed": 2, "sent": 1, "retried": 1, "dead": 0, "deferred": 0}
+    rows = _rows(factory)
+    assert rows["EMAIL"][0] == "sent"
+    assert rows["WEBHOOK"][:2] == ("pending", 1) and rows["WEBHOOK"][2]
+
+    # Backoff pushed the retry into the future, so nothing is due yet
+    assert asyncio.run(outbox_dispatcher.dispatch_once(factory))["claimed"] == 0
+
+    db = factory()
+    db.query(NotificationOutbox).update({NotificationOutbox.next_attempt_at: datetime.now(timezone.utc) - timedelta(seconds=1)})
+    db.commit()
+    db.close()
+    stats = asyncio.run(outbox_dispatcher.dispatch_once(factory))
+    assert stats["dead"] == 1
+    assert _rows(factory)["WEBHOOK"][:2] == ("dead", 2)
+
+    # Audit rows arrive through the write-behind buffer
+    notification_log_writer.flush()
+    db = factory()
+    assert {(l.type, l.status) for l in db.query(NotificationLog).all()} == {("EMAIL", "MOCK_SENT"), ("WEBHOOK", "DEAD")}
+    db.close()
+
+
+def test_claim_order_and_expired_leases(factory):
+    db = factory()
+    low = notif_service.enqueue_email(db, 1, "low", "b", priority=notif_service.OUTBOX_PRIORITY_LOW)
+    high = notif_service.enqueue_email(db, 1, "high", "b", priority=notif_service.OUTBOX_PRIORITY_HIGH)
+    db.commit()
+    low_id, high_id = low.id, high.id
+
+    assert [item[0] for item in outbox_dispatcher.claim_batch(db, 1)] == [high_id]
+    assert [item[0] for item in outbox_dispatcher.claim_batch(db, 5)] == [low_id]
+    assert outbox_dispatcher.claim_batch(db, 5) == []
+
+    # A worker that died mid-delivery leaves its lease behind; it is reclaimed once expired
+    db.query(NotificationOutbox).filter(NotificationOutbox.id == high_id) \
+        .update({NotificationOutbox.locked_until: datetime.now(timezone.utc) - timedelta(seconds=1)})
+    db.commit()
+    assert [item[0] for item in outbox_dispatcher.claim_batch(db, 5)] == [high_id]
+    db.close()
+
+
+def test_backoff_grows_with_jitter():
+    delays = [outbox_dispatcher.backoff_delay(n) for n in (1, 2, 3, 4)]
+    step = outbox_dispatcher.BASE_DELAY
+    for n, d in enumerate(delays):
+        assert step * 2 ** n / 2 <= d <= step * 2 ** n
+    assert outbox_dispatcher.backoff_delay(100) <= outbox_dispatcher.MAX_DELAY
+
+
+def test_keyed_webhooks_coalesce_within_window(factory, monkeypatch):
+    monkeypatch.setattr(notif_service, "WEBHOOK_COALESCE_SECONDS", 30)
+    db = factory()
+    for old, new in (("To Do", "In Progress"), ("In Progress", "Review"), ("Review", "Done")):
+        data = {"task_id": 7, "old_status": old, "new_status": new, "transitions": [{"from": old, "to": new}]}
+        notif_service.enqueue_webhook(db, 1, "task_status_updated", data, dedupe_key="task_status:1:7")
+        db.commit()
+    # A different task is not merged
+    notif_service.enqueue_webhook(db, 1, "task_status_updated", {"task_id": 8}, dedupe_key="task_status:1:8")
+    db.commit()
+
+    rows = db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+    assert len(rows) == 2
+    data = json.loads(rows[0].payload)["data"]
+    assert (data["old_status"], data["new_status"]) == ("To Do", "Done")
+    assert [t["to"] for t in data["transitions"]] == ["In Progress", "Review", "Done"]
+
+    # Held rows are not due until the window closes
+    assert outbox_dispatcher.claim_batch(db, 10) == []
+
+    # Once the row has been claimed, later events start a new window
+    db.query(NotificationOutbox).update({NotificationOutbox.next_attempt_at: datetime.now(timezone.utc) - timedelta(seconds=1)})
+    db.commit()
+    assert len(outbox_dispatcher.claim_batch(db, 10)) == 2
+    notif_service.enqueue_webhook(db, 1, "task_status_updated", {"task_id": 7}, dedupe_key="task_status:1:7")
+    db.commit()
+    assert db.query(NotificationOutbox).count() == 3
+    db.close()
+
+
+def test_digest_emails_go_out_as_one_message(factory, monkeypatch):
+    db = factory()
+    for i in range(3):
+        notif_service.enqueue_email(db, 1, f"New Task Assigned: T{i}", f"<p>T{i}</p>", digest=True)
+        db.commit()
+    rows = db.query(NotificationOutbox).all()
+    assert len(rows) == 1
+    assert rows[0].subject == "3 new notifications" and rows[0].priority == notif_service.OUTBOX_PRIORITY_LOW
+    body = notif_service.render_digest(rows[0].payload)
+    assert all(f"<p>T{i}</p>" in body for i in range(3))
+
+    # Held until the digest interval ends
+    assert outbox_dispatcher.claim_batch(db, 10) == []
+    db.query(NotificationOutbox).update({NotificationOutbox.next_attempt_at: datetime.now(timezone.utc) - timedelta(seconds=1)})
+    db.commit()
+    db.close()
+
+    delivered = []
+
+    async def fake_deliver(session_factory, user_id, subject, body):
+        delivered.append((subject, body))
+
+    monkeypatch.setattr(outbox_dispatcher, "deliver_email", fake_deliver)
+    assert asyncio.run(outbox_dispatcher.dispatch_once(factory))["sent"] == 1
+    assert delivered == [("3 new notifications", body)]
+
+
+def test_no_connection_is_held_during_the_network_call(factory, monkeypatch):
+    monkeypatch.setenv("MAIL_SERVER", "smtp.test")
+    engine = factory.kw["bind"]
+    open_connections = [0]
+    event.listen(engine, "checkout", lambda *args: open_connections.__setitem__(0, open_connections[0] + 1))
+    event.listen(engine, "checkin", lambda *args: open_connections.__setitem__(0, open_connections[0] - 1))
+    held = []
+
+    class _Mailer:
+        async def send(self, to, subject, body):
+            held.append(open_connections[0])
+
+    monkeypatch.setattr(notif_service, "get_mailer", lambda: _Mailer())
+    db = factory()
+    notif_service.enqueue_email(db, 1, "Hi", "<p>body</p>")
+    db.commit()
+    db.close()
+
+    assert asyncio.run(outbox_dispatcher.dispatch_once(factory))["sent"] == 1
+    assert held == [0]
+    notification_log_writer.flush()
+    db = factory()
+    assert db.query(NotificationLog).filter(NotificationLog.status == "SENT").count() == 1
+    db.close()
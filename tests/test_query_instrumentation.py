@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import InvalidRequestError, OperationalError
+from sqlalchemy.orm import sessionmaker, Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.core import db_metrics
+from app.core.database import Base
+from app.models.team import Team
+from app.models.user import User
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    team = Team(name="Strict")
+    db.add(team)
+    db.flush()
+    db.add_all([User(username=f"u{i}", email=f"u{i}@ems.com", hashed_password="x", team_id=team.id) for i in range(3)])
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def test_counts_queries_and_flags_repeated_statements(session_factory):
+    stats = db_metrics.begin_request()
+    db = session_factory()
+    users = db.query(User).order_by(User.id).all()
+    # Touching a lazy collection per row is the classic N+1 shape
+    for u in users:
+        _ = u.tasks
+    db.close()
+
+    assert stats["queries"] >= 1 + len(users)
+    assert stats["db_time_ms"] > 0
+    repeated = db_metrics.repeated_statements(stats, threshold=2)
+    assert len(repeated) == 1 and repeated[0][1] == len(users)
+    assert db_metrics.server_timing_header(stats).startswith("db;dur=")
+
+
+def test_failed_statements_do_not_leave_a_start_time_behind(session_factory):
+    stats = db_metrics.begin_request()
+    db = session_factory()
+    conn = db.connection()
+    for _ in range(3):
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+    assert conn.info.get("query_start_time") == []
+
+    db.query(User).count()
+    assert stats["queries"] == 1
+    db.close()
+
+
+def test_strict_loading_raises_on_lazy_load(session_factory):
+    db_metrics.enable_strict_loading(Session)
+    try:
+        db = session_factory()
+        user = db.query(User).first()
+        with pytest.raises(InvalidRequestError):
+            _ = user.team
+
+        # Explicit eager loading is still allowed
+        team = db.execute(select(Team).options(selectinload(Team.members))).scalars().first()
+        assert len(team.members) == 3
+        db.close()
+    finally:
+        db_metrics.disable_strict_loading(Session)
+
+
+def test_query_count_headers():
+    client = TestClient(app)
+    res = client.get("/reports/tasks-per-user")
+    assert res.status_code == 200
+    assert int(res.headers["X-DB-Queries"]) >= 1
+    assert res.headers["Server-Timing"].startswith("db;dur=")
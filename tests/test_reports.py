@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.user import User
+from app.models.team import Team
+from app.models.task import Task
+from app.services import report as report_service
+
+
+def _seeded_engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now()
+    with Session(bind=engine) as db:
+        eng, mkt = Team(name="Engineering"), Team(name="Marketing")
+        db.add_all([eng, mkt])
+        db.flush()
+        alice = User(username="alice", email="alice@ems.com", hashed_password="x", team_id=eng.id)
+        bob = User(username="bob", email="bob@ems.com", hashed_password="x", team_id=eng.id)
+        carol = User(username="carol", email="carol@ems.com", hashed_password="x", team_id=mkt.id)
+        db.add_all([alice, bob, carol])
+        db.flush()
+        db.add_all([
+            Task(title="a1", user_id=alice.id, team_id=eng.id, status="Open", deadline=now + timedelta(days=1)),
+            Task(title="a2", user_id=alice.id, team_id=eng.id, status="Completed", deadline=now + timedelta(days=10)),
+            Task(title="a3", user_id=alice.id, status="Open"),
+            Task(title="b1", user_id=bob.id, team_id=eng.id, status="Open", deadline=now - timedelta(days=1)),
+        ])
+        db.commit()
+    return engine
+
+
+def test_tasks_per_user_counts_and_filters():
+    engine = _seeded_engine()
+    with Session(bind=engine) as db:
+        rows = {r["username"]: r["task_count"] for r in report_service.tasks_per_user(db)}
+        assert rows == {"alice": 3, "bob": 1, "carol": 0}
+
+        rows = {r["username"]: r["task_count"] for r in report_service.tasks_per_user(db, status="open")}
+        assert rows == {"alice": 2, "bob": 1, "carol": 0}
+
+        now = datetime.now()
+        rows = {r["username"]: r["task_count"] for r in report_service.tasks_per_user(db, start=now, end=now + timedelta(days=5))}
+        assert rows == {"alice": 1, "bob": 0, "carol": 0}
+
+        top = report_service.tasks_per_user(db, limit=1)
+        assert [r["username"] for r in top] == ["alice"]
+
+
+def test_workload_distribution_uses_constant_queries():
+    engine = _seeded_engine()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    with Session(bind=engine) as db:
+        data = report_service.workload_distribution(db, team_id=None, top=2)
+
+    teams = {t["team_name"]: t["task_count"] for t in data["teams"]}
+    assert teams == {"Engineering": 3, "Marketing": 0}
+    assert [u["username"] for u in data["top_users"]] == ["alice", "bob"]
+    assert len(statements) == 2
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from app.core.broker import InMemoryBroker, PostgresBroker
+from app.core.sse import NotificationManager
+
+
+def test_publish_once_reaches_every_worker():
+    async def run():
+        hub = []
+        worker_a, worker_b = NotificationManager(), NotificationManager()
+        await worker_a.start(InMemoryBroker(hub))
+        await worker_b.start(InMemoryBroker(hub))
+
+        # The user's stream is held by worker B; the notification is created on worker A
+        queue = await worker_b.connect(7)
+        await worker_a.broadcast(7, {"msg": "from A"})
+        await worker_a.broadcast_many([(7, {"n": 1}), (8, {"n": 2})])
+
+        got = [await asyncio.wait_for(queue.get(), timeout=1.0) for _ in range(2)]
+        assert got == [{"msg": "from A"}, {"n": 1}]
+        assert queue.empty()
+
+        await worker_a.stop()
+        await worker_b.stop()
+        assert hub == []
+
+    asyncio.run(run())
+
+
+def test_broadcast_from_another_thread_is_handed_to_the_queue_loop():
+    async def run():
+        mgr = NotificationManager()
+        await mgr.start(InMemoryBroker())
+        queue = await mgr.connect(3)
+
+        # Sync routes broadcast from a helper thread running its own event loop
+        t = threading.Thread(target=lambda: asyncio.run(mgr.broadcast(3, {"msg": "threaded"})))
+        t.start()
+        await asyncio.to_thread(t.join)
+
+        assert await asyncio.wait_for(queue.get(), timeout=1.0) == {"msg": "threaded"}
+        await mgr.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not os.getenv("SSE_BROKER_TEST_DSN"), reason="set SSE_BROKER_TEST_DSN to a PostgreSQL DSN")
+def test_postgres_listen_notify_fan_out():
+    async def run():
+        dsn = os.getenv("SSE_BROKER_TEST_DSN")
+        worker_a, worker_b = NotificationManager(), NotificationManager()
+        await worker_a.start(PostgresBroker(dsn, channel="ems_sse_test"))
+        await worker_b.start(PostgresBroker(dsn, channel="ems_sse_test"))
+        queue = await worker_b.connect(5)
+
+        await worker_a.broadcast_many([(5, {"n": 1}), (5, {"n": 2})])
+        got = [await asyncio.wait_for(queue.get(), timeout=5.0) for _ in range(2)]
+        assert got == [{"n": 1}, {"n": 2}]
+
+        await worker_a.stop()
+        await worker_b.stop()
+
+    asyncio.run(run())
+
+
+def test_postgres_notifications_are_delivered_in_arrival_order(monkeypatch):
+    async def run():
+        delivered = []
+
+        async def deliver(key, message, event_id):
+            # A slow first delivery must not let later ones overtake it
+            if event_id == 3:
+                await asyncio.sleep(0.01)
+            delivered.append(event_id)
+
+        broker = PostgresBroker("postgresql://unused")
+
+        async def connect():
+            pass
+
+        monkeypatch.setattr(broker, "_connect", connect)
+        await broker.start(deliver)
+        for event_id in (3, 1, 2):
+            broker._on_notify(None, 0, broker.channel, json.dumps({"u": 1, "m": {}, "e": event_id}))
+        while len(delivered) < 3:
+            await asyncio.sleep(0.001)
+        assert delivered == [3, 1, 2]
+        await broker.stop()
+
+    asyncio.run(run())
@@ -1,6 +1,11 @@
 import asyncio
+import functools
 import importlib
 
+import pytest
+
+from app.core import metrics
+
 from app.core.sse import NotificationManager
 import app.core.sse as sse_module
 
@@ -56,3 +61,257 @@ def test_max_connections_eviction():
             sse_module.MAX_CONNECTIONS_PER_USER = old_max
 
     asyncio.run(run())
+
+
+def test_broadcast_encodes_once_for_all_connections():
+    async def run():
+        mgr = NotificationManager()
+        subs = [await mgr.connect(4) for _ in range(3)]
+
+        await mgr.broadcast(4, {"msg": "hello"})
+
+        events = [await asyncio.wait_for(s.next_event(), timeout=1.0) for s in subs]
+        # Every tab reads the same bytes object out of the user's ring
+        assert all(e.frame is events[0].frame for e in events)
+        assert events[0].frame == f'id: {events[0].id}\nevent: message\ndata: {{"msg": "hello"}}\n\n'.encode()
+        assert len(mgr._rings[4].events) == 1
+
+        for s in subs:
+            await mgr.disconnect(4, s)
+
+    asyncio.run(run())
+
+
+def test_slow_reader_skips_to_oldest_buffered_event(monkeypatch):
+    monkeypatch.setattr(sse_module, "REPLAY_BUFFER_SIZE", 3)
+
+    async def run():
+        mgr = NotificationManager()
+        sub = await mgr.connect(5)
+        for i in range(5):
+            await mgr.broadcast(5, {"n": i})
+
+        got = [await asyncio.wait_for(sub.get(), timeout=1.0) for _ in range(3)]
+        assert got == [{"n": 2}, {"n": 3}, {"n": 4}]
+        assert sub.empty()
+
+    asyncio.run(run())
+
+
+def test_slow_consumer_policies(monkeypatch):
+    monkeypatch.setattr(sse_module, "REPLAY_BUFFER_SIZE", 3)
+    metrics.reset()
+
+    async def run():
+        mgr = NotificationManager()
+        drop = await mgr.connect(6)
+        resync = await mgr.connect(6, topics=["team:6"], policy="resync")
+        cut = await mgr.connect(6, policy="disconnect")
+        mgr.subscribe(cut, "team:6")
+        for i in range(5):
+            await mgr.broadcast("team:6" if i == 0 else 6, {"n": i})
+        assert mgr.depth_counts()[(("le", "10"),)] == 3
+
+        # team:6 kept its one event; the user ring lost {"n": 1}
+        assert [(await drop.get()) for _ in range(3)] == [{"n": 2}, {"n": 3}, {"n": 4}]
+        assert [(await resync.get()) for _ in range(2)] == [{"type": "resync"}, {"n": 0}]
+        assert resync.empty()
+        assert await cut.get() == {"type": "server_disconnect", "reason": "slow_consumer"}
+
+        with pytest.raises(ValueError):
+            await mgr.connect(6, policy="block")
+
+    asyncio.run(run())
+    counters = metrics.snapshot()["counters"]
+    assert {s["labels"]["policy"]: s["value"] for s in counters["sse_events_dropped_total"]} == \
+        {"drop_oldest": 1, "resync": 4, "disconnect": 4}
+    delivered = metrics.snapshot()["histograms"]["sse_delivery_seconds"][0]
+    assert delivered["count"] == 3 + 1
+    assert delivered["buckets"]["+Inf"] == delivered["count"]
+
+
+def test_memory_budget_trims_least_recently_used_rings(monkeypatch):
+    async def run():
+        mgr = NotificationManager()
+        await mgr.broadcast(7, {"pad": "x" * 100})
+        await mgr.broadcast(8, {"pad": "x" * 100})
+        size = mgr.buffered_bytes // 2
+        budget = size * 5 // 2
+        monkeypatch.setattr(sse_module, "MEMORY_BUDGET_BYTES", budget)
+        await mgr.broadcast(8, {"pad": "x" * 100})
+
+        # User 7's ring was the least recently used and goes first
+        assert 7 not in mgr._rings
+        assert len(mgr._rings[8].events) == 2
+        assert mgr.buffered_bytes == sum(r.bytes for r in mgr._rings.values()) <= budget
+        # Its events are gone from memory, so a reconnect replays from the database
+        assert mgr.replay(7, 0) is None
+
+    asyncio.run(run())
+
+
+def test_evicting_a_trimmed_ring_keeps_its_events_out_of_replay(monkeypatch):
+    monkeypatch.setattr(sse_module, "REPLAY_MAX_USERS", 1)
+
+    async def run():
+        mgr = NotificationManager()
+        sub = await mgr.connect(9)
+        await mgr.broadcast(9, {"n": 1})
+        first = mgr._rings[9].events[0].id
+        # The budget empties the ring, but a reader keeps it alive
+        monkeypatch.setattr(sse_module, "MEMORY_BUDGET_BYTES", 1)
+        await mgr.broadcast(9, {"n": 2})
+        assert 9 in mgr._rings and not mgr._rings[9].events
+        monkeypatch.setattr(sse_module, "MEMORY_BUDGET_BYTES", 1 << 20)
+
+        await mgr.disconnect(9, sub)
+        await mgr.broadcast(10, {"n": 3})
+        assert 9 not in mgr._rings
+        # {"n": 2} was lost, so a reconnect from {"n": 1} must fall back to the database
+        assert mgr.replay(9, first) is None
+
+    asyncio.run(run())
+
+
+def test_heartbeat_wheel_pings_only_idle_streams():
+    async def run():
+        wheel = sse_module.HeartbeatWheel(interval=5, tick=1)
+        mgr = NotificationManager()
+        idle, busy = await mgr.connect(6), await mgr.connect(6)
+        mgr.heartbeat.remove(idle)
+        mgr.heartbeat.remove(busy)
+        idle.last_sent = busy.last_sent = 100.0
+        wheel._position = 100
+        wheel.add(idle)
+        wheel.add(busy)
+
+        busy.last_sent = 103.0
+        assert wheel.run_due(104.0) == 0
+        # One tick can be late; the buckets it skipped are still checked
+        assert wheel.run_due(106.5) == 1
+        assert await asyncio.wait_for(idle.next_event(), timeout=1.0) is sse_module.PING
+        assert busy.empty()
+        assert wheel.run_due(108.2) == 1
+        assert (await asyncio.wait_for(busy.next_event(), timeout=1.0)).message == {"type": "ping"}
+
+        wheel.remove(idle)
+        wheel.remove(busy)
+        assert wheel.count == 0
+
+    asyncio.run(run())
+
+
+def test_event_stream_ends_on_client_disconnect():
+    async def run():
+        mgr = NotificationManager()
+        sub = await mgr.connect(7)
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def frames():
+            try:
+                while True:
+                    yield (await sub.next_event()).frame
+            finally:
+                await mgr.disconnect(7, sub)
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        response = sse_module.EventStreamResponse(frames())
+        serving = asyncio.create_task(response({"type": "http"}, receive, send))
+        await mgr.broadcast(7, {"msg": "hi"})
+        await asyncio.sleep(0.05)
+        disconnect.set()
+        await asyncio.wait_for(serving, timeout=1.0)
+
+        assert sent[0]["type"] == "http.response.start"
+        assert (b"content-type", b"text/event-stream; charset=utf-8") in sent[0]["headers"]
+        assert b'"msg": "hi"' in sent[1]["body"]
+        assert 7 not in mgr.active_connections
+
+    asyncio.run(run())
+
+
+def test_event_stream_response_disconnects_even_if_the_body_never_starts():
+    async def run():
+        mgr = NotificationManager()
+        sub = await mgr.connect(7)
+        started = []
+
+        async def frames():
+            started.append(True)
+            yield b""
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("client went away")
+
+        response = sse_module.EventStreamResponse(frames(), on_close=functools.partial(mgr.disconnect, 7, sub))
+        with pytest.raises(OSError):
+            await response({"type": "http"}, receive, send)
+        assert not started
+        assert 7 not in mgr.active_connections
+        assert mgr._rings[7].subscribers == []
+
+    asyncio.run(run())
+
+
+def test_topics_merge_with_the_user_stream():
+    async def run():
+        mgr = NotificationManager()
+        alice = await mgr.connect(10, topics=[sse_module.team_topic(3)])
+        bob = await mgr.connect(11)
+        mgr.subscribe(bob, sse_module.team_topic(3))
+
+        await mgr.broadcast("team:3", {"type": "task_updated", "task_id": 1})
+        await mgr.broadcast(10, {"msg": "personal"})
+        await mgr.broadcast("team:4", {"type": "task_updated", "task_id": 2})
+        await mgr.broadcast("team:3", {"type": "task_deleted", "task_id": 1})
+
+        got = [await asyncio.wait_for(alice.get(), timeout=1.0) for _ in range(3)]
+        assert got == [{"type": "task_updated", "task_id": 1}, {"msg": "personal"}, {"type": "task_deleted", "task_id": 1}]
+        assert alice.empty()
+        # Both users read the one frame stored in the topic ring
+        assert len(mgr._rings["team:3"].events) == 2
+
+        mgr.unsubscribe(bob, "team:3")
+        assert bob.empty()
+        assert mgr._rings["team:3"].subscribers == [alice]
+
+        await mgr.disconnect(10, alice)
+        await mgr.disconnect(11, bob)
+        assert mgr._rings["team:3"].subscribers == []
+
+    asyncio.run(run())
+
+
+def test_next_batch_collects_events_within_the_window():
+    async def run():
+        mgr = NotificationManager()
+        sub = await mgr.connect(12, topics=["team:5"])
+
+        async def publish():
+            await mgr.broadcast(12, {"n": 1})
+            await asyncio.sleep(0.01)
+            await mgr.broadcast("team:5", {"n": 2})
+            await mgr.broadcast(12, {"n": 3})
+
+        asyncio.create_task(publish())
+        batch = await asyncio.wait_for(sub.next_batch(0.05, 10), timeout=1.0)
+        assert [e.message for e in batch] == [{"n": 1}, {"n": 2}, {"n": 3}]
+        # Every event keeps the JSON it was encoded with once
+        assert batch[0].data == '{"n": 1}'
+
+        await mgr.broadcast(12, {"n": 4})
+        await mgr.broadcast(12, {"n": 5})
+        assert [e.message for e in await sub.next_batch(0, 1)] == [{"n": 4}]
+        await mgr.disconnect(12, sub)
+
+    asyncio.run(run())
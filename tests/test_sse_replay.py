@@ -0,0 +1,88 @@
+import asyncio
+
+import app.core.sse as sse_module
+from app.core.broker import InMemoryBroker
+from app.core.sse import NotificationManager, next_event_id
+
+
+def test_event_ids_strictly_increase():
+    ids = [next_event_id() for _ in range(1000)]
+    assert ids == sorted(set(ids))
+
+
+def test_replay_returns_only_missed_events():
+    async def run():
+        mgr = NotificationManager()
+        queue = await mgr.connect(1)
+        for i in range(5):
+            await mgr.broadcast(1, {"n": i})
+        events = [await queue.get_event() for _ in range(5)]
+        ids = [event_id for event_id, _ in events]
+
+        # Client saw the first two, then dropped
+        assert mgr.replay(1, ids[1]) == [(ids[i], {"n": i}) for i in (2, 3, 4)]
+        assert mgr.replay(1, ids[4]) == []
+        # A user with no events since the process started has nothing to replay
+        assert mgr.replay(2, ids[0]) == []
+        # ...but an id from before the process started can't be vouched for
+        assert mgr.replay(2, 1) is None
+
+    asyncio.run(run())
+
+
+def test_overrun_ring_asks_for_database_fallback(monkeypatch):
+    monkeypatch.setattr(sse_module, "REPLAY_BUFFER_SIZE", 3)
+
+    async def run():
+        mgr = NotificationManager()
+        queue = await mgr.connect(1)
+        ids = []
+        for i in range(5):
+            await mgr.broadcast(1, {"n": i})
+            ids.append((await queue.get_event())[0])
+
+        assert mgr.replay(1, ids[0]) is None
+        assert [m for _, m in mgr.replay(1, ids[1])] == [{"n": 2}, {"n": 3}, {"n": 4}]
+
+    asyncio.run(run())
+
+
+def test_workers_share_event_ids():
+    async def run():
+        hub = []
+        worker_a, worker_b = NotificationManager(), NotificationManager()
+        await worker_a.start(InMemoryBroker(hub))
+        await worker_b.start(InMemoryBroker(hub))
+        qa, qb = await worker_a.connect(9), await worker_b.connect(9)
+
+        await worker_a.broadcast(9, {"msg": "x"})
+        event_a, event_b = await qa.get_event(), await qb.get_event()
+        assert event_a == event_b
+        # A client reconnecting to the other worker resumes from the same id
+        assert worker_b.replay(9, event_a[0]) == []
+
+    asyncio.run(run())
+
+
+def test_events_arriving_out_of_id_order_are_neither_lost_nor_repeated_on_resume():
+    async def run():
+        mgr = NotificationManager()
+        sub = await mgr.connect(1, ["team:1"])
+        base = next_event_id()
+        # Publishers stamped these ids, but they arrive in a different order
+        for event_id, key in [(base + 30, 1), (base + 10, "team:1"), (base + 20, 1), (base + 5, 1)]:
+            await mgr.deliver_local(key, {"n": event_id - base}, event_id)
+
+        first = [await sub.get_event() for _ in range(2)]
+        assert [m["n"] for _, m in first] == [30, 10]
+        ids = [event_id for event_id, _ in first]
+        assert ids == sorted(set(ids))
+
+        # The client drops after two events and resumes from the last id it saw
+        resumed = mgr.replay(1, ids[-1])
+        assert [m["n"] for _, m in resumed] == [20, 5]
+        assert all(event_id > ids[-1] for event_id, _ in resumed)
+        # The live reader gets the same events with the same ids
+        assert [await sub.get_event() for _ in range(2)] == resumed
+
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.team import Team
+from app.models.user import User
+from app.schemas.task import TaskCreate, TaskUpdate
+from app.services import task as task_service
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    events = []
+    monkeypatch.setattr(task_service, "publish_topic_events", lambda batch, background_tasks=None: events.extend(batch))
+    monkeypatch.setattr(task_service, "create_in_app_notifications", lambda *a, **k: [])
+    monkeypatch.setattr(task_service, "enqueue_email", lambda *a, **k: None)
+    engine = create_engine(f"sqlite:///{tmp_path / 'topics.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Team(id=1, name="Board"), Team(id=2, name="Other", manager_id=3),
+        User(id=1, username="emp", email="emp@ems.com", hashed_password="x", role="employee", team_id=1),
+        User(id=2, username="boss", email="boss@ems.com", hashed_password="x", role="manager"),
+        User(id=3, username="lead", email="lead@ems.com", hashed_password="x", role="manager"),
+    ])
+    session.commit()
+    session.events = events
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_task_changes_publish_compact_diffs(db):
+    task = task_service.create_new_task(db, TaskCreate(title="Card", description="d", priority="Low"), user_id=1)
+    created = dict(db.events)
+    assert set(created) == {f"task:{task.id}", "team:1"}
+    assert created["team:1"]["type"] == "task_created"
+    assert created["team:1"]["task"]["title"] == "Card"
+    assert created["team:1"]["topic"] == "team:1"
+
+    db.events.clear()
+    boss = db.get(User, 2)
+    task_service.update_task_with_history(db, task, TaskUpdate(status="In Progress", priority="Low"), boss)
+    update = dict(db.events)["team:1"]
+    # Only what changed, not the whole card
+    assert update["type"] == "task_updated"
+    assert update["changes"] == {"status": "In Progress"}
+    assert update["by"] == 2
+
+    db.events.clear()
+    task_service.update_task_with_history(db, task, TaskUpdate(team_id=2), boss)
+    # Moving the card tells both boards
+    assert {topic for topic, _ in db.events} == {f"task:{task.id}", "team:1", "team:2"}
+
+    db.events.clear()
+    task_service.delete_task(db, task.id)
+    assert {topic: m["type"] for topic, m in db.events} == {f"task:{task.id}": "task_deleted", "team:1": "task_deleted", "team:2": "task_deleted"}
+
+
+def test_topic_subscriptions_are_authorized(db, tmp_path):
+    task = task_service.create_new_task(db, TaskCreate(title="Card", priority="Low"), user_id=1)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'topics.db'}")
+
+    async def run():
+        async with async_sessionmaker(bind=engine)() as adb:
+            emp, lead = db.get(User, 1), db.get(User, 3)
+            return [
+                await task_service.can_subscribe_async(adb, emp, "team:1"),
+                await task_service.can_subscribe_async(adb, emp, "team:2"),
+                await task_service.can_subscribe_async(adb, emp, f"task:{task.id}"),
+                await task_service.can_subscribe_async(adb, lead, "team:2"),
+                await task_service.can_subscribe_async(adb, lead, f"task:{task.id}"),
+                await task_service.can_subscribe_async(adb, emp, "user:2"),
+            ]
+
+    try:
+        assert asyncio.run(run()) == [True, False, True, True, False, False]
+    finally:
+        asyncio.run(engine.dispose())
@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.database import Base, get_async_db
+from app.core.security import create_access_token
+from app.core.sse import manager
+from app.main import app
+from app.models.team import Team
+from app.models.user import User
+
+engine = create_engine("sqlite:///./test_ws.db", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_ws.db")
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_db():
+    previous = dict(app.dependency_overrides)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Team(id=1, name="WS Board"), Team(id=2, name="WS Other"),
+        User(id=1, username="ws_emp", email="ws_emp@ems.com", hashed_password="x", role="employee",
+             is_active=True, team_id=1),
+    ])
+    db.commit()
+    db.close()
+
+    yield
+
+    Base.metadata.drop_all(bind=engine)
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(previous)
+
+
+def _url(**params):
+    query = "&".join(f"{k}={v}" for k, v in {"token": create_access_token({"sub": "ws_emp@ems.com"}), **params}.items())
+    return f"/ws?{query}"
+
+
+def test_events_published_together_share_one_frame():
+    with client.websocket_connect(_url()) as ws:
+        ws.send_json({"op": "subscribe", "topics": ["team:1", "team:2"]})
+        assert ws.receive_json() == {"op": "subscribed", "topics": ["team:1"], "denied": ["team:2"]}
+
+        ws.portal.call(manager.broadcast_many, [
+            (1, {"type": "notification", "title": "a"}),
+            ("team:1", {"type": "task_updated", "task_id": 7}),
+            (1, {"type": "notification", "title": "b"}),
+        ])
+        frame = ws.receive_json()
+        assert [e["data"].get("title") or e["data"]["type"] for e in frame["events"]] == ["a", "task_updated", "b"]
+        ids = [e["id"] for e in frame["events"]]
+        assert ids == sorted(ids)
+
+        ws.send_json({"op": "unsubscribe", "topics": ["team:1"]})
+        assert ws.receive_json()["op"] == "unsubscribed"
+        ws.send_json({"op": "nope"})
+        assert ws.receive_json() == {"op": "error", "detail": "Unknown op: nope"}
+
+
+def test_bad_token_or_denied_topic_is_rejected():
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws?token=garbage"):
+            pass
+    assert exc.value.code == 1008
+
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect(_url(topics="team:2")):
+            pass
+    assert exc.value.code == 1008